@@ -0,0 +1,170 @@
+"""
+Measure the latency and throughput effect of each socket option over TCP loopback.
+
+For every profile, a fresh in-process server and client are started with the same socket options, changed from the
+defaults one option at a time, and three things are measured:
+
+- latency: the round trip of a small image sent on its own, waiting for its ACK before sending the next, as in the
+  client's default mode; reported as the median and 99th percentile. Repeats are answered as duplicates, so this is
+  dominated by the transport rather than by decoding.
+- throughput: a batch of large images sent pipelined.
+- connect: how long a burst of simultaneous connections takes to be accepted, which the listen backlog bounds.
+
+Loopback has no real latency or packet loss, so differences here are a lower bound on those seen over a network.
+
+Example Usage:
+    $ python examples/socket_benchmark.py --images 20 --size 1024 --engine asyncio
+"""
+import argparse
+import random
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image
+from nepyc.client.client import ImageClient
+from nepyc.common.utils.sockets import SocketOptions
+from nepyc.server.server import ImageServer
+
+
+PROFILES = {
+    'default':      SocketOptions(),
+    'nagle':        SocketOptions(nodelay=False),
+    'no-keepalive': SocketOptions(keepalive=False),
+    'small-buffer': SocketOptions(recv_buffer=64 * 1024, send_buffer=64 * 1024),
+    'large-buffer': SocketOptions(recv_buffer=8 * 1024 * 1024, send_buffer=8 * 1024 * 1024),
+    'backlog-1':    SocketOptions(backlog=1),
+}
+
+
+def generate_images(directory, count, size, seed):
+    paths = []
+    rng = random.Random(seed)
+
+    for number in range(count):
+        path = Path(directory, f'{seed}-{size}-{number}.png')
+        Image.frombytes('RGB', (size, size), rng.randbytes(size * size * 3)).save(path)
+        paths.append(path)
+
+    return paths
+
+
+def start_server(port, options, engine):
+    server = ImageServer(
+        host='127.0.0.1',
+        port=port,
+        engine=engine,
+        tcp_nodelay=options.nodelay,
+        keepalive=options.keepalive,
+        recv_buffer=options.recv_buffer,
+        send_buffer=options.send_buffer,
+        listen_backlog=options.backlog
+    )
+    threading.Thread(target=server.run_server, daemon=True).start()
+
+    deadline = time.monotonic() + 10.0
+
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+
+    raise TimeoutError('The server did not start listening in time')
+
+
+def measure_latency(port, options, path, rounds):
+    client = ImageClient(host='127.0.0.1', port=port, socket_options=options)
+    client.connect()
+
+    try:
+        client.send_image(path)
+        timings = []
+
+        for _ in range(rounds):
+            started = time.perf_counter()
+            client.send_image(path)
+            timings.append(time.perf_counter() - started)
+    finally:
+        client.close()
+
+    timings.sort()
+
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+def measure_throughput(port, options, paths, window):
+    client = ImageClient(host='127.0.0.1', port=port, socket_options=options)
+    client.connect()
+
+    try:
+        started = time.perf_counter()
+        client.send_images(paths, window=window)
+        elapsed = time.perf_counter() - started
+    finally:
+        client.close()
+
+    return sum(path.stat().st_size for path in paths) / elapsed
+
+
+def measure_connect(port, connections):
+    def connect(_):
+        try:
+            return socket.create_connection(('127.0.0.1', port), timeout=5)
+        except OSError:
+            return None
+
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(connections) as pool:
+        socks = list(pool.map(connect, range(connections)))
+
+    elapsed = time.perf_counter() - started
+
+    for sock in socks:
+        if sock is not None:
+            sock.close()
+
+    return elapsed, socks.count(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', type=int, default=20, help='Number of large images sent per throughput run.')
+    parser.add_argument('--size', type=int, default=1024, help='Width and height of the large images.')
+    parser.add_argument('--rounds', type=int, default=200, help='Number of round trips per latency run.')
+    parser.add_argument('--window', type=int, default=16, help='Pipelining window of the throughput run.')
+    parser.add_argument('--connections', type=int, default=200, help='Number of connections in the connect burst.')
+    parser.add_argument('--engine', choices=('threaded', 'asyncio'), default='threaded')
+    parser.add_argument('--port', type=int, default=8590, help='First port; each profile gets the next one.')
+    parser.add_argument('--profile', choices=sorted(PROFILES), action='append',
+                        help='Profile to run; may be given more than once. Defaults to every profile.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        small = generate_images(directory, 1, 32, seed=0)[0]
+        large = generate_images(directory, args.images, args.size, seed=1)
+
+        for offset, name in enumerate(args.profile or PROFILES):
+            options = PROFILES[name]
+            port = args.port + offset
+            server = start_server(port, options, args.engine)
+
+            try:
+                median, p99 = measure_latency(port, options, small, args.rounds)
+                rate = measure_throughput(port, options, large, args.window)
+                connect, failed = measure_connect(port, args.connections)
+            finally:
+                server.stop(from_gui=True)
+
+            print(f'{name:>12}: latency {median * 1000:.2f} ms median, {p99 * 1000:.2f} ms p99; '
+                  f'throughput {rate / 2**20:.1f} MiB/s; '
+                  f'{args.connections} connects in {connect * 1000:.0f} ms ({failed} failed)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare upload throughput over TCP loopback and over the server's Unix domain socket.
+
+An in-process server listens on both transports at once; the same number of (distinct) generated images is then sent
+through each, pipelined, and the time taken is reported.
+
+Example Usage:
+    $ python examples/transport_benchmark.py --images 200 --size 256 --engine asyncio
+"""
+import argparse
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+from PIL import Image
+from nepyc.client.client import UNIX_SCHEME, ImageClient
+from nepyc.server.server import ImageServer
+
+
+def generate_images(directory, count, size, seed):
+    paths = []
+    rng = random.Random(seed)
+
+    for number in range(count):
+        path = Path(directory, f'{seed}-{number}.png')
+        Image.frombytes('RGB', (size, size), rng.randbytes(size * size * 3)).save(path)
+        paths.append(path)
+
+    return paths
+
+
+def wait_until_listening(server, timeout=10.0):
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        try:
+            with socket.socket(socket.AF_UNIX) as probe:
+                probe.connect(str(server.unix_socket))
+            return
+        except OSError:
+            time.sleep(0.05)
+
+    raise TimeoutError('The server did not start listening in time')
+
+
+def run(host, port, paths, window):
+    client = ImageClient(host=host, port=port)
+    client.connect()
+
+    try:
+        started = time.perf_counter()
+        acks = client.send_images(paths, window=window)
+        elapsed = time.perf_counter() - started
+    finally:
+        client.close()
+
+    failed = sum(1 for ack in acks.values() if ack.status != 'OK')
+
+    return elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', type=int, default=100, help='Number of images sent over each transport.')
+    parser.add_argument('--size', type=int, default=256, help='Width and height of the generated images.')
+    parser.add_argument('--window', type=int, default=16, help='Pipelining window of the client.')
+    parser.add_argument('--engine', choices=('threaded', 'asyncio'), default='threaded')
+    parser.add_argument('--port', type=int, default=8585)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        unix_socket = os.path.join(directory, 'nepyc.sock')
+        server = ImageServer(host='127.0.0.1', port=args.port, engine=args.engine, unix_socket=unix_socket)
+        threading.Thread(target=server.run_server, daemon=True).start()
+        wait_until_listening(server)
+
+        targets = {
+            'tcp':  ('127.0.0.1', args.port),
+            'unix': (UNIX_SCHEME + unix_socket, args.port),
+        }
+
+        for seed, (name, (host, port)) in enumerate(targets.items()):
+            # Distinct images per transport, so neither run is answered from the other's hashes.
+            paths = generate_images(directory, args.images, args.size, seed)
+            total = sum(path.stat().st_size for path in paths)
+            elapsed, failed = run(host, port, paths, args.window)
+
+            print(f'{name:>4}: {args.images} images, {total / 2**20:.1f} MiB in {elapsed:.3f}s '
+                  f'({args.images / elapsed:.1f} images/s, {total / 2**20 / elapsed:.1f} MiB/s, {failed} not OK)')
+
+        server.stop(from_gui=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,13 +12,31 @@ class Arguments(ArgumentParser):
 
         self.__parsed = None
 
-        self.add_argument('image_path', help='Path to the image to be uploaded', type=str, action='store')
+        self.add_argument('image_path', help='Path to the image(s) to be uploaded', type=str, nargs='+')
 
-        self.add_argument('-H', '--host', default=ENV_CONFIG.host)
+        self.add_argument('-H', '--host', default=ENV_CONFIG.host,
+                          help='Host of the server, or unix:///path/to/socket to connect to its Unix domain socket.')
         self.add_argument('-P', '--port', default=ENV_CONFIG.port)
         self.add_argument('-L', '--log-level', default=ENV_CONFIG.log_level)
         self.add_argument('-C', '--config-file', default=ENV_CONFIG.config_file_path)
         self.add_argument('-V', '--version', action='store_true')
+        self.add_argument('-W', '--window', type=int, default=1,
+                          help='Number of images to send before waiting for the server to acknowledge them. Values '
+                               'above 1 use pipelined uploads.')
+        self.add_argument('-N', '--negotiate', action='store_true',
+                          help='Ask the server whether it already has each image before sending it.')
+        self.add_argument('--chunk-size', type=int, default=0,
+                          help='Upload each image in resumable chunks of this many bytes, reconnecting and resuming '
+                               'if the connection drops. 0 sends each image in one frame.')
+        self.add_argument('--archive', type=int, default=0,
+                          help='Send the images in bulk, packed into tar archives of up to this many images each. 0 '
+                               'sends each image in its own frame.')
+        self.add_argument('--no-nodelay', dest='tcp_nodelay', action='store_false',
+                          help="Leave Nagle's algorithm on for the connection (TCP_NODELAY off).")
+        self.add_argument('--recv-buffer', type=int, default=0,
+                          help="Socket receive buffer size (SO_RCVBUF) in bytes; 0 for the kernel's default.")
+        self.add_argument('--send-buffer', type=int, default=0,
+                          help="Socket send buffer size (SO_SNDBUF) in bytes; 0 for the kernel's default.")
 
     @property
     def parsed(self):
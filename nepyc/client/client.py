@@ -1,7 +1,18 @@
 from nepyc.client.log_engine import CLIENT_LOGGER as ROOT_LOGGER, Loggable
 from nepyc.client.config import Config
-from nepyc.proto.ack import RECEIVER
+from nepyc.common.utils.sockets import SocketOptions, recv_exactly
+from nepyc.proto.ack import CODE_MAP, RECEIVER, Ack, BusyAck, OffsetAck, ProceedAck, SummaryAck
+from nepyc.proto.ack.models.base import WIRE_FORMAT as ACK_WIRE_FORMAT
+from nepyc.proto.frames import (ACK_HEADER, CHUNK_META, MAX_SEQ, PREFIX, UPLOAD_META, AckFlag, FrameHeader, FrameType,
+                                ImageMeta, pack_frame, pixel_digest, unpack_ack_header)
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import random
 import socket
+import tarfile
+import tempfile
+import time
 from PIL import Image
 from io import BytesIO
 import struct
@@ -12,14 +23,50 @@ MOD_LOGGER = ROOT_LOGGER.get_child('client.client')
 
 CONFIG = Config(skip_cli_args=True)
 
+# A host of the form `unix:///path/to/socket` connects to the server's Unix domain socket instead of over TCP.
+UNIX_SCHEME = 'unix://'
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    """
+    An image re-encoded for upload.
+
+    Attributes:
+        data (bytes):
+            The PNG-encoded image.
+
+        meta (ImageMeta):
+            The format and dimensions declared in the IMAGE frame.
+
+        digest (bytes):
+            The pixel digest declared in a HAVE frame.
+    """
+    data: bytes
+    meta: ImageMeta
+    digest: bytes
+
 
 class ImageClient(Loggable):
     DEFAULT_SERVER_HOST = CONFIG.host
     DEFAULT_SERVER_PORT = CONFIG.port
-
-    def __init__(self, host=DEFAULT_SERVER_HOST, port=DEFAULT_SERVER_PORT):
+    DEFAULT_BUSY_RETRIES = 5
+    DEFAULT_WINDOW = 16
+    DEFAULT_CHUNK_SIZE = 1024 * 1024
+    DEFAULT_RECONNECTS = 5
+    DEFAULT_ARCHIVE_BATCH = 1000
+
+    # Bounds (in seconds) of the exponential backoff used when the server reports that it is busy.
+    BUSY_BACKOFF_BASE = 0.1
+    BUSY_BACKOFF_MAX  = 10.0
+
+    def __init__(self, host=DEFAULT_SERVER_HOST, port=DEFAULT_SERVER_PORT, busy_retries=DEFAULT_BUSY_RETRIES,
+                 socket_options=None):
         super().__init__(MOD_LOGGER)
+        self.__busy_retries = busy_retries
         self.__connected = False
+        self.__seq = 0
+        self.__socket_options = socket_options or SocketOptions()
 
         self.__client = None
 
@@ -29,6 +76,10 @@ class ImageClient(Loggable):
         self.host     = host
         self.port     = port
 
+    @property
+    def busy_retries(self):
+        return self.__busy_retries
+
     @property
     def client(self):
         return self.__client
@@ -58,6 +109,31 @@ class ImageClient(Loggable):
 
         self.__host = new
 
+    @property
+    def socket_options(self):
+        """
+        Return the transport options applied to the connection's socket before it connects.
+
+        Returns:
+            nepyc.common.utils.sockets.SocketOptions:
+                The socket options.
+        """
+        return self.__socket_options
+
+    @property
+    def unix_socket(self):
+        """
+        Return the path of the Unix domain socket to connect to, if the host is a `unix://` URL.
+
+        Returns:
+            str | None:
+                The socket path, or None when connecting over TCP.
+        """
+        if self.host and self.host.startswith(UNIX_SCHEME):
+            return self.host[len(UNIX_SCHEME):]
+
+        return None
+
     @property
     def port(self):
         return self.__port
@@ -87,14 +163,19 @@ class ImageClient(Loggable):
             log.error('Client is already connected')
             raise ConnectionError('Client is already connected')
 
-        if not self.host or not self.port:
+        if self.unix_socket:
+            family, address = socket.AF_UNIX, self.unix_socket
+        elif self.host and self.port:
+            family, address = socket.AF_INET, (self.host, self.port)
+        else:
             log.error('Host and port must be set before connecting')
             raise ConnectionError('Host and port must be set before connecting')
 
         try:
-            self.__client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.client.connect((self.host, self.port))
-        except ConnectionRefusedError as e:
+            self.__client = socket.socket(family, socket.SOCK_STREAM)
+            self.socket_options.configure(self.client)
+            self.client.connect(address)
+        except (ConnectionRefusedError, FileNotFoundError) as e:
             log.error('Connection refused')
             raise ConnectionRefusedError('Connection refused') from e
 
@@ -130,18 +211,14 @@ class ImageClient(Loggable):
             raise ConnectionError('Client is not connected')
 
         try:
-            with Image.open(image_path) as img:
-                byte_arr = BytesIO()
-                img.save(byte_arr, format='PNG')
-                img_data = byte_arr.getvalue()
+            img_data = self.encode_image(image_path).data
+            frame = struct.pack('!I', len(img_data)) + img_data
 
-                size = struct.pack('!I', len(img_data))
-
-                self.client.sendall(size + img_data)
+            self.client.sendall(frame)
 
             log.debug('Image sent')
 
-            response = self.receive_response()
+            response = self.receive_response(retry_frame=frame)
             log.debug(f'Received response {response}')
         except Exception as e:
             log.error(f'Failed to send image: {e}')
@@ -149,21 +226,426 @@ class ImageClient(Loggable):
 
         log.info(f'Sent image at "{image_path}" and received response {response.status}')
 
-    def receive_response(self):
-        from nepyc.proto.ack import Ack, ACK_MAP
+    def send_images(self, image_paths, window=DEFAULT_WINDOW, negotiate=False):
+        """
+        Send several images over one connection without waiting for each ACK before sending the next image.
+
+        Each image is sent as an extended frame (see :mod:`nepyc.proto.frames`) tagged with a sequence id, and up to
+        `window` frames may be awaiting their ACK at once. The server may acknowledge frames out of order, or several at
+        once with a cumulative ACK. Frames the server was too busy to accept are resent after backing off, up to
+        :attr:`busy_retries` times, like :meth:`send_image` does.
+
+        If `negotiate` is set, each image is announced with a HAVE frame carrying its pixel digest first, and its data is
+        only sent if the server answers that it does not have it yet. Images the server already has are reported with
+        the server's duplicate ACK without their data ever being sent.
+
+        Parameters:
+            image_paths (Iterable[str | Path]):
+                The paths of the images to send.
+
+            window (int, optional):
+                The maximum number of frames awaiting an ACK at any time. Defaults to 16.
+
+            negotiate (bool, optional):
+                Ask the server whether it already has each image before sending it. Defaults to False.
+
+        Returns:
+            dict[Path, Ack]:
+                The server's final response for each image, keyed by path.
+
+        Raises:
+            ConnectionError:
+                If the client is not connected, or the server closes the connection before every frame is acknowledged.
+
+            ValueError:
+                If `window` is less than one.
+        """
+        log = self.create_logger()
+
+        if not self.client:
+            log.error('Client is not connected')
+            raise ConnectionError('Client is not connected')
+
+        if window < 1:
+            raise ValueError('The window must be at least 1')
+
+        outstanding = OrderedDict()
+        responses   = {}
+
+        for image_path in map(Path, image_paths):
+            while len(outstanding) >= window:
+                self._receive_pipelined(outstanding, responses)
+
+            frame_type = FrameType.HAVE if negotiate else FrameType.IMAGE
+            self._send_pipelined(outstanding, image_path, self.encode_image(image_path), frame_type=frame_type)
+
+        while outstanding:
+            self._receive_pipelined(outstanding, responses)
+
+        log.info(f'Sent {len(responses)} images with a window of {window}')
+
+        return responses
+
+    def send_archive(self, image_paths, batch=DEFAULT_ARCHIVE_BATCH):
+        """
+        Send many images in bulk, packed into tar archives of up to `batch` images each, one TAR frame per archive (see
+        :mod:`nepyc.proto.frames`). The image files are sent as they are on disk, without being re-encoded, and each
+        archive is answered with a single summary of the outcome of every image in it; e.g. to migrate an existing
+        photo collection.
+
+        An archive the server was too busy to accept is resent after backing off, up to :attr:`busy_retries` times.
+
+        Parameters:
+            image_paths (Iterable[str | Path]):
+                The paths of the images to send.
+
+            batch (int, optional):
+                The maximum number of images per archive. Defaults to 1000.
+
+        Returns:
+            dict[Path, Ack]:
+                The outcome for each image, keyed by path. Images the server did not report on (because their archive
+                was refused, or was cut short) are left out.
+
+        Raises:
+            ConnectionError:
+                If the client is not connected, or the server closes the connection before answering an archive.
+
+            ValueError:
+                If `batch` is less than one or more than :attr:`SummaryAck.MAX_MEMBERS`.
+        """
+        log = self.create_logger()
+
+        if not self.client:
+            log.error('Client is not connected')
+            raise ConnectionError('Client is not connected')
+
+        if not 1 <= batch <= SummaryAck.MAX_MEMBERS:
+            raise ValueError(f'The batch must be between 1 and {SummaryAck.MAX_MEMBERS}')
+
+        image_paths = list(map(Path, image_paths))
+        responses   = {}
+
+        for start in range(0, len(image_paths), batch):
+            paths = image_paths[start:start + batch]
+            response = self._send_archive(paths)
+
+            if not isinstance(response, SummaryAck):
+                log.warning(f'Archive of {len(paths)} images was refused: {response}')
+                continue
+
+            if len(response.outcomes) < len(paths):
+                log.warning(f'Server reported on only {len(response.outcomes)} of {len(paths)} images in the archive')
+
+            for image_path, code in zip(paths, response.outcomes):
+                responses[image_path] = CODE_MAP.get(code, Ack)()
+
+        log.info(f'Sent {len(responses)} images in archives of up to {batch}')
+
+        return responses
+
+    def _send_archive(self, image_paths):
+        log = self.create_logger()
+
+        with tempfile.TemporaryFile() as archive_file:
+            with tarfile.open(fileobj=archive_file, mode='w|') as archive:
+                for number, image_path in enumerate(image_paths):
+                    archive.add(image_path, arcname=f'{number}{image_path.suffix}', recursive=False)
+
+            size = archive_file.tell()
+            attempt = 0
+
+            while True:
+                archive_file.seek(0)
+                header = FrameHeader(FrameType.TAR, 0, self._next_seq(), 0, size)
+                self.client.sendall(PREFIX + header.pack())
+                self.client.sendfile(archive_file)
+
+                _, _, response = self.receive_envelope()
+
+                if not isinstance(response, BusyAck) or attempt >= self.busy_retries:
+                    return response
+
+                delay = self.backoff_delay(response, attempt)
+                attempt += 1
+                log.info(f'Server is busy, retrying archive in {delay:.2f}s (attempt {attempt} of {self.busy_retries})')
+                time.sleep(delay)
+
+    def send_image_resumable(self, image_path, chunk_size=DEFAULT_CHUNK_SIZE, reconnects=DEFAULT_RECONNECTS):
+        """
+        Send an image as a resumable, chunked upload (see :mod:`nepyc.proto.frames`).
+
+        The upload's id is derived from the encoded image, so the same image always resumes the same upload. Each chunk
+        is acknowledged with the number of bytes the server has committed, and the next chunk is sent from there. If
+        the connection drops, the client reconnects (backing off between attempts, up to `reconnects` times), asks the
+        server for the committed offset and carries on from it rather than starting over.
+
+        Parameters:
+            image_path (str | Path):
+                The path of the image to send.
+
+            chunk_size (int, optional):
+                The size (in bytes) of each chunk. Defaults to 1 MiB.
+
+            reconnects (int, optional):
+                The number of times to reconnect after the connection drops. Defaults to 5.
+
+        Returns:
+            Ack:
+                The server's response for the image.
+
+        Raises:
+            ConnectionError:
+                If the connection drops more than `reconnects` times.
+
+            ValueError:
+                If `chunk_size` is less than one.
+        """
         log = self.create_logger()
-        response = b''
+        image_path = Path(image_path)
+
+        if chunk_size < 1:
+            raise ValueError('The chunk size must be at least 1')
+
+        data = self.encode_image(image_path).data
+        upload_id = hashlib.md5(data).digest()
+        attempt = 0
+
+        while True:
+            try:
+                if not self.client:
+                    self.connect()
+
+                return self._upload_chunks(image_path, data, upload_id, chunk_size)
+
+            except (ConnectionError, OSError) as e:
+                if attempt >= reconnects:
+                    log.error(f'Giving up on "{image_path}" after {attempt} reconnect(s): {e}')
+                    raise ConnectionError(f'Upload of "{image_path}" failed: {e}') from e
+
+                delay = min(self.BUSY_BACKOFF_BASE * (2 ** attempt), self.BUSY_BACKOFF_MAX)
+                attempt += 1
+                log.warning(f'Connection lost during upload of "{image_path}", reconnecting in {delay:.2f}s '
+                            f'(attempt {attempt} of {reconnects}): {e}')
+
+                if self.client:
+                    try:
+                        self.close()
+                    except OSError:
+                        self.__client = None
+
+                time.sleep(delay)
+
+    def _upload_chunks(self, image_path, data, upload_id, chunk_size):
+        log = self.create_logger()
+
+        meta = UPLOAD_META.pack(upload_id, len(data))
+        self.client.sendall(pack_frame(FrameType.UPLOAD, self._next_seq(), b'', meta=meta))
+
+        _, _, response = self.receive_envelope()
+        offset = 0
+        busy = 0
+
+        while isinstance(response, (OffsetAck, BusyAck)):
+            if isinstance(response, OffsetAck):
+                offset = response.offset
+                log.debug(f'Server has committed {offset} of {len(data)} bytes of "{image_path}"')
+            elif busy < self.busy_retries:
+                delay = self.backoff_delay(response, busy)
+                busy += 1
+                log.info(f'Server is busy, retrying "{image_path}" in {delay:.2f}s')
+                time.sleep(delay)
+            else:
+                break
+
+            chunk = data[offset:offset + chunk_size]
+            self.client.sendall(pack_frame(FrameType.CHUNK, self._next_seq(), chunk,
+                                           meta=CHUNK_META.pack(upload_id, offset)))
+            _, _, response = self.receive_envelope()
+
+        if response.status not in [b'OK', 'OK']:
+            log.warning(f'Received response status is not OK for "{image_path}": {response}')
+
+        log.info(f'Uploaded "{image_path}" in chunks and received response {response.status}')
+
+        return response
+
+    def encode_image(self, image_path):
+        """
+        Re-encode an image file as PNG, the format the server expects.
+
+        Parameters:
+            image_path (str | Path):
+                The path of the image.
+
+        Returns:
+            EncodedImage:
+                The PNG-encoded image, along with the metadata and digest extended frames declare for it.
+        """
+        with Image.open(image_path) as img:
+            byte_arr = BytesIO()
+            img.save(byte_arr, format='PNG')
+
+            return EncodedImage(byte_arr.getvalue(), ImageMeta('PNG', img.width, img.height), pixel_digest(img))
+
+    def receive_ack(self):
+        """
+        Receive exactly one bare ACK, in response to a legacy frame.
+
+        Returns:
+            Ack:
+                The ACK.
+
+        Raises:
+            ConnectionError:
+                If the server closes the connection part way through the ACK.
+        """
+        header = recv_exactly(self.client, ACK_WIRE_FORMAT.size)
+        payload = None if header is None else recv_exactly(self.client, Ack.payload_size(header))
+
+        if payload is None:
+            raise ConnectionError('Server closed the connection before sending an ACK')
+
+        return RECEIVER.receive(bytes(header + payload))
+
+    def receive_envelope(self):
+        """
+        Receive one ACK envelope in response to an extended frame.
+
+        Returns:
+            tuple[int, int, Ack]:
+                The envelope flags, the sequence id of the acknowledged frame, and the ACK.
+
+        Raises:
+            ConnectionError:
+                If the server closes the connection part way through the envelope.
+        """
+        header = recv_exactly(self.client, len(PREFIX) + ACK_HEADER.size)
+
+        if header is None:
+            raise ConnectionError('Server closed the connection while ACKs were outstanding')
+
+        flags, seq, size = unpack_ack_header(header)
+        data = recv_exactly(self.client, size)
+
+        if data is None:
+            raise ConnectionError('Server closed the connection while ACKs were outstanding')
+
+        return flags, seq, RECEIVER.receive(bytes(data))
+
+    def _next_seq(self):
+        self.__seq = (self.__seq + 1) & MAX_SEQ
+
+        return self.__seq
+
+    def _send_pipelined(self, outstanding, image_path, encoded, attempt=0, frame_type=FrameType.IMAGE):
+        seq = self._next_seq()
+        outstanding[seq] = (image_path, encoded, attempt, frame_type)
+
+        if frame_type == FrameType.HAVE:
+            frame = pack_frame(frame_type, seq, encoded.digest)
+        else:
+            frame = pack_frame(frame_type, seq, encoded.data, meta=encoded.meta.pack())
+
+        self.client.sendall(frame)
+
+    def _receive_pipelined(self, outstanding, responses):
+        log = self.create_logger()
+
+        flags, seq, response = self.receive_envelope()
+        log.debug(f'Received response {response} for frame {seq}')
+
+        if seq not in outstanding:
+            log.warning(f'Received a response for unknown frame {seq}')
+            return
+
+        if flags & AckFlag.CUMULATIVE:
+            settled = []
+
+            while True:
+                settled_seq, entry = outstanding.popitem(last=False)
+                settled.append(entry)
+
+                if settled_seq == seq:
+                    break
+        else:
+            settled = [outstanding.pop(seq)]
+
+        for image_path, encoded, attempt, frame_type in settled:
+            if isinstance(response, ProceedAck):
+                log.debug(f'Server does not have "{image_path}", sending it')
+                self._send_pipelined(outstanding, image_path, encoded)
+                continue
+
+            if isinstance(response, BusyAck) and attempt < self.busy_retries:
+                delay = self.backoff_delay(response, attempt)
+                log.info(f'Server is busy, retrying "{image_path}" in {delay:.2f}s '
+                         f'(attempt {attempt + 1} of {self.busy_retries})')
+
+                time.sleep(delay)
+                self._send_pipelined(outstanding, image_path, encoded, attempt + 1, frame_type)
+                continue
+
+            if response.status not in [b'OK', 'OK']:
+                log.warning(f'Received response status is not OK for "{image_path}": {response}')
+
+            responses[image_path] = response
+
+    def backoff_delay(self, ack, attempt):
+        """
+        Return how long to wait before resending a frame the server was too busy to accept.
+
+        The delay grows exponentially with each attempt, is never shorter than the server's retry-after hint, and is
+        jittered so that many busy clients do not retry in lockstep.
+
+        Parameters:
+            ack (BusyAck):
+                The BUSY ACK received from the server.
+
+            attempt (int):
+                The number of retries already made for this frame.
+
+        Returns:
+            float:
+                The delay in seconds.
+        """
+        delay = min(self.BUSY_BACKOFF_BASE * (2 ** attempt), self.BUSY_BACKOFF_MAX)
+        delay = max(delay, ack.retry_after / 1000)
+
+        return delay + random.uniform(0, delay / 4)
+
+    def receive_response(self, retry_frame=None):
+        """
+        Receive the server's response to a frame.
+
+        If the server answers with a BUSY ACK and `retry_frame` is given, the client backs off (see
+        :meth:`backoff_delay`) and resends the frame, up to :attr:`busy_retries` times.
+
+        Parameters:
+            retry_frame (bytes, optional):
+                The frame to resend if the server is busy.
+
+        Returns:
+            Ack:
+                The server's response.
+        """
+        log = self.create_logger()
+        attempt = 0
 
         while True:
             log.debug('Receiving response')
-            part = self.client.recv(1024)
-            response += part
+            response = self.receive_ack()
+            log.debug('Response received')
 
-            if len(part) < 1024:
+            if not isinstance(response, BusyAck) or retry_frame is None or attempt >= self.busy_retries:
                 break
 
-        log.debug('Response received')
-        response = RECEIVER.receive(response)
+            delay = self.backoff_delay(response, attempt)
+            attempt += 1
+            log.info(f'Server is busy, retrying in {delay:.2f}s (attempt {attempt} of {self.busy_retries})')
+
+            time.sleep(delay)
+            self.client.sendall(retry_frame)
 
         if not isinstance(response, Ack) and not issubclass(response.__class__, Ack):
             log.error('Received response is not an Ack instance')
@@ -2,6 +2,7 @@ import sys
 from nepyc.client.config import Config
 from nepyc.client.client import ImageClient
 from nepyc.client.log_engine import CLIENT_LOGGER as ROOT_LOGGER
+from nepyc.common.utils.sockets import SocketOptions
 from nepyc.common.about.version import PYPI_VERSION_INFO
 
 
@@ -22,6 +23,11 @@ def main():
     client = ImageClient(
         host=CONFIG.host,
         port=int(CONFIG.port),
+        socket_options=SocketOptions(
+            nodelay=ARGS.tcp_nodelay,
+            recv_buffer=ARGS.recv_buffer,
+            send_buffer=ARGS.send_buffer
+        ),
     )
 
     try:
@@ -33,6 +39,15 @@ def main():
         sys.exit(1)
 
 
-    client.send_image(ARGS.image_path)
+    if ARGS.archive > 0:
+        client.send_archive(ARGS.image_path, batch=ARGS.archive)
+    elif ARGS.chunk_size > 0:
+        for image_path in ARGS.image_path:
+            client.send_image_resumable(image_path, chunk_size=ARGS.chunk_size)
+    elif ARGS.window > 1 or ARGS.negotiate:
+        client.send_images(ARGS.image_path, window=ARGS.window, negotiate=ARGS.negotiate)
+    else:
+        for image_path in ARGS.image_path:
+            client.send_image(image_path)
 
     client.close()
@@ -0,0 +1,215 @@
+"""
+Helpers for reading exact amounts of data from blocking sockets, and the transport options applied to the sockets of
+both the server and the client.
+
+Example Usage:
+    >>> from nepyc.common.utils.sockets import recv_exactly
+    >>> header = recv_exactly(sock, 4)
+
+    >>> from nepyc.common.utils.sockets import SocketOptions
+    >>> options = SocketOptions(recv_buffer=4 * 1024 * 1024)
+    >>> options.configure(sock)
+"""
+import socket
+from dataclasses import dataclass
+
+
+# The default number of bytes requested from the socket per `recv_into` call.
+DEFAULT_READ_SIZE = 64 * 1024
+
+
+def recv_into_exactly(sock: socket.socket, view: memoryview, read_size: int = DEFAULT_READ_SIZE) -> int:
+    """
+    Fill `view` from `sock` using `recv_into`, without any intermediate copies.
+
+    Parameters:
+        sock (socket.socket):
+            The socket to read from.
+
+        view (memoryview):
+            The writable buffer to fill. It is filled completely unless the peer closes the connection first.
+
+        read_size (int, optional):
+            The maximum number of bytes requested per `recv_into` call. Defaults to 64 KiB.
+
+    Returns:
+        int:
+            The number of bytes received. This is less than `len(view)` only if the peer closed the connection.
+    """
+    size     = len(view)
+    received = 0
+
+    while received < size:
+        count = sock.recv_into(view[received:], min(size - received, read_size))
+
+        if not count:
+            break
+
+        received += count
+
+    return received
+
+
+def recv_exactly(sock: socket.socket, size: int, read_size: int = DEFAULT_READ_SIZE):
+    """
+    Receive exactly `size` bytes from `sock` into a single preallocated buffer. Short reads are retried until the buffer
+    is full.
+
+    Parameters:
+        sock (socket.socket):
+            The socket to read from.
+
+        size (int):
+            The number of bytes to receive.
+
+        read_size (int, optional):
+            The maximum number of bytes requested per `recv_into` call. Defaults to 64 KiB.
+
+    Returns:
+        bytearray:
+            The received bytes, or None if the peer closed the connection before `size` bytes arrived.
+    """
+    buffer = bytearray(size)
+
+    if recv_into_exactly(sock, memoryview(buffer), read_size) < size:
+        return None
+
+    return buffer
+
+
+def recv_discard(sock: socket.socket, size: int, read_size: int = DEFAULT_READ_SIZE) -> int:
+    """
+    Read and drop `size` bytes from `sock`, using a single scratch buffer of at most `read_size` bytes.
+
+    Parameters:
+        sock (socket.socket):
+            The socket to read from.
+
+        size (int):
+            The number of bytes to discard.
+
+        read_size (int, optional):
+            The size of the scratch buffer. Defaults to 64 KiB.
+
+    Returns:
+        int:
+            The number of bytes discarded. This is less than `size` only if the peer closed the connection.
+    """
+    scratch   = memoryview(bytearray(min(size, read_size)))
+    discarded = 0
+
+    while discarded < size:
+        count = sock.recv_into(scratch, min(size - discarded, len(scratch)))
+
+        if not count:
+            break
+
+        discarded += count
+
+    return discarded
+
+
+@dataclass(frozen=True)
+class SocketOptions:
+    """
+    The transport options applied to a connection's socket.
+
+    An ACK is a small write that follows a large read, which is the pattern Nagle's algorithm and delayed ACKs together
+    stall for up to the peer's delayed-ACK timeout, so `TCP_NODELAY` is on by default. Buffer sizes of zero leave the
+    kernel's defaults in place; on Linux that keeps buffer autotuning, which setting either size disables, so only set
+    them when autotuning is known to fall short (e.g. a long, fat link carrying multi-megabyte frames).
+
+    Options that only make sense for TCP (`TCP_NODELAY` and keepalive) are skipped for Unix domain sockets, as are
+    keepalive timings the platform does not support.
+
+    Attributes:
+        nodelay (bool):
+            Set `TCP_NODELAY`, disabling Nagle's algorithm.
+
+        keepalive (bool):
+            Set `SO_KEEPALIVE`, so a peer that vanished without closing its connection is eventually noticed.
+
+        keepalive_idle (int):
+            The number of seconds a connection must be idle before keepalive probes are sent.
+
+        keepalive_interval (int):
+            The number of seconds between keepalive probes.
+
+        keepalive_count (int):
+            The number of unanswered probes after which the connection is dropped.
+
+        recv_buffer (int):
+            The `SO_RCVBUF` size in bytes; zero for the kernel's default.
+
+        send_buffer (int):
+            The `SO_SNDBUF` size in bytes; zero for the kernel's default.
+
+        backlog (int):
+            The number of connections a listening socket queues before they are accepted.
+    """
+    nodelay:            bool = True
+    keepalive:          bool = True
+    keepalive_idle:     int  = 60
+    keepalive_interval: int  = 10
+    keepalive_count:    int  = 5
+    recv_buffer:        int  = 0
+    send_buffer:        int  = 0
+    backlog:            int  = 128
+
+    def configure(self, sock) -> None:
+        """
+        Apply the options to a connection's socket. Buffer sizes are best applied before the socket connects, since the
+        TCP window scale is fixed during the handshake.
+
+        Parameters:
+            sock (socket.socket | asyncio.trsock.TransportSocket):
+                The socket.
+
+        Returns:
+            None
+        """
+        self.configure_buffers(sock)
+
+        if sock.family not in (socket.AF_INET, socket.AF_INET6):
+            return
+
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(self.nodelay))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, int(self.keepalive))
+
+        if not self.keepalive:
+            return
+
+        for name, value in (
+                ('TCP_KEEPIDLE',  self.keepalive_idle),
+                ('TCP_KEEPINTVL', self.keepalive_interval),
+                ('TCP_KEEPCNT',   self.keepalive_count)
+        ):
+            if hasattr(socket, name):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+
+    def configure_buffers(self, sock) -> None:
+        """
+        Apply the buffer sizes to a socket. Applied to a listening socket, they are inherited by the connections it
+        accepts, and the receive buffer size is the one their handshake is sized by.
+
+        Parameters:
+            sock (socket.socket | asyncio.trsock.TransportSocket):
+                The socket.
+
+        Returns:
+            None
+        """
+        if self.recv_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+
+        if self.send_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+
+
+__all__ = [
+    'DEFAULT_READ_SIZE',
+    'SocketOptions',
+    'recv_discard',
+    'recv_exactly',
+    'recv_into_exactly',
+]
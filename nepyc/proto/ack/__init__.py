@@ -1,24 +1,45 @@
-from nepyc.proto.ack.models.reject import RejectAck, InvalidAck, DuplicateAck, REJECT_ACK_MAP
+from nepyc.proto.ack.models.reject import RejectAck, InvalidAck, DuplicateAck, BusyAck, LimitAck, ThrottleAck, REJECT_ACK_MAP
 from nepyc.proto.ack.models.base import Ack
-from nepyc.proto.ack.models.ok import OKAck
+from nepyc.proto.ack.models.ok import OKAck, ProceedAck, OffsetAck, SummaryAck, OK_ACK_MAP
 from nepyc.proto.ack.receiver import RECEIVER
 from nepyc.proto.ack.dispatcher import DISPATCHER
 
 
 ACK_MAP = {
     OKAck.full_code: OKAck,
+    ProceedAck.full_code: ProceedAck,
+    OffsetAck.full_code: OffsetAck,
+    SummaryAck.full_code: SummaryAck,
     RejectAck.full_code: RejectAck,
     InvalidAck.full_code: InvalidAck,
-    DuplicateAck.full_code: DuplicateAck
+    DuplicateAck.full_code: DuplicateAck,
+    BusyAck.full_code: BusyAck,
+    LimitAck.full_code: LimitAck,
+    ThrottleAck.full_code: ThrottleAck
 
 }
 
+# The ACK types by the numeric status code they are identified by on the wire.
+CODE_MAP = {
+    ack.CODE: ack
+    for ack in (
+        OKAck, ProceedAck, OffsetAck, SummaryAck, RejectAck, InvalidAck, DuplicateAck, BusyAck, LimitAck, ThrottleAck
+    )
+}
+
 
 
 __all__ = [
+    'CODE_MAP',
     'Ack',
     'OKAck',
+    'ProceedAck',
+    'OffsetAck',
+    'SummaryAck',
     'RejectAck',
     'InvalidAck',
-    'DuplicateAck'
+    'DuplicateAck',
+    'BusyAck',
+    'LimitAck',
+    'ThrottleAck'
 ]
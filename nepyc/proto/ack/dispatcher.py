@@ -1,30 +1,39 @@
 from nepyc.proto.ack import Ack
+from nepyc.proto.ack.journal import AckJournal
 
 
 class AckDispatcher:
     """Singleton class responsible for dispatching acknowledgment messages."""
 
     _instance = None
-    _ack_store = {}  # A store to keep track of dispatched ACKs by UUID
+    _ack_store = AckJournal()  # A bounded journal of recently dispatched ACKs by sequence id
 
     def __new__(cls):
         if not cls._instance:
             cls._instance = super(AckDispatcher, cls).__new__(cls)
         return cls._instance
 
-    def dispatch(self, ack_type: Ack):
+    def dispatch(self, ack_type: Ack, **kwargs):
         """
-        Create an ACK, assign a UUID, and store it in the dispatcher.
+        Create an ACK, assign a sequence id, and store it in the dispatcher.
+        Any keyword arguments are passed to the ACK type (e.g. `retry_after` for a BusyAck).
         """
-        ack = ack_type()  # Create an instance of the ACK type
-        self._ack_store[ack.uuid] = ack
+        ack = ack_type(**kwargs)  # Create an instance of the ACK type
+        self._ack_store.add(ack.seq, ack)
         return ack
 
-    def get_ack(self, uuid: str) -> Ack:
+    def get_ack(self, seq: int) -> Ack:
         """
-        Retrieve an ACK by its UUID.
+        Retrieve an ACK by its sequence id; None if it was never dispatched or has been evicted from the journal.
         """
-        return self._ack_store.get(uuid)
+        return self._ack_store.get(seq)
+
+    @property
+    def journal(self) -> AckJournal:
+        """
+        The journal of recently dispatched ACKs, along with its hit and eviction counters.
+        """
+        return self._ack_store
 
     def serialize_ack(self, ack: Ack) -> bytes:
         """
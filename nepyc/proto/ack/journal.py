@@ -0,0 +1,245 @@
+"""
+This module contains a bounded, expiring store of ACKs, keyed by their sequence id.
+
+The dispatcher and the receiver keep the ACKs they have handled so they can be looked up by id afterwards, but a
+long-running process handles an unbounded number of them. A journal keeps at most `capacity` entries, each for at most
+`ttl` seconds, evicting the oldest first, so its memory use stays flat however many ACKs pass through it.
+
+Example Usage:
+    >>> from nepyc.proto.ack.journal import AckJournal
+    >>> journal = AckJournal(capacity=2, ttl=60)
+    >>> journal.add(1, 'a'); journal.add(2, 'b'); journal.add(3, 'c')
+    >>> journal.get(1) is None, journal.get(3)
+    (True, 'c')
+    >>> journal.evictions
+    1
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class AckJournal:
+    """
+    A thread-safe journal of at most `capacity` entries, each kept for at most `ttl` seconds.
+
+    Entries are kept in insertion order, so the oldest entry is always at the front; adding to a full journal evicts it,
+    and expired entries are evicted from the front whenever the journal is touched. Lookups and insertions are O(1),
+    amortized over the evictions.
+
+    Attributes:
+        capacity (int):
+            The maximum number of entries kept.
+
+        ttl (float):
+            The number of seconds an entry is kept for. Zero keeps entries until they are pushed out by newer ones.
+
+        hits (int):
+            The number of lookups that found their entry.
+
+        misses (int):
+            The number of lookups that did not.
+
+        evictions (int):
+            The number of entries dropped because the journal was full or they had expired.
+    """
+    DEFAULT_CAPACITY = 4096
+    DEFAULT_TTL      = 300.0
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, ttl: float = DEFAULT_TTL, clock=time.monotonic):
+        """
+        Initialize the journal.
+
+        Parameters:
+            capacity (int, optional):
+                The maximum number of entries kept. Defaults to 4096.
+
+            ttl (float, optional):
+                The number of seconds an entry is kept for; zero for no expiry. Defaults to 300.
+
+            clock (Callable[[], float], optional):
+                The monotonic clock entries are timed with. Defaults to :func:`time.monotonic`.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError:
+                If `capacity` is less than one or `ttl` is negative.
+        """
+        if capacity < 1:
+            raise ValueError('The capacity must be at least 1')
+
+        if ttl < 0:
+            raise ValueError('The TTL must not be negative')
+
+        self.__capacity  = capacity
+        self.__clock     = clock
+        self.__entries   = OrderedDict()
+        self.__evictions = 0
+        self.__hits      = 0
+        self.__lock      = threading.Lock()
+        self.__misses    = 0
+        self.__ttl       = ttl
+
+    def __len__(self) -> int:
+        with self.__lock:
+            self._expire(self.__clock())
+
+            return len(self.__entries)
+
+    @property
+    def capacity(self) -> int:
+        """
+        Return the maximum number of entries kept.
+
+        Returns:
+            int:
+                The capacity.
+        """
+        return self.__capacity
+
+    @property
+    def evictions(self) -> int:
+        """
+        Return the number of entries dropped because the journal was full or they had expired.
+
+        Returns:
+            int:
+                The number of evictions.
+        """
+        return self.__evictions
+
+    @property
+    def hits(self) -> int:
+        """
+        Return the number of lookups that found their entry.
+
+        Returns:
+            int:
+                The number of hits.
+        """
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        """
+        Return the number of lookups that did not find their entry.
+
+        Returns:
+            int:
+                The number of misses.
+        """
+        return self.__misses
+
+    @property
+    def ttl(self) -> float:
+        """
+        Return the number of seconds an entry is kept for.
+
+        Returns:
+            float:
+                The TTL; zero if entries do not expire.
+        """
+        return self.__ttl
+
+    def add(self, key, value) -> None:
+        """
+        Add an entry, replacing any entry with the same key, and evict the oldest entry if the journal is full.
+
+        Parameters:
+            key (Hashable):
+                The key; an ACK's sequence id.
+
+            value:
+                The value; the ACK.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            now = self.__clock()
+            self._expire(now)
+
+            self.__entries.pop(key, None)
+            self.__entries[key] = (now, value)
+
+            while len(self.__entries) > self.__capacity:
+                self.__entries.popitem(last=False)
+                self.__evictions += 1
+
+    def get(self, key, default=None):
+        """
+        Look up an entry.
+
+        Parameters:
+            key (Hashable):
+                The key.
+
+            default (optional):
+                Returned if there is no (unexpired) entry for `key`. Defaults to None.
+
+        Returns:
+            The value of the entry, or `default`.
+        """
+        with self.__lock:
+            self._expire(self.__clock())
+            entry = self.__entries.get(key)
+
+            if entry is None:
+                self.__misses += 1
+
+                return default
+
+            self.__hits += 1
+
+            return entry[1]
+
+    def clear(self) -> None:
+        """
+        Remove every entry. The counters are kept.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Return the journal's size and counters.
+
+        Returns:
+            dict:
+                The number of entries, and the hit, miss and eviction counts.
+        """
+        with self.__lock:
+            self._expire(self.__clock())
+
+            return {
+                'size':      len(self.__entries),
+                'hits':      self.__hits,
+                'misses':    self.__misses,
+                'evictions': self.__evictions,
+            }
+
+    def _expire(self, now: float) -> None:
+        """
+        Evict expired entries from the front of the journal. Must be called with the lock held.
+        """
+        if not self.__ttl:
+            return
+
+        while self.__entries:
+            added, _ = next(iter(self.__entries.values()))
+
+            if now - added < self.__ttl:
+                break
+
+            self.__entries.popitem(last=False)
+            self.__evictions += 1
+
+
+__all__ = [
+    'AckJournal',
+]
@@ -1,3 +1,3 @@
 from nepyc.proto.ack.models.base import Ack
-from nepyc.proto.ack.models.ok import OKAck
-from nepyc.proto.ack.models.reject import RejectAck, DuplicateAck, InvalidAck
+from nepyc.proto.ack.models.ok import OKAck, ProceedAck, OffsetAck, SummaryAck
+from nepyc.proto.ack.models.reject import RejectAck, DuplicateAck, InvalidAck, BusyAck, LimitAck, ThrottleAck
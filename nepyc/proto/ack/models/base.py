@@ -1,16 +1,35 @@
+import itertools
 import struct
-import uuid
+
+
+# Length of the rest of the ACK, wire format version, status code, sequence id. Any type-specific payload follows.
+WIRE_FORMAT = struct.Struct('!HBBQ')
+
+# The size of the length field at the start of every ACK.
+WIRE_LENGTH = struct.Struct('!H')
+
+WIRE_VERSION = 1
+
+# Sequence ids wrap around after this value.
+MAX_SEQ = 0xFFFFFFFFFFFFFFFF
+
+_SEQUENCE = itertools.count(1)
 
 
 class Ack:
     """
     Base class for all ACK messages.
+
+    On the wire an ACK is a single :data:`WIRE_FORMAT` header, carrying its own length, the wire format version, the
+    numeric status code (:attr:`CODE`) of the ACK type and a 64-bit sequence id, followed by the type-specific payload,
+    if any. A receiver reads the fixed-size header, then exactly :meth:`payload_size` more bytes.
     """
     PARENT_CODE = b'ACK'
+    CODE = 0x00
     status = 'UNKNOWN'
 
     def __init__(self):
-        self.__uuid = uuid.uuid4().hex  # UUID for identifying the message
+        self.__seq = next(_SEQUENCE) & MAX_SEQ  # Sequence id for identifying the message
         self.children = {}
 
     @property
@@ -26,52 +45,77 @@ class Ack:
         return getattr(self, 'CHILD_CODE', b'')  # If no child, return an empty byte string
 
     @property
-    def uuid(self) -> str:
-        """Returns the UUID as a string (metadata only)."""
-        return self.__uuid
+    def seq(self) -> int:
+        """Returns the sequence id of the message (metadata only)."""
+        return self.__seq
 
     def to_bytes(self) -> bytes:
         """
         Convert the ACK object to bytes for serialization.
-        Serializes only the full_code and child code, excluding UUID for serialization purposes.
+        Serializes a :data:`WIRE_FORMAT` header, followed by any payload the ACK type carries.
         """
-        full_code = self.full_code
-        uuid_bytes = self.uuid.encode('utf-8')
-        return (
-            struct.pack('!B', len(full_code))
-            + full_code
-            + struct.pack('!B', len(uuid_bytes))
-            + uuid_bytes
-        )
+        payload = self.payload_bytes()
+
+        return WIRE_FORMAT.pack(
+            WIRE_FORMAT.size - WIRE_LENGTH.size + len(payload),
+            WIRE_VERSION,
+            self.CODE,
+            self.seq
+        ) + payload
+
+    def payload_bytes(self) -> bytes:
+        """Return the type-specific payload that follows the header; empty unless overridden."""
+        return b''
+
+    def load_payload(self, data: bytes) -> None:
+        """Load the type-specific payload that follows the header; a no-op unless overridden."""
+
+    @staticmethod
+    def payload_size(header) -> int:
+        """
+        Return the number of payload bytes that follow a :data:`WIRE_FORMAT` header on the wire.
+
+        Parameters:
+            header (bytes | bytearray | memoryview):
+                At least the first :attr:`WIRE_FORMAT.size` bytes of an ACK.
+
+        Returns:
+            int:
+                The size of the payload.
+
+        Raises:
+            ValueError:
+                If the header declares a length shorter than the header itself.
+        """
+        size = WIRE_LENGTH.unpack_from(header)[0] - (WIRE_FORMAT.size - WIRE_LENGTH.size)
+
+        if size < 0:
+            raise ValueError('ACK length is shorter than its header')
+
+        return size
 
     @classmethod
     def from_bytes(cls, data: bytes) -> 'Ack':
         """
         Deserialize an ACK from a byte string.
-        Only the full_code will be used to identify the ACK.
+        Only the status code will be used to identify the ACK.
         """
-        from nepyc.proto.ack import REJECT_ACK_MAP, OKAck
-        ack = None
+        from nepyc.proto.ack import CODE_MAP
 
-        full_code_length = struct.unpack('!B', data[:1])[0]
-        full_code = data[1:1 + full_code_length]
-        parent_code, child_code = full_code.split(b':', 1) if b':' in full_code else (full_code, b'')
-        if parent_code == b'REJ':
-            if child_code in REJECT_ACK_MAP.keys():
-                ack = REJECT_ACK_MAP[child_code]()
-            else:
-                raise ValueError(f'Unknown REJECT code: {child_code}')
+        if len(data) < WIRE_FORMAT.size:
+            raise ValueError(f'ACK of {len(data)} bytes is shorter than its header')
 
-        elif child_code == b'OK':
-            ack = OKAck()
+        length, version, code, seq = WIRE_FORMAT.unpack_from(data)
 
-        if not ack:
-            raise ValueError(f'Unknown ACK code: {full_code}')
+        if version != WIRE_VERSION:
+            raise ValueError(f'Unsupported ACK wire format version: {version}')
 
-        uuid_length = struct.unpack('!B', data[1 + full_code_length:2 + full_code_length])[0]
-        uuid_str = data[2 + full_code_length:2 + full_code_length + uuid_length].decode('utf-8')
+        if code not in CODE_MAP:
+            raise ValueError(f'Unknown ACK code: {code:#04x}')
 
-        ack.__uuid = uuid_str  # Assign UUID from the deserialized data
+        ack = CODE_MAP[code]()
+        ack.__seq = seq  # Assign the sequence id from the deserialized data
+        ack.load_payload(bytes(data[WIRE_FORMAT.size:WIRE_LENGTH.size + length]))
 
         return ack
 
@@ -86,7 +130,7 @@ class Ack:
         self.children[child_code] = child_ack
 
     def __repr__(self):
-        return f'<{self.__class__.__name__} {self.full_code.decode("utf-8")}> {self.status} (...{self.uuid[-6:]})'
+        return f'<{self.__class__.__name__} {self.full_code.decode("utf-8")}> {self.status} (#{self.seq})'
 
     def __str__(self):
         desc_prefix = ' - '
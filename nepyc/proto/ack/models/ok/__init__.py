@@ -1,6 +1,21 @@
 from nepyc.proto.ack.models.ok.base import OKAck
+from nepyc.proto.ack.models.ok.proceed import ProceedAck
+from nepyc.proto.ack.models.ok.offset import OffsetAck
+from nepyc.proto.ack.models.ok.summary import SummaryAck
+
+OKAckMap = {
+    b'OK': OKAck,
+    b'SND': ProceedAck,
+    b'OFF': OffsetAck,
+    b'SUM': SummaryAck
+}
+
+OK_ACK_MAP = OKAckMap
 
 
 __all__ = [
-    'OKAck'
+    'OKAck',
+    'ProceedAck',
+    'OffsetAck',
+    'SummaryAck'
 ]
@@ -3,5 +3,6 @@ from nepyc.proto.ack.models.base import Ack
 
 class OKAck(Ack):
     CHILD_CODE = b'OK'
+    CODE = 0x01
     DESCRIPTION = b'Successful Operation'
     status = 'OK'
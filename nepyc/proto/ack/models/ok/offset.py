@@ -0,0 +1,26 @@
+import struct
+from nepyc.proto.ack.models.base import Ack
+
+
+class OffsetAck(Ack):
+    """
+    Sent in answer to UPLOAD and CHUNK frames while a chunked upload is incomplete. It carries the number of bytes of the
+    upload the server has committed, which is where the client should send its next chunk from.
+    """
+    CHILD_CODE = b'OFF'
+    CODE = 0x03
+    DESCRIPTION = b'Upload incomplete; send the data from the committed offset'
+    status = 'OFFSET'
+
+    OFFSET_FORMAT = struct.Struct('!Q')
+
+    def __init__(self, offset: int = 0):
+        super().__init__()
+        self.offset = offset
+
+    def payload_bytes(self) -> bytes:
+        return self.OFFSET_FORMAT.pack(self.offset)
+
+    def load_payload(self, data: bytes) -> None:
+        if len(data) >= self.OFFSET_FORMAT.size:
+            self.offset = self.OFFSET_FORMAT.unpack_from(data)[0]
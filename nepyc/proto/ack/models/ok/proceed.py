@@ -0,0 +1,11 @@
+from nepyc.proto.ack.models.base import Ack
+
+
+class ProceedAck(Ack):
+    """
+    Sent in answer to a HAVE frame when the server does not have the image yet; the client should send it.
+    """
+    CHILD_CODE = b'SND'
+    CODE = 0x02
+    DESCRIPTION = b'Image not found; send the image data'
+    status = 'SEND'
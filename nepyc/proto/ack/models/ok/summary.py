@@ -0,0 +1,42 @@
+from nepyc.proto.ack.models.base import WIRE_FORMAT, WIRE_LENGTH, Ack
+
+
+class SummaryAck(Ack):
+    """
+    Sent in answer to a TAR frame, once every image in the archive has been processed. It carries one outcome per image,
+    in the order the images appear in the archive: the status code (:attr:`Ack.CODE`) of the ACK the image would have
+    been answered with had it been sent on its own. Members that are not regular files are skipped, and are not listed.
+
+    An archive with more images than :attr:`MAX_MEMBERS` is only processed up to that many; the images after them are
+    not listed, and should be sent again.
+    """
+    CHILD_CODE = b'SUM'
+    CODE = 0x04
+    DESCRIPTION = b'Archive processed; one outcome per image'
+    status = 'SUMMARY'
+
+    # As many outcomes as fit in a single ACK.
+    MAX_MEMBERS = 2 ** (8 * WIRE_LENGTH.size) - 1 - (WIRE_FORMAT.size - WIRE_LENGTH.size)
+
+    def __init__(self, outcomes=()):
+        super().__init__()
+        self.outcomes = list(outcomes)
+
+    @property
+    def statuses(self) -> list:
+        """
+        Return the status of every image in the archive, e.g. 'OK', 'DUPLICATE' or 'INVALID'.
+
+        Returns:
+            list[str]:
+                The statuses, in archive order.
+        """
+        from nepyc.proto.ack import CODE_MAP
+
+        return [CODE_MAP[code].status if code in CODE_MAP else Ack.status for code in self.outcomes]
+
+    def payload_bytes(self) -> bytes:
+        return bytes(self.outcomes)
+
+    def load_payload(self, data: bytes) -> None:
+        self.outcomes = list(data)
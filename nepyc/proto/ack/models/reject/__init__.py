@@ -2,10 +2,16 @@
 from nepyc.proto.ack.models.reject.base import RejectAck
 from nepyc.proto.ack.models.reject.invalid import InvalidAck
 from nepyc.proto.ack.models.reject.duplicate import DuplicateAck
+from nepyc.proto.ack.models.reject.busy import BusyAck
+from nepyc.proto.ack.models.reject.limit import LimitAck
+from nepyc.proto.ack.models.reject.throttle import ThrottleAck
 
 RejectAckMap = {
     b'DUP': DuplicateAck,
-    b'INV': InvalidAck
+    b'INV': InvalidAck,
+    b'BSY': BusyAck,
+    b'LIM': LimitAck,
+    b'THR': ThrottleAck
 }
 
 REJECT_ACK_MAP = RejectAckMap
@@ -14,5 +20,8 @@ REJECT_ACK_MAP = RejectAckMap
 __all__ = [
     'RejectAck',
     'InvalidAck',
-    'DuplicateAck'
+    'DuplicateAck',
+    'BusyAck',
+    'LimitAck',
+    'ThrottleAck'
 ]
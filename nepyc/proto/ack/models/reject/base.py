@@ -4,6 +4,7 @@ from nepyc.proto.ack.models.base import Ack
 class RejectAck(Ack):
     PARENT_CODE = b'REJ'
     CHILD_CODE = b'REJ'
+    CODE = 0x40
     DESCRIPTION = b'Image data received and rejected.'
     status = 'ERROR'
 
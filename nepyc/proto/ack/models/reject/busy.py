@@ -0,0 +1,27 @@
+import struct
+from nepyc.proto.ack.models.reject.base import RejectAck
+
+
+class BusyAck(RejectAck):
+    """
+    Sent when the server's ingest queue is full. The frame was not processed and should be sent again once
+    `retry_after` milliseconds have passed.
+    """
+    CHILD_CODE = b'BSY'
+    CODE = 0x43
+    DESCRIPTION = b'Server is busy; retry the image data later.'
+    status = 'BUSY'
+
+    DEFAULT_RETRY_AFTER = 500
+    RETRY_AFTER_FORMAT = struct.Struct('!I')
+
+    def __init__(self, retry_after: int = DEFAULT_RETRY_AFTER):
+        super().__init__()
+        self.retry_after = retry_after
+
+    def payload_bytes(self) -> bytes:
+        return self.RETRY_AFTER_FORMAT.pack(self.retry_after)
+
+    def load_payload(self, data: bytes) -> None:
+        if len(data) >= self.RETRY_AFTER_FORMAT.size:
+            self.retry_after = self.RETRY_AFTER_FORMAT.unpack_from(data)[0]
@@ -3,6 +3,7 @@ from nepyc.proto.ack.models.reject.base import RejectAck
 
 class DuplicateAck(RejectAck):
     CHILD_CODE = b'DUP'
+    CODE = 0x42
     DESCRIPTION = b'Rejected due to the presence of duplicate image data'
     status = 'DUPLICATE'
 
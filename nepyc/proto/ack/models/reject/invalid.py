@@ -3,5 +3,6 @@ from nepyc.proto.ack.models.reject.base import RejectAck
 
 class InvalidAck(RejectAck):
     CHILD_CODE = b'INV'
+    CODE = 0x41
     DESCRIPTION = b'Invalid image data received.'
     status = 'INVALID'
@@ -0,0 +1,12 @@
+from nepyc.proto.ack.models.reject.base import RejectAck
+
+
+class LimitAck(RejectAck):
+    """
+    Sent when an image is larger than the server accepts or in a format it does not accept. Extended frames that
+    declare such an image are answered before their data is received.
+    """
+    CHILD_CODE = b'LIM'
+    CODE = 0x44
+    DESCRIPTION = b'Rejected; the image exceeds the server\'s limits'
+    status = 'LIMIT'
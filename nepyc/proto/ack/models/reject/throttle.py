@@ -0,0 +1,13 @@
+from nepyc.proto.ack.models.reject.busy import BusyAck
+
+
+class ThrottleAck(BusyAck):
+    """
+    Sent when a client is sending images or bytes faster than the server's per-client rate limits allow. The frame was
+    not processed and should be sent again once `retry_after` milliseconds have passed; clients that retry BUSY frames
+    retry these the same way.
+    """
+    CHILD_CODE = b'THR'
+    CODE = 0x45
+    DESCRIPTION = b'Client is over its rate limit; retry the image data later.'
+    status = 'THROTTLED'
@@ -1,11 +1,12 @@
 from nepyc.proto.ack import Ack
+from nepyc.proto.ack.journal import AckJournal
 
 
 class AckReceiver:
     """Singleton class responsible for receiving and processing acknowledgment messages."""
 
     _instance = None
-    _received_acks = {}  # A store to keep track of received ACKs by UUID
+    _received_acks = AckJournal()  # A bounded journal of recently received ACKs by sequence id
 
     def __new__(cls):
         if not cls._instance:
@@ -17,14 +18,21 @@ class AckReceiver:
         Receive serialized data, deserialize it, and store the ACK message.
         """
         ack = Ack.from_bytes(data)
-        self._received_acks[ack.uuid] = ack
+        self._received_acks.add(ack.seq, ack)
         return ack
 
-    def get_received_ack(self, uuid: str) -> Ack:
+    def get_received_ack(self, seq: int) -> Ack:
         """
-        Retrieve a received ACK by its UUID.
+        Retrieve a received ACK by its sequence id; None if it was never received or has been evicted from the journal.
         """
-        return self._received_acks.get(uuid)
+        return self._received_acks.get(seq)
+
+    @property
+    def journal(self) -> AckJournal:
+        """
+        The journal of recently received ACKs, along with its hit and eviction counters.
+        """
+        return self._received_acks
 
 
 RECEIVER = AckReceiver()
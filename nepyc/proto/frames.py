@@ -0,0 +1,321 @@
+"""
+This module defines the extended frame format used for pipelined uploads.
+
+A legacy frame is a 4-byte big-endian length followed by the image data, and is answered by exactly one bare ACK
+before the client sends the next frame. An extended frame starts with the 4-byte :data:`PREFIX` instead, which can
+never be mistaken for a legacy length (it would declare a frame of almost 4 GiB), followed by a :data:`FRAME_HEADER`
+carrying the frame type, a sequence id chosen by the client, and the sizes of the type-specific metadata and body that
+follow it.
+
+Extended frames are answered with ACK envelopes: the same :data:`PREFIX`, an :data:`ACK_HEADER` carrying the sequence
+id of the frame being acknowledged, and the serialized ACK. Envelopes may arrive in any order. An envelope with the
+:attr:`AckFlag.CUMULATIVE` flag set acknowledges its own frame *and* every frame sent before it on the same connection
+that has not been acknowledged yet, all with the same ACK.
+
+A client that suspects the server already has an image can send a HAVE frame first, whose body is the image's
+:func:`pixel_digest`. The server answers with a `REJ:DUP` ACK if it already has the image, so its data never has to be
+sent, or with an `ACK:SND` ACK if it should be sent as an IMAGE frame.
+
+An IMAGE frame may declare its format and dimensions in an :class:`ImageMeta`, so the server can refuse an image that is
+over its limits before receiving it.
+
+A large image can instead be uploaded in chunks that survive a dropped connection. An UPLOAD frame, with an empty body
+and an :data:`UPLOAD_META` declaring the upload's id and total size, opens the upload (or finds the one already open
+under that id) and is answered with an `ACK:OFF` ACK carrying the number of bytes the server has committed. Each CHUNK
+frame carries a :data:`CHUNK_META` with the upload's id and the offset its body starts at, and is answered with the new
+committed offset; the chunk that completes the upload is answered with the ACK for the image instead.
+
+Many small images can be sent at once in a TAR frame, whose body is a tar archive (optionally gzip, bzip2 or xz
+compressed) of image files. The server reads the archive as it arrives, one member at a time, and answers the whole
+frame with a single `ACK:SUM` ACK listing the outcome of every image in it.
+
+Example Usage:
+    >>> from nepyc.proto.frames import FrameType, pack_frame
+    >>> frame = pack_frame(FrameType.IMAGE, 1, b'...')
+"""
+import hashlib
+import struct
+from dataclasses import dataclass
+from enum import IntEnum, IntFlag
+
+
+MAGIC = b'\xffNP'
+VERSION = 1
+
+# The first four bytes of every extended frame and ACK envelope.
+PREFIX = MAGIC + bytes([VERSION])
+
+# Type, flags, sequence id, metadata size, body size.
+FRAME_HEADER = struct.Struct('!BBIHI')
+
+# Flags, sequence id, ACK size.
+ACK_HEADER = struct.Struct('!BII')
+
+# The size of the digest carried by a HAVE frame; see `pixel_digest`.
+HAVE_DIGEST_SIZE = 16
+
+# Format name (NUL-padded ASCII), width, height.
+IMAGE_META = struct.Struct('!8sII')
+
+# Upload id, total size in bytes.
+UPLOAD_META = struct.Struct('!16sQ')
+
+# Upload id, offset of the chunk in the upload.
+CHUNK_META = struct.Struct('!16sQ')
+
+# The size of the id a client chooses for a chunked upload.
+UPLOAD_ID_SIZE = 16
+
+# Sequence ids wrap around after this value.
+MAX_SEQ = 0xFFFFFFFF
+
+
+class FrameType(IntEnum):
+    """
+    The kinds of extended frame a client can send.
+    """
+    IMAGE = 1
+    HAVE = 2
+    UPLOAD = 3
+    CHUNK = 4
+    TAR = 5
+
+
+class AckFlag(IntFlag):
+    """
+    Flags carried in an ACK envelope.
+    """
+    NONE = 0
+    CUMULATIVE = 0x01
+
+
+@dataclass(frozen=True)
+class FrameHeader:
+    """
+    The header of an extended frame, as it appears on the wire after :data:`PREFIX`.
+
+    Attributes:
+        type (int):
+            The frame type; one of :class:`FrameType`.
+
+        flags (int):
+            Frame flags; reserved, always 0.
+
+        seq (int):
+            The sequence id chosen by the client, echoed in the ACK envelope for this frame.
+
+        meta_size (int):
+            The size (in bytes) of the type-specific metadata that follows the header.
+
+        body_size (int):
+            The size (in bytes) of the body that follows the metadata.
+    """
+    type: int
+    flags: int
+    seq: int
+    meta_size: int
+    body_size: int
+
+    def pack(self) -> bytes:
+        """
+        Serialize the header, without the prefix.
+
+        Returns:
+            bytes:
+                The serialized header.
+        """
+        return FRAME_HEADER.pack(self.type, self.flags, self.seq, self.meta_size, self.body_size)
+
+    @classmethod
+    def unpack(cls, data) -> 'FrameHeader':
+        """
+        Deserialize a header received after the prefix.
+
+        Parameters:
+            data (bytes | bytearray | memoryview):
+                Exactly :attr:`FRAME_HEADER.size` bytes.
+
+        Returns:
+            FrameHeader:
+                The deserialized header.
+        """
+        return cls(*FRAME_HEADER.unpack(data))
+
+
+@dataclass(frozen=True)
+class ImageMeta:
+    """
+    The metadata an IMAGE frame may declare about its image.
+
+    Attributes:
+        format (str):
+            The image format, as named by Pillow (e.g. 'PNG').
+
+        width (int):
+            The width of the image in pixels; 0 if undeclared.
+
+        height (int):
+            The height of the image in pixels; 0 if undeclared.
+    """
+    format: str
+    width: int = 0
+    height: int = 0
+
+    def pack(self) -> bytes:
+        """
+        Serialize the metadata.
+
+        Returns:
+            bytes:
+                The serialized metadata.
+        """
+        return IMAGE_META.pack(self.format.encode('ascii'), self.width, self.height)
+
+    @classmethod
+    def unpack(cls, data):
+        """
+        Deserialize metadata received with an IMAGE frame.
+
+        Parameters:
+            data (bytes | bytearray | memoryview):
+                The frame's metadata.
+
+        Returns:
+            ImageMeta | None:
+                The metadata, or None if `data` is not :attr:`IMAGE_META.size` bytes long.
+        """
+        if len(data) != IMAGE_META.size:
+            return None
+
+        image_format, width, height = IMAGE_META.unpack(data)
+
+        return cls(image_format.rstrip(b'\0').decode('ascii', 'replace'), width, height)
+
+
+def is_extended(prefix) -> bool:
+    """
+    Return whether the first four bytes of a frame mark it as an extended frame rather than a legacy length.
+
+    Parameters:
+        prefix (bytes | bytearray | memoryview):
+            The first four bytes of the frame.
+
+    Returns:
+        bool:
+            True if the frame is an extended frame.
+    """
+    return bytes(prefix) == PREFIX
+
+
+def pack_frame(frame_type: int, seq: int, body, meta: bytes = b'', flags: int = 0) -> bytes:
+    """
+    Serialize an extended frame.
+
+    Parameters:
+        frame_type (int):
+            The frame type; one of :class:`FrameType`.
+
+        seq (int):
+            The sequence id of the frame.
+
+        body (bytes | bytearray | memoryview):
+            The frame body.
+
+        meta (bytes, optional):
+            The type-specific metadata. Defaults to none.
+
+        flags (int, optional):
+            Frame flags. Defaults to 0.
+
+    Returns:
+        bytes:
+            The serialized frame, including the prefix.
+    """
+    header = FrameHeader(frame_type, flags, seq, len(meta), len(body))
+
+    return b''.join((PREFIX, header.pack(), meta, body))
+
+
+def pixel_digest(image) -> bytes:
+    """
+    Return the digest a HAVE frame carries for an image; the MD5 of its decoded pixel data, which is the same digest
+    the server keeps in its hash database.
+
+    Parameters:
+        image (PIL.Image.Image):
+            The image.
+
+    Returns:
+        bytes:
+            The raw 16-byte digest.
+    """
+    return hashlib.md5(image.tobytes()).digest()
+
+
+def pack_ack(ack, seq: int, flags: int = AckFlag.NONE) -> bytes:
+    """
+    Wrap an ACK in an envelope addressed to the frame with sequence id `seq`.
+
+    Parameters:
+        ack (nepyc.proto.ack.Ack):
+            The ACK to send.
+
+        seq (int):
+            The sequence id of the frame being acknowledged.
+
+        flags (int, optional):
+            Envelope flags; see :class:`AckFlag`. Defaults to none.
+
+    Returns:
+        bytes:
+            The serialized envelope, including the prefix.
+    """
+    data = ack.to_bytes()
+
+    return PREFIX + ACK_HEADER.pack(int(flags), seq, len(data)) + data
+
+
+def unpack_ack_header(data) -> tuple[int, int, int]:
+    """
+    Deserialize an ACK envelope header.
+
+    Parameters:
+        data (bytes | bytearray | memoryview):
+            The :data:`PREFIX` followed by :attr:`ACK_HEADER.size` bytes.
+
+    Returns:
+        tuple[int, int, int]:
+            The envelope flags, the sequence id, and the size of the ACK that follows.
+
+    Raises:
+        ValueError:
+            If `data` does not start with :data:`PREFIX`.
+    """
+    if not is_extended(data[:len(PREFIX)]):
+        raise ValueError('Not an ACK envelope')
+
+    return ACK_HEADER.unpack(data[len(PREFIX):])
+
+
+__all__ = [
+    'ACK_HEADER',
+    'AckFlag',
+    'CHUNK_META',
+    'FRAME_HEADER',
+    'FrameHeader',
+    'FrameType',
+    'HAVE_DIGEST_SIZE',
+    'IMAGE_META',
+    'ImageMeta',
+    'MAGIC',
+    'MAX_SEQ',
+    'PREFIX',
+    'UPLOAD_ID_SIZE',
+    'UPLOAD_META',
+    'VERSION',
+    'is_extended',
+    'pack_ack',
+    'pack_frame',
+    'pixel_digest',
+    'unpack_ack_header',
+]
@@ -1,7 +1,5 @@
 from nepyc.proto.ack import Ack
-from nepyc.proto.ack.registrar import REGISTRAR
 import socket
-import struct
 
 
 def deserialize_ack(data: bytes) -> Ack:
@@ -16,14 +14,7 @@ def deserialize_ack(data: bytes) -> Ack:
         Ack:
             The deserialized ACK message.
     """
-    code_len = struct.unpack('!B', data[:1])[0]
-    code = data[1:1 + code_len]
-
-    parent_code, child_code = parse_full_code(code)
-
-    full_code = f'{parent_code}:{child_code}'.encode('utf-8')
-
-    return REGISTRAR.get_ack(full_code)
+    return Ack.from_bytes(data)
 
 def parse_full_code(full_code: bytes) -> tuple[str, str]:
     """
@@ -80,7 +71,7 @@ def serialize_ack(ack: 'Ack') -> bytes:
             The serialized ACK message as a byte string.
 
     Examples:
-        >>> serialize_ack(Ack())
-        b'\x01\x00\x00\x00\x00\x00\x00\x00'
+        >>> len(serialize_ack(Ack()))
+        12
     """
     return ack.to_bytes()
@@ -0,0 +1,544 @@
+"""
+This module contains the asyncio-based ingest engine for the nePyc server.
+
+The engine serves the same length-prefixed frame format and ACK semantics as the threaded engine in
+:mod:`nepyc.server.server`, but multiplexes every connection on a single event loop instead of spawning one OS thread
+per client. CPU-heavy work (decoding, hashing and saving images) is handed to the server's ingest queue so it never
+blocks the loop.
+
+Example Usage:
+    >>> from nepyc.server.server import ImageServer
+    >>> server = ImageServer(engine='asyncio')
+    >>> server.run_server()
+"""
+import asyncio
+from PIL import Image
+from nepyc.log_engine import ROOT_LOGGER, Loggable
+from nepyc.proto.ack import DISPATCHER, REJECT_ACK_MAP
+from nepyc.proto.frames import FRAME_HEADER, HAVE_DIGEST_SIZE, FrameHeader, FrameType, is_extended
+from nepyc.server.connections import ConnectionClock, DeadlineExceeded
+from nepyc.server.pipeline import PipelineSession
+from nepyc.server.utils.buffers import BodyStream
+from nepyc.server.protocol import SIZE_HEADER, serialize_ack
+
+
+MOD_LOGGER = ROOT_LOGGER.get_child('server.async_engine')
+
+
+class AsyncEngine(Loggable):
+    """
+    Accept, receive and acknowledge image frames using :mod:`asyncio` streams.
+
+    Attributes:
+        server (nepyc.server.server.ImageServer):
+            The server instance that owns the configuration and ingest logic.
+    """
+    def __init__(self, server):
+        """
+        Initialize the engine.
+
+        Parameters:
+            server (nepyc.server.server.ImageServer):
+                The server instance that owns the configuration and ingest logic.
+
+        Returns:
+            None
+        """
+        super().__init__(MOD_LOGGER)
+        self.__listeners = []
+        self.__loop      = None
+        self.__server    = server
+
+    @property
+    def server(self):
+        """
+        Return the server instance this engine serves.
+
+        Returns:
+            nepyc.server.server.ImageServer:
+                The server instance.
+        """
+        return self.__server
+
+    def run(self):
+        """
+        Run the engine until it is stopped. This will not return until :meth:`stop` is called.
+
+        Returns:
+            None
+        """
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        """
+        Bind the listeners (TCP, a Unix socket, or both) and serve connections until the engine is stopped.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+
+        self.__loop = asyncio.get_running_loop()
+
+        if self.server.tcp:
+            self.__listeners.append(await asyncio.start_server(
+                self.handle_client,
+                self.server.host,
+                self.server.port,
+                reuse_port=self.server.reuse_port or None,
+                backlog=self.server.socket_options.backlog
+            ))
+
+            for sock in self.__listeners[-1].sockets:
+                self.server.socket_options.configure_buffers(sock)
+
+            log.debug(f'Async engine listening on {self.server.host}:{self.server.port}')
+
+        if self.server.unix_socket:
+            self.__listeners.append(await asyncio.start_unix_server(
+                self.handle_client,
+                sock=self.server.bind_unix(),
+                backlog=self.server.socket_options.backlog
+            ))
+            log.debug(f'Async engine listening on {self.server.unix_socket}')
+
+        self.server.running = True
+
+        try:
+            await asyncio.gather(*(listener.serve_forever() for listener in self.__listeners))
+        except asyncio.CancelledError:
+            log.debug('Async engine listeners closed')
+        finally:
+            for listener in self.__listeners:
+                listener.close()
+
+        if self.server.connection_drain.draining:
+            # Returning cancels every connection still being served, so let them finish their frames first.
+            await asyncio.to_thread(self.server.connection_drain.wait)
+
+    async def handle_client(self, reader, writer):
+        """
+        Handle a client connection. Frames are read until the client disconnects, each one is offered to the server's
+        ingest queue and exactly one ACK is written back for it; a BUSY ACK if the queue is full. Extended frames are
+        handed to :meth:`handle_frame` instead. Every read is bounded by the server's connection limits, and the
+        connection is closed once it is idle while the server drains, as with the threaded engine.
+
+        Parameters:
+            reader (asyncio.StreamReader):
+                The stream to read frames from.
+
+            writer (asyncio.StreamWriter):
+                The stream to write ACK messages to.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+        addr = writer.get_extra_info('peername')
+
+        if not self.server.connections.open():
+            log.warning(f'Refusing client {addr}; already serving {self.server.connections.max_connections} connections')
+            writer.close()
+
+            return
+
+        log.debug(f'Handling client {addr}')
+        self.server.socket_options.configure(writer.get_extra_info('socket'))
+        clock = ConnectionClock(self.server.connection_limits)
+        session = None
+        loop = asyncio.get_running_loop()
+        self.server.connection_drain.register(clock, lambda: loop.call_soon_threadsafe(reader.feed_eof))
+
+        try:
+            while True:
+                try:
+                    clock.expect_frame()
+
+                    if self.server.connection_drain.draining:
+                        break
+
+                    size_data = await self.read(clock, reader.readexactly, 1)
+                    clock.frame_started()
+                    size_data += await self.read(clock, reader.readexactly, SIZE_HEADER.size - 1)
+
+                    if is_extended(size_data):
+                        if session is None:
+                            # ACK envelopes are written from the ingest workers as frames settle; each write is handed
+                            # to the loop, in order, without the worker waiting for the client to read it.
+                            envelopes = asyncio.Lock()
+                            session = PipelineSession(
+                                lambda data: asyncio.run_coroutine_threadsafe(
+                                    self.write_envelope(writer, data, envelopes), loop
+                                ),
+                                self.server.show_image
+                            )
+
+                        if not await self.handle_frame(reader, session, addr, clock):
+                            break
+
+                        continue
+
+                    size = SIZE_HEADER.unpack(size_data)[0]
+
+                    if self.server.max_frame_size and size > self.server.max_frame_size:
+                        log.warning(f'Frame of {size} bytes from {addr} exceeds the limit of '
+                                    f'{self.server.max_frame_size}, closing')
+                        writer.write(serialize_ack(DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV'])))
+                        await writer.drain()
+                        break
+
+                    key     = self.server.client_key(addr)
+                    refusal = None
+
+                    if self.server.ingest_queue.full:
+                        log.debug(f'Ingest queue is full, discarding {size} byte frame from {addr}')
+                        refusal = self.server.busy_ack()
+                    else:
+                        wait = self.server.throttle.admit(key, size)
+
+                        if wait:
+                            log.debug(f'Throttling {size} byte frame from {addr} for {wait:.3f}s')
+                            refusal = self.server.throttle_ack(wait)
+
+                    clock.expect_body()
+
+                    if refusal is None:
+                        payload = await self.receive_payload(reader, size, clock)
+                    else:
+                        await self.discard(reader, size, clock)
+                        payload = None
+
+                except asyncio.IncompleteReadError:
+                    log.debug(f'No more data from client {addr}')
+                    break
+
+                try:
+                    future = None if payload is None else self.server.ingest_queue.offer(payload.data, key=key)
+
+                    if future is None:
+                        ack, image = refusal or self.server.busy_ack(), None
+                    else:
+                        try:
+                            ack, image = await asyncio.wrap_future(future)
+                        except (Image.DecompressionBombError, OSError, ValueError) as e:
+                            log.error(f'Unable to ingest image from {addr}: {e}')
+                            ack, image = self.server.error_ack(e), None
+                finally:
+                    if payload is not None:
+                        payload.close()
+
+                writer.write(serialize_ack(ack))
+                await writer.drain()
+
+                if image:
+                    self.server.show_image(image)
+
+        except DeadlineExceeded as e:
+            log.info(f'Closing client {addr}: {e}')
+            self.server.connections.timed_out(e.kind)
+
+        except ConnectionError as e:
+            log.error(f'Connection error while handling client {addr}: {e}')
+
+        finally:
+            self.server.connections.close()
+
+            if session is not None:
+                if self.server.connection_drain.draining:
+                    await asyncio.to_thread(session.wait, self.server.connection_drain.remaining)
+
+                # Let ACK envelopes the session has queued on the loop reach the writer before it is closed.
+                await asyncio.sleep(0)
+
+            writer.close()
+
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+            finally:
+                self.server.connection_drain.unregister(clock)
+
+    async def handle_frame(self, reader, session, addr=None, clock=None):
+        """
+        Handle one extended frame whose prefix has already been read; see :meth:`ImageServer.handle_frame`.
+
+        Parameters:
+            reader (asyncio.StreamReader):
+                The stream to read the rest of the frame from.
+
+            session (nepyc.server.pipeline.PipelineSession):
+                The pipelined session of the connection.
+
+            addr (optional):
+                The address of the client, for logging.
+
+            clock (nepyc.server.connections.ConnectionClock, optional):
+                The clock bounding the connection's reads. Defaults to none, which does not bound them.
+
+        Returns:
+            bool:
+                True if the connection should be kept open, False if it should be closed.
+
+        Raises:
+            asyncio.IncompleteReadError:
+                If the client disconnects part way through the frame.
+
+            nepyc.server.connections.DeadlineExceeded:
+                If the client misses one of its deadlines.
+        """
+        log = self.create_logger()
+
+        header = FrameHeader.unpack(await self.read(clock, reader.readexactly, FRAME_HEADER.size))
+        meta   = await self.read(clock, reader.readexactly, header.meta_size)
+
+        if header.type == FrameType.HAVE and header.body_size == HAVE_DIGEST_SIZE:
+            digest = await self.read(clock, reader.readexactly, HAVE_DIGEST_SIZE)
+            session.reply(header.seq, self.server.answer_have(digest))
+
+            return True
+
+        screened = self.server.screen_frame(header, meta, addr)
+
+        if screened is not None:
+            ack, keep_open = screened
+            log.debug(f'Frame {header.seq} from {addr} answered with {ack.status} without processing')
+
+            if keep_open:
+                self._expect_body(clock)
+                await self.discard(reader, header.body_size, clock)
+
+            session.reply(header.seq, ack)
+
+            return keep_open
+
+        if header.type == FrameType.UPLOAD:
+            session.reply(header.seq, await asyncio.to_thread(self.server.open_upload, meta))
+
+            return True
+
+        if header.type == FrameType.TAR:
+            loop = asyncio.get_running_loop()
+
+            def read_into(view):
+                # Called from the thread ingesting the archive; the read itself runs on the loop.
+                read = self.read_some(reader, min(len(view), self.server.read_size), clock)
+                chunk = asyncio.run_coroutine_threadsafe(read, loop).result()
+                view[:len(chunk)] = chunk
+
+                return len(chunk)
+
+            self._expect_body(clock)
+            stream = BodyStream(read_into, header.body_size)
+            summary = await asyncio.to_thread(self.server.ingest_archive, stream, self.server.client_key(addr), clock)
+            session.reply(header.seq, summary)
+
+            return True
+
+        self._expect_body(clock)
+        payload = await self.receive_payload(reader, header.body_size, clock)
+
+        if header.type == FrameType.CHUNK:
+            try:
+                # Chunks are committed to disk with an fsync, which must not block the loop.
+                await asyncio.to_thread(self.server.settle_chunk, session, header.seq, meta, payload.data,
+                                        self.server.client_key(addr))
+            finally:
+                payload.close()
+
+            return True
+
+        future = self.server.ingest_queue.offer(payload.data, key=self.server.client_key(addr))
+
+        if future is None:
+            payload.close()
+            session.reply(header.seq, self.server.busy_ack())
+        else:
+            session.track(header.seq, future, cleanup=payload.close)
+
+        return True
+
+    async def discard(self, reader, size, clock=None):
+        """
+        Read and drop `size` bytes from `reader`, at most :attr:`server.read_size` bytes at a time.
+
+        Parameters:
+            reader (asyncio.StreamReader):
+                The stream to read from.
+
+            size (int):
+                The number of bytes to discard.
+
+            clock (nepyc.server.connections.ConnectionClock, optional):
+                The clock bounding the connection's reads. Defaults to none, which does not bound them.
+
+        Returns:
+            None
+
+        Raises:
+            asyncio.IncompleteReadError:
+                If the client disconnects before `size` bytes have been read.
+
+            nepyc.server.connections.DeadlineExceeded:
+                If the client misses one of its deadlines.
+        """
+        remaining = size
+
+        while remaining:
+            chunk = await self.read_some(reader, min(remaining, self.server.read_size), clock)
+            remaining -= len(chunk)
+
+    async def receive_payload(self, reader, size, clock=None):
+        """
+        Receive a frame body of `size` bytes into a payload from :meth:`server.allocate_payload`, at most
+        :attr:`server.read_size` bytes at a time.
+
+        Parameters:
+            reader (asyncio.StreamReader):
+                The stream to read from.
+
+            size (int):
+                The size (in bytes) of the frame body.
+
+            clock (nepyc.server.connections.ConnectionClock, optional):
+                The clock bounding the connection's reads. Defaults to none, which does not bound them.
+
+        Returns:
+            nepyc.server.utils.buffers.MemoryPayload | nepyc.server.utils.buffers.SpooledPayload:
+                The payload holding the frame body. The caller must close it once the frame has been processed.
+
+        Raises:
+            asyncio.IncompleteReadError:
+                If the client disconnects before `size` bytes have been read. The payload is closed first.
+
+            nepyc.server.connections.DeadlineExceeded:
+                If the client misses one of its deadlines. The payload is closed first.
+        """
+        payload = self.server.allocate_payload(size)
+
+        try:
+            while payload.received < size:
+                payload.write(await self.read_some(reader, min(size - payload.received, self.server.read_size), clock))
+        except BaseException:
+            payload.close()
+            raise
+
+        return payload
+
+    async def read(self, clock, read, *args):
+        """
+        Await `read(*args)`, for no longer than the connection's current phase allows.
+
+        Parameters:
+            clock (nepyc.server.connections.ConnectionClock | None):
+                The clock bounding the connection's reads; None to wait indefinitely.
+
+            read (Callable[..., Awaitable]):
+                The read to perform; e.g. :meth:`asyncio.StreamReader.readexactly`.
+
+            *args:
+                The arguments to `read`.
+
+        Returns:
+            The result of the read.
+
+        Raises:
+            nepyc.server.connections.DeadlineExceeded:
+                If the read does not complete in time.
+        """
+        if clock is None:
+            return await read(*args)
+
+        try:
+            return await asyncio.wait_for(read(*args), clock.timeout())
+        except asyncio.TimeoutError:
+            raise clock.missed() from None
+
+    async def read_some(self, reader, size, clock=None):
+        """
+        Read between one and `size` bytes of a frame body, as soon as any are available.
+
+        Parameters:
+            reader (asyncio.StreamReader):
+                The stream to read from.
+
+            size (int):
+                The maximum number of bytes to read.
+
+            clock (nepyc.server.connections.ConnectionClock, optional):
+                The clock bounding the connection's reads. Defaults to none, which does not bound them.
+
+        Returns:
+            bytes:
+                The bytes read.
+
+        Raises:
+            asyncio.IncompleteReadError:
+                If the client disconnects before any bytes arrive.
+
+            nepyc.server.connections.DeadlineExceeded:
+                If the body stalls or arrives too slowly.
+        """
+        chunk = await self.read(clock, reader.read, size)
+
+        if not chunk:
+            raise asyncio.IncompleteReadError(b'', size)
+
+        if clock is not None:
+            clock.received(len(chunk))
+
+        return chunk
+
+    async def write_envelope(self, writer, data, lock):
+        """
+        Write an ACK envelope to a pipelined connection and wait for it to drain, unless the connection is closing.
+
+        Parameters:
+            writer (asyncio.StreamWriter):
+                The stream to write to.
+
+            data (bytes):
+                The packed envelope.
+
+            lock (asyncio.Lock):
+                The connection's write lock, so envelopes are written (and drained) one at a time, in the order they
+                were handed over.
+
+        Returns:
+            None
+        """
+        async with lock:
+            if writer.is_closing():
+                return
+
+            writer.write(data)
+
+            try:
+                await writer.drain()
+            except ConnectionError as e:
+                self.create_logger().debug(f'Unable to write an ACK envelope: {e}')
+
+    @staticmethod
+    def _expect_body(clock):
+        if clock is not None:
+            clock.expect_body()
+
+    def stop(self):
+        """
+        Stop the engine. This is safe to call from any thread.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+
+        if self.__loop and self.__listeners and not self.__loop.is_closed():
+            log.debug('Stopping async engine...')
+
+            for listener in self.__listeners:
+                self.__loop.call_soon_threadsafe(listener.close)
+
+
+__all__ = [
+    'AsyncEngine',
+]
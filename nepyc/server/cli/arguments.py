@@ -24,6 +24,41 @@ DEFAULT_LOG_LEVEL = 'INFO'
 
 DEFAULT_SAVE_IMAGES = False
 DEFAULT_IMAGE_DIR   = CONFIG.SAVE_IMAGE_DIR
+DEFAULT_ENGINE      = CONFIG.ENGINE
+DEFAULT_READ_SIZE   = CONFIG.READ_SIZE
+DEFAULT_DECODE_WORKERS = CONFIG.DECODE_WORKERS
+DEFAULT_QUEUE_SIZE     = CONFIG.INGEST_QUEUE_SIZE
+DEFAULT_INGEST_WORKERS = CONFIG.INGEST_WORKERS
+DEFAULT_BUSY_RETRY_AFTER = CONFIG.BUSY_RETRY_AFTER
+DEFAULT_MAX_FRAME_SIZE   = CONFIG.MAX_FRAME_SIZE
+DEFAULT_SPOOL_THRESHOLD  = CONFIG.SPOOL_THRESHOLD
+DEFAULT_MEMORY_BUDGET    = CONFIG.MEMORY_BUDGET
+DEFAULT_ALLOWED_FORMATS  = CONFIG.ALLOWED_FORMATS
+DEFAULT_MAX_PIXELS       = CONFIG.MAX_PIXELS
+DEFAULT_WORKERS          = CONFIG.WORKERS
+DEFAULT_TCP              = CONFIG.TCP
+DEFAULT_UNIX_SOCKET      = CONFIG.UNIX_SOCKET
+DEFAULT_UPLOAD_TIMEOUT   = CONFIG.UPLOAD_TIMEOUT
+DEFAULT_IDLE_TIMEOUT     = CONFIG.IDLE_TIMEOUT
+DEFAULT_HEADER_TIMEOUT   = CONFIG.HEADER_TIMEOUT
+DEFAULT_BODY_TIMEOUT     = CONFIG.BODY_TIMEOUT
+DEFAULT_MIN_THROUGHPUT   = CONFIG.MIN_THROUGHPUT
+DEFAULT_MAX_CONNECTIONS  = CONFIG.MAX_CONNECTIONS
+DEFAULT_CLIENT_IMAGE_RATE = CONFIG.CLIENT_IMAGE_RATE
+DEFAULT_CLIENT_BYTE_RATE  = CONFIG.CLIENT_BYTE_RATE
+DEFAULT_CLIENT_BURST      = CONFIG.CLIENT_BURST
+DEFAULT_DRAIN_TIMEOUT     = CONFIG.DRAIN_TIMEOUT
+DEFAULT_TCP_NODELAY       = CONFIG.TCP_NODELAY
+DEFAULT_KEEPALIVE         = CONFIG.KEEPALIVE
+DEFAULT_RECV_BUFFER       = CONFIG.RECV_BUFFER
+DEFAULT_SEND_BUFFER       = CONFIG.SEND_BUFFER
+DEFAULT_LISTEN_BACKLOG    = CONFIG.LISTEN_BACKLOG
+DEFAULT_REJECT_CACHE_SIZE = CONFIG.REJECT_CACHE_SIZE
+DEFAULT_REJECT_CACHE_TTL  = CONFIG.REJECT_CACHE_TTL
+DEFAULT_DUPLICATE_DISTANCE = CONFIG.DUPLICATE_DISTANCE
+DEFAULT_EXPECTED_LIBRARY_SIZE = CONFIG.EXPECTED_LIBRARY_SIZE
+DEFAULT_BLOOM_ERROR_RATE  = CONFIG.BLOOM_ERROR_RATE
+DEFAULT_REBUILD_BATCH_SIZE = 64
 
 
 class Arguments:
@@ -51,6 +86,18 @@ class Arguments:
         subcommands = self.parser.add_subparsers(dest='command')
         delete_command = subcommands.add_parser('delete-images', help='Delete all saved images.')
         delete_command.add_argument('-b', '--backup', action='store_true', help='Backup the images before deleting them.')
+        rebuild_command = subcommands.add_parser(
+            'rebuild-index',
+            help='Rebuild the index of saved images from the images in the save directory. Resumes an interrupted '
+                 'rebuild.'
+        )
+        rebuild_command.add_argument('-j', '--jobs', type=int, default=None,
+                                     help='Number of processes reading images; defaults to the number of CPUs.')
+        rebuild_command.add_argument('--batch-size', type=int, default=DEFAULT_REBUILD_BATCH_SIZE,
+                                     help='Number of images each process reads at a time.')
+        rebuild_command.add_argument('--full', action='store_true',
+                                     help='Read every image again, not just those missing from the index or missing '
+                                          'hashes; e.g. to check the index.')
 
         self.parser.add_argument('-H', '--host', default=DEFAULT_BIND_HOST, help='Address to bind to.')
         self.parser.add_argument('-P', '--port', type=int, default=DEFAULT_BIND_PORT, help='The port to bind to.')
@@ -59,6 +106,86 @@ class Arguments:
                                  help='Save incoming images to disk.')
         self.parser.add_argument('-D', '--save-directory', default=DEFAULT_IMAGE_DIR, help='The directory to save images.')
         self.parser.add_argument('--display-saved-images', action='store_true', default=False, help='Display images received and saved from previous sessions.')
+        self.parser.add_argument('-E', '--engine', choices=['threaded', 'asyncio'], default=DEFAULT_ENGINE,
+                                 help='The ingest engine to serve connections with.')
+        self.parser.add_argument('--read-size', type=int, default=DEFAULT_READ_SIZE,
+                                 help='The maximum number of bytes to read from a client socket per call.')
+        self.parser.add_argument('--decode-workers', type=int, default=DEFAULT_DECODE_WORKERS,
+                                 help='Number of worker processes that decode and hash incoming images (0 decodes '
+                                      'on the connection thread).')
+        self.parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                                 help='Maximum number of received images waiting to be processed before clients are '
+                                      'told the server is busy.')
+        self.parser.add_argument('--ingest-workers', type=int, default=DEFAULT_INGEST_WORKERS,
+                                 help='Number of threads processing received images.')
+        self.parser.add_argument('--busy-retry-after', type=int, default=DEFAULT_BUSY_RETRY_AFTER,
+                                 help='Milliseconds a busy client is asked to wait before retrying.')
+        self.parser.add_argument('--max-frame-size', type=int, default=DEFAULT_MAX_FRAME_SIZE,
+                                 help='Largest image (in bytes) to accept; larger uploads are rejected before they are '
+                                      'read. 0 for no limit.')
+        self.parser.add_argument('--spool-threshold', type=int, default=DEFAULT_SPOOL_THRESHOLD,
+                                 help='Images larger than this (in bytes) are spooled to disk while they are received.')
+        self.parser.add_argument('--memory-budget', type=int, default=DEFAULT_MEMORY_BUDGET,
+                                 help='Bytes that all in-flight uploads may hold in memory at once.')
+        self.parser.add_argument('--allowed-formats', type=str, default=DEFAULT_ALLOWED_FORMATS,
+                                 help='Comma-separated image formats to accept (e.g. PNG,JPEG). Empty accepts any format.')
+        self.parser.add_argument('--max-pixels', type=int, default=DEFAULT_MAX_PIXELS,
+                                 help='Largest image (width times height) to accept; 0 for no limit.')
+        self.parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                                 help='Number of acceptor processes sharing the port with SO_REUSEPORT (Linux and BSD '
+                                      'only). 1 serves from a single process.')
+        self.parser.add_argument('--unix-socket', default=DEFAULT_UNIX_SOCKET,
+                                 help='Path of a Unix domain socket to listen on, for clients on the same host.')
+        self.parser.add_argument('--no-tcp', dest='tcp', action='store_false', default=DEFAULT_TCP,
+                                 help='Do not listen on TCP; serve only the Unix domain socket.')
+        self.parser.add_argument('--upload-timeout', type=int, default=DEFAULT_UPLOAD_TIMEOUT,
+                                 help='Seconds a partial chunked upload is kept after its last chunk before it is '
+                                      'deleted.')
+        self.parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                                 help='Seconds a connection may wait between frames before it is closed; 0 for no limit.')
+        self.parser.add_argument('--header-timeout', type=float, default=DEFAULT_HEADER_TIMEOUT,
+                                 help='Seconds a client has to send the rest of a frame header once it has started; 0 '
+                                      'for no limit.')
+        self.parser.add_argument('--body-timeout', type=float, default=DEFAULT_BODY_TIMEOUT,
+                                 help='Seconds a frame body may stall before the connection is closed; 0 for no limit.')
+        self.parser.add_argument('--min-throughput', type=int, default=DEFAULT_MIN_THROUGHPUT,
+                                 help='Minimum average rate (bytes per second) a frame body must arrive at; 0 for no '
+                                      'limit.')
+        self.parser.add_argument('--max-connections', type=int, default=DEFAULT_MAX_CONNECTIONS,
+                                 help='Maximum number of connections served at once; 0 for no limit.')
+        self.parser.add_argument('--client-image-rate', type=float, default=DEFAULT_CLIENT_IMAGE_RATE,
+                                 help='Images per second each client address may send; 0 for no limit.')
+        self.parser.add_argument('--client-byte-rate', type=int, default=DEFAULT_CLIENT_BYTE_RATE,
+                                 help='Bytes per second each client address may send; 0 for no limit.')
+        self.parser.add_argument('--client-burst', type=float, default=DEFAULT_CLIENT_BURST,
+                                 help="Seconds' worth of images and bytes a client may send at once after being idle.")
+        self.parser.add_argument('--drain-timeout', type=float, default=DEFAULT_DRAIN_TIMEOUT,
+                                 help='Seconds to let in-flight uploads finish when shutting down, before exiting anyway.')
+        self.parser.add_argument('--no-nodelay', dest='tcp_nodelay', action='store_false', default=DEFAULT_TCP_NODELAY,
+                                 help="Leave Nagle's algorithm on for client connections (TCP_NODELAY off).")
+        self.parser.add_argument('--no-keepalive', dest='keepalive', action='store_false', default=DEFAULT_KEEPALIVE,
+                                 help='Do not send TCP keepalive probes on idle client connections.')
+        self.parser.add_argument('--recv-buffer', type=int, default=DEFAULT_RECV_BUFFER,
+                                 help="Socket receive buffer size (SO_RCVBUF) in bytes; 0 for the kernel's default.")
+        self.parser.add_argument('--send-buffer', type=int, default=DEFAULT_SEND_BUFFER,
+                                 help="Socket send buffer size (SO_SNDBUF) in bytes; 0 for the kernel's default.")
+        self.parser.add_argument('--backlog', dest='listen_backlog', type=int, default=DEFAULT_LISTEN_BACKLOG,
+                                 help='Number of pending connections the listening socket queues before they are '
+                                      'accepted.')
+        self.parser.add_argument('--reject-cache-size', type=int, default=DEFAULT_REJECT_CACHE_SIZE,
+                                 help='Number of recently refused invalid images to remember, so resends are refused '
+                                      'without being decoded; 0 to disable.')
+        self.parser.add_argument('--reject-cache-ttl', type=float, default=DEFAULT_REJECT_CACHE_TTL,
+                                 help='Seconds a refused invalid image is remembered for.')
+        self.parser.add_argument('--duplicate-distance', type=int, default=DEFAULT_DUPLICATE_DISTANCE,
+                                 help='Largest number of differing bits between the average hashes of two images for '
+                                      'them to count as duplicates; 0 refuses only identical hashes.')
+        self.parser.add_argument('--expected-library-size', type=int, default=DEFAULT_EXPECTED_LIBRARY_SIZE,
+                                 help='Number of images the saved library is expected to grow to. If set, a Bloom '
+                                      'filter sized for it is kept in front of the hash database instead of every hash '
+                                      'being held in memory; 0 to disable.')
+        self.parser.add_argument('--bloom-error-rate', type=float, default=DEFAULT_BLOOM_ERROR_RATE,
+                                 help='False-positive rate the Bloom filter is sized for.')
         self.__parsed = None
 
     @property
@@ -14,6 +14,40 @@ class Config:
     SAVE_IMAGES:             bool = bool(environ.get('NEPYC_SAVE_IMAGES', False))
     SAVE_IMAGE_DIR:          str  = environ.get('NEPYC_SAVE_IMAGE_DIR', DEFAULT_SAVE_IMAGE_DIR)
     DO_DISPLAY_SAVED_IMAGES: bool = bool(environ.get('NEPYC_DISPLAY_SAVED', False))
+    ENGINE:                  str  = environ.get('NEPYC_ENGINE', 'threaded')
+    READ_SIZE:               int  = int(environ.get('NEPYC_READ_SIZE', 64 * 1024))
+    DECODE_WORKERS:          int  = int(environ.get('NEPYC_DECODE_WORKERS', 0))
+    INGEST_QUEUE_SIZE:       int  = int(environ.get('NEPYC_INGEST_QUEUE_SIZE', 64))
+    INGEST_WORKERS:          int  = int(environ.get('NEPYC_INGEST_WORKERS', 4))
+    BUSY_RETRY_AFTER:        int  = int(environ.get('NEPYC_BUSY_RETRY_AFTER', 500))
+    MAX_FRAME_SIZE:          int  = int(environ.get('NEPYC_MAX_FRAME_SIZE', 64 * 1024 * 1024))
+    SPOOL_THRESHOLD:         int  = int(environ.get('NEPYC_SPOOL_THRESHOLD', 8 * 1024 * 1024))
+    MEMORY_BUDGET:           int  = int(environ.get('NEPYC_MEMORY_BUDGET', 256 * 1024 * 1024))
+    ALLOWED_FORMATS:         str  = environ.get('NEPYC_ALLOWED_FORMATS', 'PNG,JPEG,GIF,BMP,TIFF,WEBP')
+    MAX_PIXELS:              int  = int(environ.get('NEPYC_MAX_PIXELS', 100_000_000))
+    WORKERS:                 int  = int(environ.get('NEPYC_WORKERS', 1))
+    TCP:                     bool = environ.get('NEPYC_TCP', '1').lower() not in ('0', 'false', 'no')
+    UNIX_SOCKET:             str  = environ.get('NEPYC_UNIX_SOCKET', '')
+    UPLOAD_TIMEOUT:          int  = int(environ.get('NEPYC_UPLOAD_TIMEOUT', 60 * 60))
+    IDLE_TIMEOUT:            float = float(environ.get('NEPYC_IDLE_TIMEOUT', 300))
+    HEADER_TIMEOUT:          float = float(environ.get('NEPYC_HEADER_TIMEOUT', 10))
+    BODY_TIMEOUT:            float = float(environ.get('NEPYC_BODY_TIMEOUT', 30))
+    MIN_THROUGHPUT:          int  = int(environ.get('NEPYC_MIN_THROUGHPUT', 1024))
+    MAX_CONNECTIONS:         int  = int(environ.get('NEPYC_MAX_CONNECTIONS', 256))
+    CLIENT_IMAGE_RATE:       float = float(environ.get('NEPYC_CLIENT_IMAGE_RATE', 0))
+    CLIENT_BYTE_RATE:        int  = int(environ.get('NEPYC_CLIENT_BYTE_RATE', 0))
+    CLIENT_BURST:            float = float(environ.get('NEPYC_CLIENT_BURST', 1.0))
+    DRAIN_TIMEOUT:           float = float(environ.get('NEPYC_DRAIN_TIMEOUT', 30))
+    TCP_NODELAY:             bool = environ.get('NEPYC_TCP_NODELAY', '1').lower() not in ('0', 'false', 'no')
+    KEEPALIVE:               bool = environ.get('NEPYC_KEEPALIVE', '1').lower() not in ('0', 'false', 'no')
+    RECV_BUFFER:             int  = int(environ.get('NEPYC_RECV_BUFFER', 0))
+    SEND_BUFFER:             int  = int(environ.get('NEPYC_SEND_BUFFER', 0))
+    LISTEN_BACKLOG:          int  = int(environ.get('NEPYC_LISTEN_BACKLOG', 128))
+    REJECT_CACHE_SIZE:       int  = int(environ.get('NEPYC_REJECT_CACHE_SIZE', 4096))
+    REJECT_CACHE_TTL:        float = float(environ.get('NEPYC_REJECT_CACHE_TTL', 600))
+    DUPLICATE_DISTANCE:      int  = int(environ.get('NEPYC_DUPLICATE_DISTANCE', 4))
+    EXPECTED_LIBRARY_SIZE:   int  = int(environ.get('NEPYC_EXPECTED_LIBRARY_SIZE', 0))
+    BLOOM_ERROR_RATE:        float = float(environ.get('NEPYC_BLOOM_ERROR_RATE', 0.01))
 
 
 ENV_CONFIG = Config()
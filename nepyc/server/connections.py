@@ -0,0 +1,572 @@
+"""
+This module contains the deadlines enforced on client connections, and the counters that track them.
+
+A client that connects and stalls, or trickles its data a byte at a time, would otherwise hold on to a connection (and,
+with the threaded engine, a thread) forever. Every connection is therefore in one of three phases, each with its own
+deadline:
+
+- *idle*, waiting for the first byte of the next frame; at most :attr:`ConnectionLimits.idle_timeout` seconds.
+- *header*, receiving the rest of a frame's header and metadata; at most :attr:`ConnectionLimits.header_timeout`
+  seconds from its first byte.
+- *body*, receiving a frame's body; at most :attr:`ConnectionLimits.body_timeout` seconds without any progress, and,
+  once the body has been arriving for :attr:`ConnectionLimits.THROUGHPUT_GRACE` seconds, at an average of at least
+  :attr:`ConnectionLimits.min_throughput` bytes per second.
+
+A connection that misses a deadline is closed and counted in :class:`ConnectionStats`, which also caps the number of
+connections served at once.
+
+When the server shuts down, :class:`ConnectionDrain` stops every connection from reading new frames, closing those that
+are idle straight away and the rest once the frame they are receiving has been answered, and waits for them all to
+close.
+
+Example Usage:
+    >>> from nepyc.server.connections import ConnectionClock, ConnectionLimits, GuardedSocket
+    >>> limits = ConnectionLimits(idle_timeout=300, header_timeout=10, body_timeout=30, min_throughput=1024)
+    >>> client = GuardedSocket(conn, ConnectionClock(limits))
+    >>> client.clock.expect_frame()
+"""
+import socket
+import threading
+import time
+from dataclasses import dataclass
+
+
+# The phases of a connection; also the kinds of deadline a connection can miss, along with 'throughput'.
+IDLE       = 'idle'
+HEADER     = 'header'
+BODY       = 'body'
+THROUGHPUT = 'throughput'
+
+
+class DeadlineExceeded(socket.timeout):
+    """
+    Raised when a connection misses one of its deadlines.
+
+    Attributes:
+        kind (str):
+            The deadline that was missed; one of 'idle', 'header', 'body' or 'throughput'.
+    """
+    def __init__(self, kind: str, message: str = None):
+        super().__init__(message or f'{kind} deadline exceeded')
+        self.kind = kind
+
+
+@dataclass(frozen=True)
+class ConnectionLimits:
+    """
+    The deadlines every connection must meet. A value of zero disables that deadline.
+
+    Attributes:
+        idle_timeout (float):
+            Seconds to wait for the first byte of the next frame.
+
+        header_timeout (float):
+            Seconds to receive the rest of a frame's header and metadata once it has started.
+
+        body_timeout (float):
+            Seconds to wait for any progress while receiving a frame's body.
+
+        min_throughput (int):
+            The minimum average rate (in bytes per second) a frame's body must arrive at, once it has been arriving for
+            :attr:`THROUGHPUT_GRACE` seconds.
+    """
+    # Seconds a frame's body may arrive for before its throughput is checked, so short bursts of latency are forgiven.
+    THROUGHPUT_GRACE = 5.0
+
+    idle_timeout:   float = 0
+    header_timeout: float = 0
+    body_timeout:   float = 0
+    min_throughput: int   = 0
+
+
+class ConnectionClock:
+    """
+    Tracks the phase of one connection and how long it has left to complete it.
+
+    Attributes:
+        phase (str):
+            The current phase; one of 'idle', 'header' or 'body'.
+
+        limits (ConnectionLimits):
+            The deadlines being enforced.
+    """
+    def __init__(self, limits: ConnectionLimits, clock=time.monotonic):
+        """
+        Initialize the clock, idle and waiting for the first frame.
+
+        Parameters:
+            limits (ConnectionLimits):
+                The deadlines to enforce.
+
+            clock (Callable[[], float], optional):
+                The monotonic clock to measure time with. Defaults to :func:`time.monotonic`.
+
+        Returns:
+            None
+        """
+        self.__clock    = clock
+        self.__deadline = None
+        self.__limits   = limits
+        self.__phase    = IDLE
+        self.__received = 0
+        self.__started  = 0.0
+
+        self.expect_frame()
+
+    @property
+    def limits(self) -> ConnectionLimits:
+        """
+        Return the deadlines being enforced.
+
+        Returns:
+            ConnectionLimits:
+                The limits.
+        """
+        return self.__limits
+
+    @property
+    def phase(self) -> str:
+        """
+        Return the current phase of the connection.
+
+        Returns:
+            str:
+                'idle', 'header' or 'body'.
+        """
+        return self.__phase
+
+    def expect_frame(self) -> None:
+        """
+        Enter the idle phase, waiting for the first byte of the next frame.
+
+        Returns:
+            None
+        """
+        self.__phase    = IDLE
+        self.__deadline = self._after(self.__limits.idle_timeout)
+
+    def frame_started(self) -> None:
+        """
+        Enter the header phase, once the first byte of a frame has arrived.
+
+        Returns:
+            None
+        """
+        self.__phase    = HEADER
+        self.__deadline = self._after(self.__limits.header_timeout)
+
+    def expect_body(self) -> None:
+        """
+        Enter the body phase, before a frame's body is received.
+
+        Returns:
+            None
+        """
+        self.__phase    = BODY
+        self.__deadline = None
+        self.__received = 0
+        self.__started  = self.__clock()
+
+    def timeout(self):
+        """
+        Return how long the next read may wait for.
+
+        Returns:
+            float | None:
+                The timeout in seconds, or None to wait indefinitely.
+
+        Raises:
+            DeadlineExceeded:
+                If the current phase's deadline has already passed.
+        """
+        if self.__phase == BODY:
+            return self.__limits.body_timeout or None
+
+        if self.__deadline is None:
+            return None
+
+        remaining = self.__deadline - self.__clock()
+
+        if remaining <= 0:
+            raise DeadlineExceeded(self.__phase)
+
+        return remaining
+
+    def received(self, count: int) -> None:
+        """
+        Record that `count` bytes have been read in the current phase. The first byte read while idle starts the header
+        phase.
+
+        Parameters:
+            count (int):
+                The number of bytes read.
+
+        Returns:
+            None
+
+        Raises:
+            DeadlineExceeded:
+                If the body is arriving slower than the minimum throughput.
+        """
+        if self.__phase == IDLE:
+            if count:
+                self.frame_started()
+
+            return
+
+        if self.__phase != BODY:
+            return
+
+        self.__received += count
+        self.check_throughput()
+
+    def check_throughput(self) -> None:
+        """
+        Check that the body is arriving at no less than the minimum throughput, once the grace period has passed.
+
+        Returns:
+            None
+
+        Raises:
+            DeadlineExceeded:
+                If the body is arriving too slowly.
+        """
+        if self.__phase != BODY or not self.__limits.min_throughput:
+            return
+
+        elapsed = self.__clock() - self.__started
+
+        if elapsed > self.__limits.THROUGHPUT_GRACE and self.__received / elapsed < self.__limits.min_throughput:
+            raise DeadlineExceeded(
+                THROUGHPUT,
+                f'body arriving at {self.__received / elapsed:.0f} B/s, below {self.__limits.min_throughput} B/s'
+            )
+
+    def missed(self, kind: str = None) -> DeadlineExceeded:
+        """
+        Return the error for a read that timed out in the current phase.
+
+        Parameters:
+            kind (str, optional):
+                The deadline that was missed. Defaults to the current phase.
+
+        Returns:
+            DeadlineExceeded:
+                The error to raise.
+        """
+        return DeadlineExceeded(kind or self.__phase)
+
+    def _after(self, seconds):
+        return self.__clock() + seconds if seconds else None
+
+
+class GuardedSocket:
+    """
+    A client socket whose reads are bounded by a :class:`ConnectionClock`. Every other attribute is delegated to the
+    wrapped socket.
+
+    Attributes:
+        clock (ConnectionClock):
+            The clock bounding this connection's reads.
+    """
+    def __init__(self, sock: socket.socket, clock: ConnectionClock):
+        """
+        Wrap a socket.
+
+        Parameters:
+            sock (socket.socket):
+                The client socket.
+
+            clock (ConnectionClock):
+                The clock bounding its reads.
+
+        Returns:
+            None
+        """
+        self.__clock  = clock
+        self.__socket = sock
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.__socket.close()
+
+    def __getattr__(self, name):
+        return getattr(self.__socket, name)
+
+    @property
+    def clock(self) -> ConnectionClock:
+        """
+        Return the clock bounding this connection's reads.
+
+        Returns:
+            ConnectionClock:
+                The clock.
+        """
+        return self.__clock
+
+    def recv_into(self, buffer, nbytes: int = 0, flags: int = 0) -> int:
+        """
+        Receive into `buffer` like :meth:`socket.socket.recv_into`, waiting no longer than the current phase allows.
+
+        Raises:
+            DeadlineExceeded:
+                If the current phase's deadline passes before any data arrives, or the body is arriving too slowly.
+        """
+        self.__socket.settimeout(self.__clock.timeout())
+
+        try:
+            count = self.__socket.recv_into(buffer, nbytes, flags)
+        except DeadlineExceeded:
+            raise
+        except socket.timeout:
+            raise self.__clock.missed() from None
+
+        self.__clock.received(count)
+
+        return count
+
+
+class ConnectionDrain:
+    """
+    The connections being served, so they can be drained when the server shuts down. Every method is thread-safe.
+
+    Attributes:
+        draining (bool):
+            Whether the server is draining; connections must not start reading another frame once it is.
+
+        remaining (float):
+            The number of seconds left until the drain's deadline.
+    """
+    def __init__(self, clock=time.monotonic):
+        """
+        Initialize the drain, with no connections and not draining.
+
+        Parameters:
+            clock (Callable[[], float], optional):
+                The monotonic clock to measure the deadline with. Defaults to :func:`time.monotonic`.
+
+        Returns:
+            None
+        """
+        self.__changed     = threading.Condition()
+        self.__clock       = clock
+        self.__connections = {}
+        self.__deadline    = None
+
+    @property
+    def draining(self) -> bool:
+        return self.__deadline is not None
+
+    @property
+    def remaining(self) -> float:
+        if self.__deadline is None:
+            return 0.0
+
+        return max(0.0, self.__deadline - self.__clock())
+
+    def register(self, clock: ConnectionClock, interrupt) -> None:
+        """
+        Track a connection until it is closed.
+
+        Parameters:
+            clock (ConnectionClock):
+                The connection's clock, which tells whether it is idle.
+
+            interrupt (Callable[[], None]):
+                Ends the connection's reads, so a read waiting for the next frame sees the end of the stream. It may be
+                called from any thread.
+
+        Returns:
+            None
+        """
+        with self.__changed:
+            self.__connections[clock] = interrupt
+
+    def unregister(self, clock: ConnectionClock) -> None:
+        """
+        Stop tracking a connection, once it has been closed.
+
+        Parameters:
+            clock (ConnectionClock):
+                The clock the connection was registered with.
+
+        Returns:
+            None
+        """
+        with self.__changed:
+            self.__connections.pop(clock, None)
+            self.__changed.notify_all()
+
+    def start(self, timeout: float) -> int:
+        """
+        Start draining; interrupt every idle connection, and set the deadline for the rest to close by.
+
+        Connections check :attr:`draining` once they are idle, after setting their clock's phase, so each one is either
+        interrupted here or sees the flag itself.
+
+        Parameters:
+            timeout (float):
+                The number of seconds connections have to finish the frames they are receiving.
+
+        Returns:
+            int:
+                The number of idle connections interrupted.
+        """
+        with self.__changed:
+            self.__deadline = self.__clock() + timeout
+            idle = [interrupt for clock, interrupt in self.__connections.items() if clock.phase == IDLE]
+
+        for interrupt in idle:
+            try:
+                interrupt()
+            except OSError:
+                continue
+
+        return len(idle)
+
+    def wait(self) -> bool:
+        """
+        Wait, until the deadline at the latest, for every connection to close.
+
+        Returns:
+            bool:
+                True if every connection closed in time.
+        """
+        with self.__changed:
+            return self.__changed.wait_for(lambda: not self.__connections, self.remaining)
+
+
+class ConnectionStats:
+    """
+    Thread-safe counters of the connections a server has served, and a cap on how many it serves at once.
+
+    Attributes:
+        max_connections (int):
+            The maximum number of connections served at once; zero for no limit.
+
+        active (int):
+            The number of connections being served.
+
+        accepted (int):
+            The number of connections accepted.
+
+        refused (int):
+            The number of connections closed straight away because the server was serving its maximum already.
+
+        timeouts (dict[str, int]):
+            The number of connections closed for missing each kind of deadline.
+    """
+    def __init__(self, max_connections: int = 0):
+        """
+        Initialize the counters.
+
+        Parameters:
+            max_connections (int, optional):
+                The maximum number of connections served at once; zero for no limit. Defaults to 0.
+
+        Returns:
+            None
+        """
+        self.__accepted        = 0
+        self.__active          = 0
+        self.__lock            = threading.Lock()
+        self.__max_connections = max_connections
+        self.__refused         = 0
+        self.__timeouts        = dict.fromkeys((IDLE, HEADER, BODY, THROUGHPUT), 0)
+
+    @property
+    def accepted(self) -> int:
+        return self.__accepted
+
+    @property
+    def active(self) -> int:
+        return self.__active
+
+    @property
+    def max_connections(self) -> int:
+        return self.__max_connections
+
+    @property
+    def refused(self) -> int:
+        return self.__refused
+
+    @property
+    def timeouts(self) -> dict:
+        with self.__lock:
+            return dict(self.__timeouts)
+
+    def open(self) -> bool:
+        """
+        Count a new connection, if there is room for it.
+
+        Returns:
+            bool:
+                True if the connection should be served, False if it should be closed because the server is serving its
+                maximum number of connections already. Every True must be matched by a call to :meth:`close`.
+        """
+        with self.__lock:
+            if self.__max_connections and self.__active >= self.__max_connections:
+                self.__refused += 1
+
+                return False
+
+            self.__accepted += 1
+            self.__active   += 1
+
+            return True
+
+    def close(self) -> None:
+        """
+        Count a served connection as closed.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__active -= 1
+
+    def timed_out(self, kind: str) -> None:
+        """
+        Count a connection closed for missing a deadline.
+
+        Parameters:
+            kind (str):
+                The deadline that was missed.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__timeouts[kind] = self.__timeouts.get(kind, 0) + 1
+
+    def snapshot(self) -> dict:
+        """
+        Return every counter at once.
+
+        Returns:
+            dict:
+                The active, accepted and refused connection counts, and the timeouts by kind.
+        """
+        with self.__lock:
+            return {
+                'active':   self.__active,
+                'accepted': self.__accepted,
+                'refused':  self.__refused,
+                'timeouts': dict(self.__timeouts),
+            }
+
+
+__all__ = [
+    'BODY',
+    'ConnectionClock',
+    'ConnectionDrain',
+    'ConnectionLimits',
+    'ConnectionStats',
+    'DeadlineExceeded',
+    'GuardedSocket',
+    'HEADER',
+    'IDLE',
+    'THROUGHPUT',
+]
@@ -0,0 +1,18 @@
+"""
+The record of which images have been saved, shared by everything that ingests them.
+"""
+from nepyc.server.index.bloom import BloomFilter
+from nepyc.server.index.database import HashIndex
+from nepyc.server.index.hamming import HammingIndex, hash_to_int
+from nepyc.server.index.manager import IndexManager
+from nepyc.server.index.store import HashStore
+
+
+__all__ = [
+    'BloomFilter',
+    'HammingIndex',
+    'HashIndex',
+    'HashStore',
+    'IndexManager',
+    'hash_to_int',
+]
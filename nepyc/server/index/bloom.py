@@ -0,0 +1,256 @@
+"""
+This module contains the Bloom filter kept in front of the index of saved images.
+
+Most uploads are new images, and with the filter enabled every one of them is a definite miss that is answered from a
+few bits in memory, without the index being looked up. A hit may be a false positive, so it is always confirmed against
+the index; the rate of those is bounded by the error rate the filter is sized for, as long as it holds no more keys
+than its capacity.
+
+The filter is saved to disk next to the index (see :meth:`BloomFilter.save`), so a large library does not have to be
+read back in full to rebuild it on every start.
+
+Example Usage:
+    >>> from nepyc.server.index.bloom import BloomFilter
+    >>> bloom = BloomFilter(capacity=1_000_000, error_rate=0.01)
+    >>> bloom.add('d41d8cd98f00b204e9800998ecf8427e')
+    >>> 'd41d8cd98f00b204e9800998ecf8427e' in bloom
+    True
+    >>> bloom.size_in_bytes
+    1198133
+"""
+import hashlib
+import math
+import os
+import struct
+from pathlib import Path
+
+
+# The name of the saved filter in the save directory.
+BLOOM_FILE_NAME = '.index.bloom'
+
+# The magic number, format version, number of bits, number of hash functions, number of keys added, capacity and
+# error rate at the start of a saved filter.
+HEADER = struct.Struct('!4sBQIQQd')
+
+MAGIC = b'NPBF'
+
+VERSION = 1
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter of strings or bytes. It is not thread-safe; callers must hold their own lock.
+
+    Attributes:
+        capacity (int):
+            The number of keys the filter is sized for.
+
+        error_rate (float):
+            The false-positive rate the filter is sized for, once it holds `capacity` keys.
+
+        bits (int):
+            The number of bits in the filter.
+
+        hashes (int):
+            The number of bits set per key.
+    """
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Initialize an empty filter sized for `capacity` keys at the given false-positive rate.
+
+        Parameters:
+            capacity (int):
+                The number of keys the filter is expected to hold.
+
+            error_rate (float, optional):
+                The acceptable false-positive rate once the filter holds `capacity` keys. Defaults to 0.01.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError:
+                If `capacity` is not positive, or `error_rate` is not between zero and one.
+        """
+        if capacity < 1:
+            raise ValueError('The capacity must be positive')
+
+        if not 0 < error_rate < 1:
+            raise ValueError('The error rate must be between 0 and 1')
+
+        self.__capacity   = capacity
+        self.__error_rate = error_rate
+        self.__bits       = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.__hashes     = max(1, round(self.__bits / capacity * math.log(2)))
+        self.__array      = bytearray((self.__bits + 7) // 8)
+        self.__count      = 0
+
+    def __contains__(self, key) -> bool:
+        array = self.__array
+
+        for position in self._positions(key):
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+
+        return True
+
+    def __len__(self) -> int:
+        return self.__count
+
+    @property
+    def bits(self) -> int:
+        return self.__bits
+
+    @property
+    def capacity(self) -> int:
+        return self.__capacity
+
+    @property
+    def error_rate(self) -> float:
+        return self.__error_rate
+
+    @property
+    def hashes(self) -> int:
+        return self.__hashes
+
+    @property
+    def size_in_bytes(self) -> int:
+        return len(self.__array)
+
+    @property
+    def false_positive_rate(self) -> float:
+        """
+        Return the expected false-positive rate of the filter with the number of keys it holds now.
+
+        Returns:
+            float:
+                The probability that a key that was never added is reported as present.
+        """
+        return (1 - math.exp(-self.__hashes * self.__count / self.__bits)) ** self.__hashes
+
+    def add(self, key) -> None:
+        """
+        Add a key.
+
+        Parameters:
+            key (str | bytes):
+                The key; e.g. the hex MD5 digest of an image.
+
+        Returns:
+            None
+        """
+        array = self.__array
+
+        for position in self._positions(key):
+            array[position >> 3] |= 1 << (position & 7)
+
+        self.__count += 1
+
+    def stats(self) -> dict:
+        """
+        Return the filter's size and expected false-positive rate.
+
+        Returns:
+            dict:
+                The capacity and error rate the filter was sized for, its number of bits, hash functions and keys, and
+                its expected false-positive rate.
+        """
+        return {
+            'capacity': self.__capacity,
+            'error_rate': self.__error_rate,
+            'bits': self.__bits,
+            'hashes': self.__hashes,
+            'keys': self.__count,
+            'false_positive_rate': self.false_positive_rate,
+        }
+
+    def save(self, path) -> None:
+        """
+        Save the filter. It is written to a temporary file that is then renamed over `path`, so a crash never leaves a
+        truncated filter behind.
+
+        Parameters:
+            path (str | pathlib.Path):
+                The file to save the filter to.
+
+        Returns:
+            None
+        """
+        path = Path(path)
+        partial = path.with_name(f'{path.name}.tmp')
+
+        with open(partial, 'wb') as file:
+            file.write(HEADER.pack(
+                MAGIC,
+                VERSION,
+                self.__bits,
+                self.__hashes,
+                self.__count,
+                self.__capacity,
+                self.__error_rate
+            ))
+            file.write(self.__array)
+
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a filter saved by :meth:`save`.
+
+        Parameters:
+            path (str | pathlib.Path):
+                The file the filter was saved to.
+
+        Returns:
+            BloomFilter:
+                The filter.
+
+        Raises:
+            OSError:
+                If the file cannot be read.
+
+            ValueError:
+                If the file is not a saved filter, or is truncated.
+        """
+        with open(path, 'rb') as file:
+            header = file.read(HEADER.size)
+
+            if len(header) != HEADER.size:
+                raise ValueError(f'{path} is truncated')
+
+            magic, version, bits, hashes, count, capacity, error_rate = HEADER.unpack(header)
+
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f'{path} is not a saved Bloom filter')
+
+            bloom = cls(capacity, error_rate)
+
+            if (bloom.bits, bloom.hashes) != (bits, hashes):
+                raise ValueError(f'{path} does not match its own header')
+
+            if file.readinto(bloom.__array) != len(bloom.__array) or file.read(1):
+                raise ValueError(f'{path} is truncated')
+
+        bloom.__count = count
+
+        return bloom
+
+    def _positions(self, key):
+        """
+        Return the bits set for a key, by double hashing one BLAKE2b digest of it.
+        """
+        if isinstance(key, str):
+            key = key.encode()
+
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first  = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+
+        return [(first + number * second) % self.__bits for number in range(self.__hashes)]
+
+
+__all__ = [
+    'BLOOM_FILE_NAME',
+    'BloomFilter',
+]
@@ -0,0 +1,390 @@
+"""
+This module contains the on-disk index of saved images.
+
+The index is a SQLite database in the save directory, holding one row per saved image: the hash it is deduplicated by,
+the file number it was saved under, a digest of the encoded bytes it was received as (so an exact re-send is recognised
+without being decoded) and, for near-duplicate detection, its perceptual (average) hash. It replaces the
+plain-text `hashes.txt`, which had to be re-read in full to find anything in it; a library that still has one is
+imported into the index the first time the index is opened, and the text file is left as it was.
+
+The schema is versioned, and an index written by an older version is migrated when it is opened.
+
+The database is opened in write-ahead-log mode, so appending an image is a single small write that is not synced to disk
+until :meth:`HashIndex.flush` is called; a crash may lose the last few appends, but never corrupts the index.
+
+Example Usage:
+    >>> from nepyc.server.index.database import HashIndex
+    >>> index = HashIndex('~/Pictures/nepyc')
+    >>> index.add('d41d8cd98f00b204e9800998ecf8427e', 1, average_hash=0x8f0f0f0f00000000, raw_digest=digest)
+    >>> index.entries()
+    {'d41d8cd98f00b204e9800998ecf8427e': 1}
+    >>> index.free_numbers()
+    ([], 1)
+"""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from nepyc.log_engine import ROOT_LOGGER, Loggable
+from nepyc.server.utils.hashes import load_hash_data
+
+
+MOD_LOGGER = ROOT_LOGGER.get_child('server.index.database')
+
+# The name of the index database in the save directory.
+INDEX_FILE_NAME = '.index.db'
+
+# The name of the plain-text hash database the index replaces.
+LEGACY_FILE_NAME = 'hashes.txt'
+
+# SQLite integers are signed, so 64-bit hashes with the top bit set are stored as negative numbers.
+SIGN_BIT = 1 << 63
+
+
+def to_signed(value: int) -> int:
+    return value - (SIGN_BIT << 1) if value >= SIGN_BIT else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (SIGN_BIT << 1) if value < 0 else value
+
+
+class HashIndex(Loggable):
+    """
+    The persistent index of saved images in one save directory. All methods are thread-safe.
+
+    Attributes:
+        path (pathlib.Path):
+            The path of the index database.
+    """
+    # The statements that bring the schema up to each version from the one before; the current version is stored in the
+    # database's `user_version`.
+    MIGRATIONS = {
+        1: (
+            'CREATE TABLE IF NOT EXISTS images ('
+            '    number INTEGER PRIMARY KEY,'
+            '    md5    TEXT NOT NULL UNIQUE'
+            ')',
+        ),
+        2: (
+            'ALTER TABLE images ADD COLUMN average_hash INTEGER',
+        ),
+        3: (
+            'ALTER TABLE images ADD COLUMN raw_digest BLOB',
+        ),
+        4: (
+            'CREATE INDEX IF NOT EXISTS images_raw_digest ON images (raw_digest)',
+        ),
+    }
+
+    SCHEMA_VERSION = max(MIGRATIONS)
+
+    def __init__(self, directory):
+        """
+        Open the index in `directory`, creating it (and importing `hashes.txt`, if there is one) if it does not exist.
+
+        Parameters:
+            directory (str | pathlib.Path):
+                The save directory.
+
+        Returns:
+            None
+
+        Raises:
+            sqlite3.DatabaseError:
+                If the index exists but is not a database, or was written by a newer version of nePyc.
+        """
+        super().__init__(MOD_LOGGER)
+        directory = Path(directory).expanduser()
+        directory.mkdir(parents=True, exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__path = directory.joinpath(INDEX_FILE_NAME)
+
+        # One connection, shared by every thread under the lock.
+        self.__connection = sqlite3.connect(self.__path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+
+        self._migrate(directory.joinpath(LEGACY_FILE_NAME))
+
+    @property
+    def path(self) -> Path:
+        """
+        Return the path of the index database.
+
+        Returns:
+            pathlib.Path:
+                The path.
+        """
+        return self.__path
+
+    def add(self, md5: str, number: int, average_hash: int = None, raw_digest: bytes = None) -> None:
+        """
+        Record a saved image.
+
+        Parameters:
+            md5 (str):
+                The hex MD5 digest of the image's pixel data.
+
+            number (int):
+                The file number the image was saved under.
+
+            average_hash (int, optional):
+                The image's 64-bit average hash, as an unsigned integer.
+
+            raw_digest (bytes, optional):
+                The digest of the encoded bytes the image was received as; see
+                :func:`nepyc.server.pipeline.flight.raw_digest`.
+
+        Returns:
+            None
+
+        Raises:
+            sqlite3.IntegrityError:
+                If the hash or the file number is already in the index.
+        """
+        with self.__lock:
+            self.__connection.execute(
+                'INSERT INTO images (number, md5, average_hash, raw_digest) VALUES (?, ?, ?, ?)',
+                (number, md5, None if average_hash is None else to_signed(average_hash), raw_digest)
+            )
+
+    def put_many(self, rows) -> None:
+        """
+        Record many images in one transaction, replacing the rows of file numbers already in the index; e.g. when the
+        index is rebuilt from the save directory. A raw digest already recorded is kept, unless the image under that
+        number has changed: it is the digest of the bytes the image was uploaded as, which a rebuild (reading the saved
+        file) cannot recover.
+
+        Parameters:
+            rows (Iterable[tuple[int, str, int | None, bytes | None]]):
+                The file number, MD5 digest, average hash (as an unsigned integer) and raw digest of each image.
+
+        Returns:
+            None
+
+        Raises:
+            sqlite3.IntegrityError:
+                If a hash is already in the index under another file number. None of the rows are written.
+        """
+        rows = [
+            (number, md5, None if average_hash is None else to_signed(average_hash), raw_digest)
+            for number, md5, average_hash, raw_digest in rows
+        ]
+
+        with self.__lock, self.__connection:
+            self.__connection.execute('BEGIN')
+            self.__connection.executemany(
+                'INSERT INTO images (number, md5, average_hash, raw_digest) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (number) DO UPDATE SET '
+                '    md5 = excluded.md5, average_hash = excluded.average_hash,'
+                '    raw_digest = CASE WHEN images.md5 = excluded.md5'
+                '        THEN COALESCE(images.raw_digest, excluded.raw_digest) ELSE excluded.raw_digest END',
+                rows
+            )
+
+    def retain(self, numbers) -> int:
+        """
+        Remove every image whose file number is not in `numbers`; e.g. because its file has been deleted.
+
+        Parameters:
+            numbers (Container[int]):
+                The file numbers to keep.
+
+        Returns:
+            int:
+                The number of images removed.
+        """
+        with self.__lock, self.__connection:
+            self.__connection.execute('BEGIN')
+            stale = [
+                (number,) for (number,) in self.__connection.execute('SELECT number FROM images')
+                if number not in numbers
+            ]
+            self.__connection.executemany('DELETE FROM images WHERE number = ?', stale)
+
+        return len(stale)
+
+    def complete_numbers(self) -> set:
+        """
+        Return the file numbers of the images that have every hash recorded; images saved by an older version of nePyc
+        lack the average hash or the raw digest.
+
+        Returns:
+            set[int]:
+                The file numbers.
+        """
+        with self.__lock:
+            query = 'SELECT number FROM images WHERE average_hash IS NOT NULL AND raw_digest IS NOT NULL'
+
+            return {number for (number,) in self.__connection.execute(query)}
+
+    def average_hashes(self) -> list:
+        """
+        Return the average hash of every saved image that has one recorded. Images saved by an older version of nePyc
+        have none.
+
+        Returns:
+            list[tuple[int, int]]:
+                The average hash (as an unsigned integer) and file number of each image.
+        """
+        with self.__lock:
+            rows = self.__connection.execute('SELECT average_hash, number FROM images WHERE average_hash IS NOT NULL')
+
+            return [(to_unsigned(average_hash), number) for average_hash, number in rows]
+
+    def raw_digests(self) -> dict:
+        """
+        Return the raw digest of every saved image that has one recorded. Images saved by an older version of nePyc have
+        none.
+
+        Returns:
+            dict[bytes, int]:
+                The file number of each image, keyed by the digest of the bytes it was received as.
+        """
+        with self.__lock:
+            return dict(self.__connection.execute('SELECT raw_digest, number FROM images WHERE raw_digest IS NOT NULL'))
+
+    def contains(self, md5: str) -> bool:
+        """
+        Return whether an image has been saved, looking it up on disk rather than in memory.
+
+        Parameters:
+            md5 (str):
+                The hex MD5 digest of the image's pixel data.
+
+        Returns:
+            bool:
+                True if the image is in the index.
+        """
+        with self.__lock:
+            return self.__connection.execute('SELECT 1 FROM images WHERE md5 = ?', (md5,)).fetchone() is not None
+
+    def contains_digest(self, raw_digest: bytes) -> bool:
+        """
+        Return whether an image received as the given encoded bytes has been saved, looking it up on disk.
+
+        Parameters:
+            raw_digest (bytes):
+                The digest of the encoded bytes.
+
+        Returns:
+            bool:
+                True if the digest is in the index.
+        """
+        with self.__lock:
+            query = 'SELECT 1 FROM images WHERE raw_digest = ?'
+
+            return self.__connection.execute(query, (raw_digest,)).fetchone() is not None
+
+    def key_count(self) -> int:
+        """
+        Return the number of hashes and raw digests in the index; i.e. the number of keys a Bloom filter of the index
+        holds.
+
+        Returns:
+            int:
+                The number of keys.
+        """
+        with self.__lock:
+            return self.__connection.execute('SELECT COUNT(md5) + COUNT(raw_digest) FROM images').fetchone()[0]
+
+    def entries(self) -> dict:
+        """
+        Return every saved image.
+
+        Returns:
+            dict[str, int]:
+                The file number of each saved image, keyed by its hash.
+        """
+        with self.__lock:
+            return dict(self.__connection.execute('SELECT md5, number FROM images'))
+
+    def free_numbers(self):
+        """
+        Return the file numbers below the highest one in use that are free, e.g. because their image was deleted.
+
+        Returns:
+            tuple[list[int], int]:
+                The free numbers in ascending order, and the highest number in use; zero if the index is empty.
+        """
+        missing  = []
+        previous = 0
+
+        with self.__lock:
+            for (number,) in self.__connection.execute('SELECT number FROM images ORDER BY number'):
+                missing.extend(range(previous + 1, number))
+                previous = number
+
+        return missing, previous
+
+    def flush(self) -> None:
+        """
+        Force every image added so far out to disk, so none are lost if the machine goes down.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__connection.execute('PRAGMA wal_checkpoint(FULL)')
+
+    def close(self) -> None:
+        """
+        Flush and close the index. It cannot be used afterwards.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__connection.close()
+
+    def size(self) -> int:
+        """
+        Return the number of saved images.
+
+        Returns:
+            int:
+                The number of rows in the index.
+        """
+        with self.__lock:
+            return self.__connection.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+
+    def _migrate(self, legacy_path: Path) -> None:
+        """
+        Bring the schema up to date, importing the legacy hash database if the index is new and there is one.
+        """
+        log = self.create_logger()
+        version = self.__connection.execute('PRAGMA user_version').fetchone()[0]
+
+        if version > self.SCHEMA_VERSION:
+            raise sqlite3.DatabaseError(f'{self.__path} was written by a newer version (schema {version})')
+
+        if version == self.SCHEMA_VERSION:
+            return
+
+        with self.__connection:
+            self.__connection.execute('BEGIN')
+
+            for step in range(version + 1, self.SCHEMA_VERSION + 1):
+                for statement in self.MIGRATIONS[step]:
+                    self.__connection.execute(statement)
+
+            if not version and legacy_path.exists():
+                known, _, _ = load_hash_data(os.fspath(legacy_path.parent))
+                self.__connection.executemany(
+                    'INSERT OR IGNORE INTO images (md5, number) VALUES (?, ?)',
+                    known.items()
+                )
+                log.info(f'Imported {len(known)} hashes from {legacy_path}')
+
+            self.__connection.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+
+__all__ = [
+    'HashIndex',
+    'INDEX_FILE_NAME',
+    'LEGACY_FILE_NAME',
+    'to_signed',
+    'to_unsigned',
+]
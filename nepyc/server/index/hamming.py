@@ -0,0 +1,284 @@
+"""
+This module contains the in-memory index used to find near-duplicate images by their perceptual hashes.
+
+A re-encoded or slightly resized copy of an image does not have the same perceptual hash as the original, but one that
+differs in only a few bits. Finding the hashes within a Hamming distance of a new one by comparing it with every hash in
+the library is O(N) per upload, so the index uses multi-index hashing instead: each 64-bit hash is split into four 16-bit
+chunks, and each chunk is indexed in its own table. Two hashes within distance `d` of each other must, by the pigeonhole
+principle, have at least one chunk within distance `d // 4`, so a query only needs to look up the chunks of the new hash
+(and the few values within `d // 4` bits of them) and verify the handful of candidates found.
+
+Example Usage:
+    >>> from nepyc.server.index.hamming import HammingIndex, hash_to_int
+    >>> index = HammingIndex()
+    >>> index.add(0x8f0f0f0f00000000, 1)
+    >>> index.nearest(0x8f0f0f0f00000003, distance=4)
+    (10308474629173280768, 2)
+    >>> index.get(0x8f0f0f0f00000000)
+    1
+"""
+import itertools
+import threading
+
+
+# The number of bits in the hashes indexed.
+HASH_BITS = 64
+
+
+def hash_to_int(image_hash) -> int:
+    """
+    Return a perceptual hash as an unsigned integer.
+
+    Parameters:
+        image_hash (imagehash.ImageHash | int):
+            The hash; e.g. :attr:`nepyc.server.pipeline.DecodedImage.average_hash`.
+
+    Returns:
+        int:
+            The hash's bits, most significant first.
+    """
+    if isinstance(image_hash, int):
+        return image_hash
+
+    return int(str(image_hash), 16)
+
+
+class HammingIndex:
+    """
+    A thread-safe map from 64-bit hashes to values, searchable by Hamming distance.
+
+    Attributes:
+        chunks (int):
+            The number of chunks each hash is split into, and indexed by.
+    """
+    def __init__(self, chunks: int = 4):
+        """
+        Initialize an empty index.
+
+        Parameters:
+            chunks (int, optional):
+                The number of chunks each hash is split into. More chunks mean smaller, more crowded tables, and fewer
+                probes per query. Defaults to 4.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError:
+                If `chunks` does not divide 64.
+        """
+        if chunks < 1 or HASH_BITS % chunks:
+            raise ValueError(f'The number of chunks must divide {HASH_BITS}')
+
+        self.__chunks  = chunks
+        self.__width   = HASH_BITS // chunks
+        self.__mask    = (1 << self.__width) - 1
+        self.__shifts  = tuple(self.__width * index for index in reversed(range(chunks)))
+        self.__entries = {}
+        self.__flips   = {}
+        self.__lock    = threading.Lock()
+        self.__tables  = [{} for _ in range(chunks)]
+
+    def __contains__(self, key) -> bool:
+        with self.__lock:
+            return key in self.__entries
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__entries)
+
+    @property
+    def chunks(self) -> int:
+        return self.__chunks
+
+    def add(self, key: int, value=None) -> None:
+        """
+        Add a hash, replacing the value of the same hash if it is already in the index.
+
+        Parameters:
+            key (int):
+                The hash.
+
+            value (optional):
+                The value to store with it; e.g. the file number of the image. Defaults to None.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self._add(key, value)
+
+    def update(self, items) -> None:
+        """
+        Add many hashes at once; e.g. to load the index of a saved library.
+
+        Parameters:
+            items (Iterable[tuple[int, Any]]):
+                The hashes and their values.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            for key, value in items:
+                self._add(key, value)
+
+    def add_if_new(self, key: int, value=None, distance: int = 0) -> bool:
+        """
+        Add a hash unless the index already holds one within `distance` of it, as a single step.
+
+        Parameters:
+            key (int):
+                The hash.
+
+            value (optional):
+                The value to store with it. Defaults to None.
+
+            distance (int, optional):
+                The largest Hamming distance at which an indexed hash counts as the same. Defaults to 0, exact matches
+                only.
+
+        Returns:
+            bool:
+                True if the hash was added, False if a near-duplicate was found instead.
+        """
+        with self.__lock:
+            if self._nearest(key, distance) is not None:
+                return False
+
+            self._add(key, value)
+
+            return True
+
+    def get(self, key: int, default=None):
+        """
+        Return the value stored with a hash.
+
+        Parameters:
+            key (int):
+                The hash.
+
+            default (optional):
+                Returned if the hash is not in the index. Defaults to None.
+
+        Returns:
+            The value, or `default`.
+        """
+        with self.__lock:
+            return self.__entries.get(key, default)
+
+    def nearest(self, key: int, distance: int = 0):
+        """
+        Find the indexed hash closest to `key`, if any is within `distance` of it.
+
+        Parameters:
+            key (int):
+                The hash to search for.
+
+            distance (int, optional):
+                The largest Hamming distance to search. Defaults to 0, exact matches only.
+
+        Returns:
+            tuple[int, int] | None:
+                The closest hash and its distance from `key`, or None if there is none within `distance`.
+        """
+        with self.__lock:
+            return self._nearest(key, distance)
+
+    def remove(self, key: int) -> None:
+        """
+        Remove a hash, if it is in the index.
+
+        Parameters:
+            key (int):
+                The hash.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            if key not in self.__entries:
+                return
+
+            del self.__entries[key]
+
+            for table, chunk in zip(self.__tables, self._split(key)):
+                bucket = table[chunk]
+                bucket.discard(key)
+
+                if not bucket:
+                    del table[chunk]
+
+    def _add(self, key, value) -> None:
+        """
+        Add a hash. Must be called with the lock held.
+        """
+        if key not in self.__entries:
+            mask = self.__mask
+
+            for table, shift in zip(self.__tables, self.__shifts):
+                chunk  = (key >> shift) & mask
+                bucket = table.get(chunk)
+
+                if bucket is None:
+                    table[chunk] = {key}
+                else:
+                    bucket.add(key)
+
+        self.__entries[key] = value
+
+    def _nearest(self, key, distance):
+        """
+        Find the closest hash within `distance`. Must be called with the lock held.
+        """
+        if key in self.__entries:
+            return key, 0
+
+        if distance <= 0:
+            return None
+
+        best = None
+        flips = self._flips(distance // self.__chunks)
+
+        for table, chunk in zip(self.__tables, self._split(key)):
+            for flip in flips:
+                for candidate in table.get(chunk ^ flip, ()):
+                    found = (candidate ^ key).bit_count()
+
+                    if found <= distance and (best is None or found < best[1]):
+                        best = (candidate, found)
+
+                        if found == 1:
+                            return best
+
+        return best
+
+    def _flips(self, radius):
+        """
+        Return every chunk-wide mask with at most `radius` bits set.
+        """
+        flips = self.__flips.get(radius)
+
+        if flips is None:
+            flips = [0]
+
+            for count in range(1, min(radius, self.__width) + 1):
+                for bits in itertools.combinations(range(self.__width), count):
+                    flips.append(sum(1 << bit for bit in bits))
+
+            self.__flips[radius] = flips
+
+        return flips
+
+    def _split(self, key):
+        """
+        Split a hash into its chunks, most significant first.
+        """
+        return [(key >> shift) & self.__mask for shift in self.__shifts]
+
+
+__all__ = [
+    'HASH_BITS',
+    'HammingIndex',
+    'hash_to_int',
+]
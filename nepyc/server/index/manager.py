@@ -0,0 +1,34 @@
+"""
+This module shares a :class:`~nepyc.server.index.store.HashStore` between processes.
+
+The store lives in a manager process; every acceptor process talks to it through a proxy, so claims and commits from
+all of them are serialized by the store's own lock.
+
+Example Usage:
+    >>> from nepyc.server.index.manager import IndexManager
+    >>> manager = IndexManager()
+    >>> manager.start()
+    >>> store = manager.HashStore('~/Pictures/nepyc')
+    >>> store.contains('d41d8cd98f00b204e9800998ecf8427e')
+    False
+"""
+from multiprocessing.managers import BaseManager
+from nepyc.server.index.store import HashStore
+
+
+class IndexManager(BaseManager):
+    """
+    A manager process serving shared hash stores.
+    """
+
+
+IndexManager.register(
+    'HashStore',
+    HashStore,
+    exposed=('claim', 'commit', 'contains', 'contains_digest', 'flush', 'release', 'size', 'stats')
+)
+
+
+__all__ = [
+    'IndexManager',
+]
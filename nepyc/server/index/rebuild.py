@@ -0,0 +1,299 @@
+"""
+This module rebuilds the index of saved images from the images in the save directory.
+
+The index is otherwise only ever extended as images are uploaded, so this is the way to recover one that has been lost
+or damaged, to check one against the images it describes, and to record the hashes that images saved by an older version
+of nePyc were saved without (see :mod:`nepyc.server.index.database`).
+
+Every saved image (`<number>.png`) is read in a pool of worker processes, in batches. For each image, a worker computes
+the MD5 digest of its pixel data, the digest of its encoded bytes and a grayscale thumbnail; the average hashes of the
+whole batch are then computed from the stacked thumbnails in a single vectorized pass, rather than one image at a time.
+The results are written to the index in bulk, a transaction per :data:`WRITE_SIZE` images.
+
+A rebuild can be interrupted and run again: images that already have every hash recorded are skipped, unless a full
+rebuild is asked for.
+
+Example Usage:
+    >>> from nepyc.server.index.rebuild import rebuild_index
+    >>> rebuild_index('~/Pictures/nepyc', workers=4, with_progress=True)
+    RebuildSummary(scanned=1200, skipped=0, written=1198, duplicates=1, failed=1, removed=0)
+"""
+import hashlib
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+from nepyc.log_engine import ROOT_LOGGER
+from nepyc.server.index.bloom import BLOOM_FILE_NAME
+from nepyc.server.index.database import HashIndex
+from nepyc.server.pipeline.flight import raw_digest
+
+
+MOD_LOGGER = ROOT_LOGGER.get_child('server.index.rebuild')
+
+# The names images are saved under; see :meth:`nepyc.server.server.ImageServer.save_image`.
+SAVED_NAME = re.compile(r'(\d+)\.png')
+
+# The width and height of the thumbnails average hashes are computed from, as in `imagehash.average_hash`.
+HASH_SIZE = 8
+
+# The number of images each worker reads per batch.
+DEFAULT_BATCH_SIZE = 64
+
+# The number of images written to the index per transaction.
+WRITE_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class RebuildSummary:
+    """
+    The outcome of rebuilding an index.
+
+    Attributes:
+        scanned (int):
+            The number of saved images found in the save directory.
+
+        skipped (int):
+            The number of images not read, because the index already had every hash of them.
+
+        written (int):
+            The number of images written to the index.
+
+        duplicates (int):
+            The number of images not written, because their pixel data is the same as another saved image's.
+
+        failed (int):
+            The number of images that could not be read.
+
+        removed (int):
+            The number of images removed from the index, because their files no longer exist.
+    """
+    scanned:    int
+    skipped:    int
+    written:    int
+    duplicates: int
+    failed:     int
+    removed:    int
+
+
+def saved_images(directory) -> dict:
+    """
+    Find the saved images in a save directory.
+
+    Parameters:
+        directory (str | pathlib.Path):
+            The save directory.
+
+    Returns:
+        dict[int, pathlib.Path]:
+            The path of each saved image, keyed by its file number.
+    """
+    images = {}
+
+    for entry in os.scandir(Path(directory).expanduser()):
+        match = SAVED_NAME.fullmatch(entry.name)
+
+        if match and entry.is_file():
+            images[int(match.group(1))] = Path(entry.path)
+
+    return images
+
+
+def average_hashes(thumbnails) -> list:
+    """
+    Compute the average hashes of many images at once, from their grayscale thumbnails.
+
+    The hashes are the same as `imagehash.average_hash` computes one at a time: a bit per pixel, set if the pixel is
+    brighter than the thumbnail's mean, most significant first.
+
+    Parameters:
+        thumbnails (numpy.ndarray):
+            The thumbnails; an array of shape `(count, HASH_SIZE, HASH_SIZE)`.
+
+    Returns:
+        list[int]:
+            The average hash of each thumbnail, as an unsigned integer.
+    """
+    pixels = np.asarray(thumbnails, dtype=np.float64).reshape(len(thumbnails), -1)
+    bits   = np.packbits(pixels > pixels.mean(axis=1, keepdims=True), axis=1)
+
+    return [int.from_bytes(row.tobytes(), 'big') for row in bits]
+
+
+def hash_images(batch) -> tuple:
+    """
+    Read a batch of saved images and compute their hashes. This is run in the worker processes.
+
+    Parameters:
+        batch (list[tuple[int, str]]):
+            The file number and path of each image.
+
+    Returns:
+        tuple[list[tuple[int, str, int, bytes]], list[tuple[int, str]]]:
+            The file number, MD5 digest, average hash and raw digest of each image that could be read, and the file
+            number and error of each that could not.
+    """
+    read   = []
+    failed = []
+    thumbnails = []
+
+    for number, path in batch:
+        try:
+            data = Path(path).read_bytes()
+
+            with Image.open(BytesIO(data)) as image:
+                image.load()
+                md5 = hashlib.md5(image.tobytes()).hexdigest()
+                thumbnail = image.convert('L').resize((HASH_SIZE, HASH_SIZE), Image.Resampling.LANCZOS)
+        except (OSError, ValueError) as e:
+            failed.append((number, str(e)))
+            continue
+
+        read.append((number, md5, raw_digest(data)))
+        thumbnails.append(np.asarray(thumbnail))
+
+    if not read:
+        return [], failed
+
+    hashes = average_hashes(np.stack(thumbnails))
+
+    return [(number, md5, average_hash, digest) for (number, md5, digest), average_hash in zip(read, hashes)], failed
+
+
+def rebuild_index(
+        directory,
+        workers: int = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        full: bool = False,
+        with_progress: bool = False
+) -> RebuildSummary:
+    """
+    Rebuild the index of a save directory from the images in it.
+
+    Images whose files no longer exist are removed from the index first. Then every saved image the index does not
+    have every hash of (or, for a full rebuild, every saved image) is read and written to the index. An image whose
+    pixel data is the same as another's already in the index is reported as a duplicate and left out of it; its file is
+    left where it is, and the server does not save over it (see :meth:`nepyc.server.index.store.HashStore.claim`).
+
+    The index must not be in use by a running server. If anything is to be changed, the saved Bloom filter is deleted,
+    so it is rebuilt from the new index the next time the server starts.
+
+    Parameters:
+        directory (str | pathlib.Path):
+            The save directory.
+
+        workers (int, optional):
+            The number of worker processes reading images. Defaults to the number of CPUs.
+
+        batch_size (int, optional):
+            The number of images each worker reads at a time. Defaults to 64.
+
+        full (bool, optional):
+            Read every saved image, including those the index already has every hash of; e.g. to check the index.
+            Defaults to False.
+
+        with_progress (bool, optional):
+            Show a progress bar. Defaults to False.
+
+    Returns:
+        RebuildSummary:
+            What was found and done.
+    """
+    log = MOD_LOGGER.get_child('rebuild_index')
+    directory = Path(directory).expanduser()
+    index = HashIndex(directory)
+
+    try:
+        files   = saved_images(directory)
+        removed = index.retain(files)
+        done    = set() if full else index.complete_numbers()
+        pending = [(number, os.fspath(path)) for number, path in sorted(files.items()) if number not in done]
+        log.info(f'Found {len(files)} saved images; {len(pending)} to read, {removed} removed from the index')
+
+        if pending or removed:
+            directory.joinpath(BLOOM_FILE_NAME).unlink(missing_ok=True)
+
+        # Which image each hash belongs to, so a duplicate is found before it is written.
+        owners  = index.entries()
+        hashes  = {number: md5 for md5, number in owners.items()}
+        rows    = []
+        written = duplicates = failed = 0
+
+        progress = tqdm(total=len(pending), desc='Rebuilding index', unit='image', disable=not with_progress)
+
+        try:
+            with ProcessPoolExecutor(workers) as pool:
+                futures = deque(
+                    pool.submit(hash_images, pending[start:start + batch_size])
+                    for start in range(0, len(pending), batch_size)
+                )
+
+                try:
+                    while futures:
+                        records, errors = futures.popleft().result()
+
+                        for number, error in errors:
+                            log.warning(f'Unable to read {files[number]}: {error}')
+                            failed += 1
+
+                        for record in records:
+                            number, md5 = record[:2]
+                            owner = owners.get(md5)
+
+                            if owner is not None and owner != number:
+                                log.warning(f'{files[number]} is a duplicate of {owner}.png; not indexed')
+                                duplicates += 1
+                                continue
+
+                            owners.pop(hashes.get(number), None)
+                            owners[md5] = hashes[number] = number
+                            rows.append(record)
+
+                        if len(rows) >= WRITE_SIZE:
+                            index.put_many(rows)
+                            written += len(rows)
+                            rows = []
+
+                        progress.update(len(records) + len(errors))
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+
+                    raise
+        finally:
+            # Whatever has been read is written, so an interrupted rebuild resumes after it.
+            index.put_many(rows)
+            written += len(rows)
+            progress.close()
+
+        index.flush()
+    finally:
+        index.close()
+
+    summary = RebuildSummary(
+        scanned=len(files),
+        skipped=len(files) - len(pending),
+        written=written,
+        duplicates=duplicates,
+        failed=failed,
+        removed=removed
+    )
+    log.info(f'Index rebuilt: {summary}')
+
+    return summary
+
+
+__all__ = [
+    'DEFAULT_BATCH_SIZE',
+    'RebuildSummary',
+    'average_hashes',
+    'hash_images',
+    'rebuild_index',
+    'saved_images',
+]
@@ -0,0 +1,410 @@
+"""
+This module contains the store that tracks which images have already been saved.
+
+The store is the one place that reads and extends the index of saved images (see :mod:`nepyc.server.index.database`).
+It loads the index once, keeps it in memory for constant-time lookups, and hands out file numbers for new images from a
+free list, so every connection, ingest worker and acceptor process that shares a store agrees on what has been saved
+without going back to disk; each saved image is a single append to the index.
+
+The average hashes of saved images are kept in a :class:`~nepyc.server.index.hamming.HammingIndex` as well, so an image
+can be refused as a near-duplicate of one already saved (e.g. a re-encoded or resized copy of it), and so are the
+digests of the encoded bytes they were received as, so an exact re-send can be refused before it is decoded (see
+:meth:`HashStore.contains_digest`).
+
+For very large libraries, the store can be given the expected library size instead. The hashes and digests are then not
+held in memory; a :class:`~nepyc.server.index.bloom.BloomFilter` of them, sized for that many images, answers the
+lookups of new images on its own, and only its (rare) hits are confirmed against the index on disk.
+
+Saving an image is a three-step exchange, so two uploads of the same image can never both be saved:
+
+    >>> from nepyc.server.index.store import HashStore
+    >>> store = HashStore('~/Pictures/nepyc')
+    >>> number = store.claim(img_hash, average_hash, distance=4, raw_digest=digest)
+    >>> if number is not None:
+    ...     try:
+    ...         image.save(f'{number}.png')
+    ...     except OSError:
+    ...         store.release(img_hash)
+    ...         raise
+    ...     store.commit(img_hash)
+"""
+import bisect
+import threading
+from pathlib import Path
+from nepyc.log_engine import ROOT_LOGGER, Loggable
+from nepyc.server.index.bloom import BLOOM_FILE_NAME, BloomFilter
+from nepyc.server.index.database import HashIndex
+from nepyc.server.index.hamming import HammingIndex
+from nepyc.server.utils.images import assign_number
+
+
+MOD_LOGGER = ROOT_LOGGER.get_child('server.index.store')
+
+
+class HashStore(Loggable):
+    """
+    The hashes of saved images and the file numbers they were saved under. All methods are thread-safe.
+
+    Attributes:
+        directory (str):
+            The save directory holding the index.
+
+        index (nepyc.server.index.database.HashIndex):
+            The on-disk index the store is loaded from and appends to.
+
+        bloom (nepyc.server.index.bloom.BloomFilter | None):
+            The filter in front of the index, if the store was given an expected library size.
+    """
+    def __init__(self, directory, expected_size: int = 0, error_rate: float = 0.01):
+        """
+        Initialize the store, loading the index from `directory`.
+
+        Parameters:
+            directory (str | pathlib.Path):
+                The save directory holding the index.
+
+            expected_size (int, optional):
+                The number of images the library is expected to grow to. If given, lookups go through a Bloom filter
+                sized for that many images, saved next to the index, instead of the hashes being held in memory.
+                Defaults to 0, no filter.
+
+            error_rate (float, optional):
+                The false-positive rate the Bloom filter is sized for. Defaults to 0.01.
+
+        Returns:
+            None
+        """
+        super().__init__(MOD_LOGGER)
+        log = self.create_logger()
+
+        self.__directory = str(directory)
+        self.__index     = HashIndex(directory)
+        self.__lock      = threading.Lock()
+        self.__pending   = {}
+        self.__size      = self.__index.size()
+
+        self.__missing, self.__max_number = self.__index.free_numbers()
+        self.__near = HammingIndex()
+        self.__near.update(self.__index.average_hashes())
+
+        self.__bloom_dirty = False
+        self.__bloom_false_positives = 0
+        self.__bloom_negatives = 0
+
+        if expected_size > 0:
+            self.__known   = None
+            self.__digests = None
+            self.__bloom   = self._load_bloom(expected_size, error_rate)
+        else:
+            self.__known   = self.__index.entries()
+            self.__digests = self.__index.raw_digests()
+            self.__bloom   = None
+
+        log.debug(f'Loaded {self.__size} hashes ({len(self.__near)} average hashes) from {self.__index.path}')
+
+    @property
+    def bloom_path(self) -> Path:
+        """
+        Return the path the Bloom filter is saved to.
+
+        Returns:
+            pathlib.Path:
+                The path, in the save directory.
+        """
+        return self.__index.path.with_name(BLOOM_FILE_NAME)
+
+    @property
+    def directory(self) -> str:
+        """
+        Return the save directory holding the hash database.
+
+        Returns:
+            str:
+                The save directory.
+        """
+        return self.__directory
+
+    @property
+    def bloom(self):
+        """
+        Return the Bloom filter in front of the index.
+
+        Returns:
+            nepyc.server.index.bloom.BloomFilter | None:
+                The filter, or None if the store holds the hashes in memory instead.
+        """
+        return self.__bloom
+
+    @property
+    def index(self) -> HashIndex:
+        """
+        Return the on-disk index the store is loaded from and appends to.
+
+        Returns:
+            nepyc.server.index.database.HashIndex:
+                The index.
+        """
+        return self.__index
+
+    def claim(self, img_hash: str, average_hash: int = None, distance: int = 0, raw_digest: bytes = None):
+        """
+        Reserve a file number for a new image. Until the claim is committed or released, the image counts as saved, so
+        concurrent uploads of the same image are refused.
+
+        Parameters:
+            img_hash (str):
+                The hex MD5 digest of the image's pixel data.
+
+            average_hash (int, optional):
+                The image's 64-bit average hash. If given, the image is also refused if the average hash of a saved (or
+                claimed) image is within `distance` of it.
+
+            distance (int, optional):
+                The largest Hamming distance between average hashes at which two images count as the same. Defaults to
+                0, identical average hashes only.
+
+            raw_digest (bytes, optional):
+                The digest of the encoded bytes the image was received as; recorded with the image once the claim is
+                committed.
+
+        Returns:
+            int | None:
+                The file number to save the image under, or None if the image has already been saved (or claimed).
+        """
+        with self.__lock:
+            if img_hash in self.__pending or self._saved(img_hash):
+                return None
+
+            if average_hash is not None and self.__near.nearest(average_hash, distance) is not None:
+                return None
+
+            number = self._next_number()
+            self.__pending[img_hash] = (number, average_hash, raw_digest)
+
+            if average_hash is not None:
+                self.__near.add(average_hash, number)
+
+            return number
+
+    def commit(self, img_hash: str) -> None:
+        """
+        Record a claimed image as saved, appending it to the index.
+
+        Parameters:
+            img_hash (str):
+                The hash passed to :meth:`claim`.
+
+        Returns:
+            None
+
+        Raises:
+            KeyError:
+                If the hash has not been claimed.
+        """
+        with self.__lock:
+            number, average_hash, raw_digest = self.__pending[img_hash]
+            self.__index.add(img_hash, number, average_hash=average_hash, raw_digest=raw_digest)
+            del self.__pending[img_hash]
+            self.__size += 1
+
+            if self.__bloom is not None:
+                self.__bloom.add(img_hash)
+                self.__bloom_dirty = True
+
+                if raw_digest is not None:
+                    self.__bloom.add(raw_digest)
+            else:
+                self.__known[img_hash] = number
+
+                if raw_digest is not None:
+                    self.__digests[raw_digest] = number
+
+    def contains(self, img_hash: str) -> bool:
+        """
+        Return whether an image has been saved or claimed.
+
+        Parameters:
+            img_hash (str):
+                The hex MD5 digest of the image's pixel data.
+
+        Returns:
+            bool:
+                True if the image has been saved or claimed.
+        """
+        with self.__lock:
+            return img_hash in self.__pending or self._saved(img_hash)
+
+    def contains_digest(self, raw_digest: bytes) -> bool:
+        """
+        Return whether an image has been saved from exactly the same encoded bytes; unlike :meth:`contains`, this needs
+        no decode.
+
+        Parameters:
+            raw_digest (bytes):
+                The digest of the encoded bytes; see :func:`nepyc.server.pipeline.flight.raw_digest`.
+
+        Returns:
+            bool:
+                True if an image received as the same bytes has been saved.
+        """
+        with self.__lock:
+            if self.__bloom is None:
+                return raw_digest in self.__digests
+
+            return self._confirm(raw_digest, self.__index.contains_digest)
+
+    def flush(self) -> None:
+        """
+        Force every commit so far out to disk, so none are lost if the machine goes down; e.g. before the server exits.
+        The Bloom filter, if there is one, is saved too.
+
+        Returns:
+            None
+        """
+        self.__index.flush()
+
+        with self.__lock:
+            if self.__bloom_dirty:
+                self.__bloom.save(self.bloom_path)
+                self.__bloom_dirty = False
+
+    def release(self, img_hash: str) -> None:
+        """
+        Give up a claim, e.g. because the image could not be written; its file number is handed out again.
+
+        Parameters:
+            img_hash (str):
+                The hash passed to :meth:`claim`.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            claim = self.__pending.pop(img_hash, None)
+
+            if claim is None:
+                return
+
+            number, average_hash, _ = claim
+            bisect.insort(self.__missing, number)
+
+            if average_hash is not None:
+                self.__near.remove(average_hash)
+
+    def size(self) -> int:
+        """
+        Return the number of saved images.
+
+        Returns:
+            int:
+                The number of hashes in the index.
+        """
+        with self.__lock:
+            return self.__size
+
+    def stats(self) -> dict:
+        """
+        Return the store's size and, if it has a Bloom filter, the filter's counters.
+
+        Returns:
+            dict:
+                The number of saved images, claims in progress and average hashes indexed. With a Bloom filter, the
+                filter's stats (see :meth:`BloomFilter.stats`) are included under `bloom`, together with the number of
+                lookups it answered on its own (`negatives`), the number of its hits the index did not confirm
+                (`false_positives`) and the false-positive rate observed from the two.
+        """
+        with self.__lock:
+            stats = {'size': self.__size, 'pending': len(self.__pending), 'average_hashes': len(self.__near)}
+
+            if self.__bloom is not None:
+                false_positives = self.__bloom_false_positives
+                misses = false_positives + self.__bloom_negatives
+
+                stats['bloom'] = {
+                    **self.__bloom.stats(),
+                    'negatives': self.__bloom_negatives,
+                    'false_positives': false_positives,
+                    'observed_false_positive_rate': false_positives / misses if misses else 0.0,
+                }
+
+        return stats
+
+    def _confirm(self, key, lookup) -> bool:
+        """
+        Look a key up in the Bloom filter, confirming a hit with `lookup`. Must be called with the lock held.
+        """
+        if key not in self.__bloom:
+            self.__bloom_negatives += 1
+
+            return False
+
+        if lookup(key):
+            return True
+
+        self.__bloom_false_positives += 1
+
+        return False
+
+    def _load_bloom(self, expected_size, error_rate) -> BloomFilter:
+        """
+        Load the saved Bloom filter, or rebuild it from the index if it is missing, out of date, or sized differently.
+        """
+        log = self.create_logger()
+
+        # Each image adds its hash and, usually, its raw digest.
+        capacity = 2 * max(expected_size, self.__size)
+        keys     = self.__index.key_count()
+
+        if self.__size > expected_size:
+            log.warning(f'The library holds {self.__size} images, more than the {expected_size} expected')
+
+        try:
+            bloom = BloomFilter.load(self.bloom_path)
+        except (OSError, ValueError) as e:
+            log.debug(f'Not using the saved Bloom filter: {e}')
+        else:
+            if (bloom.capacity, bloom.error_rate, len(bloom)) == (capacity, error_rate, keys):
+                return bloom
+
+            log.debug('The saved Bloom filter is out of date')
+
+        bloom = BloomFilter(capacity, error_rate)
+
+        for img_hash in self.__index.entries():
+            bloom.add(img_hash)
+
+        for raw_digest in self.__index.raw_digests():
+            bloom.add(raw_digest)
+
+        bloom.save(self.bloom_path)
+        log.info(f'Built a Bloom filter of {keys} keys ({bloom.size_in_bytes} bytes)')
+
+        return bloom
+
+    def _next_number(self) -> int:
+        """
+        Hand out a file number for a new image. Numbers whose file exists without being in the index (e.g. an image a
+        rebuild left out as a duplicate, or could not read) are skipped, so that file is never overwritten. Must be
+        called with the lock held.
+        """
+        while True:
+            number, self.__max_number = assign_number(self.__missing, self.__max_number)
+
+            if not self.__index.path.with_name(f'{number}.png').exists():
+                return number
+
+            self.create_logger().warning(f'{number}.png exists but is not in the index; not reusing its number')
+
+    def _saved(self, img_hash) -> bool:
+        """
+        Return whether an image has been saved. Must be called with the lock held.
+        """
+        if self.__bloom is None:
+            return img_hash in self.__known
+
+        return self._confirm(img_hash, self.__index.contains)
+
+
+__all__ = [
+    'HashStore',
+]
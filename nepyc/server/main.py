@@ -13,12 +13,64 @@ APP_LOGGER = ROOT_LOGGER.get_child('Server')
 
 
 def main():
+    log = APP_LOGGER.get_child('main')
+
+    if ARGS.parsed.command == 'rebuild-index':
+        rebuild_index(log)
+
+        return
+
     from nepyc.server.server import ImageServer
     setup_signal_handler()
-    log = APP_LOGGER.get_child('main')
     log.debug('Starting the image server...')
 
-    server = ImageServer(host=ARGS.parsed.host, port=ARGS.parsed.port, save_incoming_images=ARGS.parsed.save_images)
+    server_kwargs = dict(
+        host=ARGS.parsed.host,
+        port=ARGS.parsed.port,
+        save_incoming_images=ARGS.parsed.save_images,
+        engine=ARGS.parsed.engine,
+        read_size=ARGS.parsed.read_size,
+        decode_workers=ARGS.parsed.decode_workers,
+        queue_size=ARGS.parsed.queue_size,
+        ingest_workers=ARGS.parsed.ingest_workers,
+        busy_retry_after=ARGS.parsed.busy_retry_after,
+        max_frame_size=ARGS.parsed.max_frame_size,
+        spool_threshold=ARGS.parsed.spool_threshold,
+        memory_budget=ARGS.parsed.memory_budget,
+        allowed_formats=ARGS.parsed.allowed_formats,
+        max_pixels=ARGS.parsed.max_pixels,
+        tcp=ARGS.parsed.tcp,
+        unix_socket=ARGS.parsed.unix_socket,
+        upload_timeout=ARGS.parsed.upload_timeout,
+        idle_timeout=ARGS.parsed.idle_timeout,
+        header_timeout=ARGS.parsed.header_timeout,
+        body_timeout=ARGS.parsed.body_timeout,
+        min_throughput=ARGS.parsed.min_throughput,
+        max_connections=ARGS.parsed.max_connections,
+        client_image_rate=ARGS.parsed.client_image_rate,
+        client_byte_rate=ARGS.parsed.client_byte_rate,
+        client_burst=ARGS.parsed.client_burst,
+        drain_timeout=ARGS.parsed.drain_timeout,
+        tcp_nodelay=ARGS.parsed.tcp_nodelay,
+        keepalive=ARGS.parsed.keepalive,
+        recv_buffer=ARGS.parsed.recv_buffer,
+        send_buffer=ARGS.parsed.send_buffer,
+        listen_backlog=ARGS.parsed.listen_backlog,
+        reject_cache_size=ARGS.parsed.reject_cache_size,
+        reject_cache_ttl=ARGS.parsed.reject_cache_ttl,
+        duplicate_distance=ARGS.parsed.duplicate_distance,
+        expected_library_size=ARGS.parsed.expected_library_size,
+        bloom_error_rate=ARGS.parsed.bloom_error_rate,
+    )
+
+    if ARGS.parsed.workers > 1:
+        from nepyc.server.workers import WorkerPool
+
+        run_workers(WorkerPool(ARGS.parsed.workers, **server_kwargs), log)
+
+        return
+
+    server = ImageServer(**server_kwargs)
 
     try:
         server_thread = threading.Thread(target=server.run_server, daemon=True)
@@ -29,10 +81,67 @@ def main():
         log.info('Exiting due to keyboard interrupt')
         exit_flag.set()
     finally:
+        # Drains the server, so uploads in flight are finished and saved before the process exits.
         server.stop()
         server_thread.join()
         log.info('Exiting...')
-        os._exit(0)
+
+
+def rebuild_index(log):
+    """
+    Rebuild the index of the save directory from the images in it, with a progress bar.
+
+    Parameters:
+        log:
+            The logger to report the outcome to.
+
+    Returns:
+        None
+    """
+    from nepyc.server.index.rebuild import rebuild_index as rebuild
+
+    log.info(f'Rebuilding the index of {ARGS.parsed.save_directory}...')
+
+    try:
+        summary = rebuild(
+            ARGS.parsed.save_directory,
+            workers=ARGS.parsed.jobs,
+            batch_size=ARGS.parsed.batch_size,
+            full=ARGS.parsed.full,
+            with_progress=True
+        )
+    except KeyboardInterrupt:
+        log.info('Rebuild interrupted; run it again to resume')
+
+        return
+
+    log.info(f'Indexed {summary.written} of {summary.scanned} images ({summary.skipped} already indexed, '
+             f'{summary.duplicates} duplicates, {summary.failed} unreadable, {summary.removed} removed)')
+
+
+def run_workers(pool, log):
+    """
+    Run the server in multi-process worker mode until the slideshow is closed.
+
+    Parameters:
+        pool (nepyc.server.workers.WorkerPool):
+            The pool of acceptor processes.
+
+        log:
+            The logger to report progress to.
+
+    Returns:
+        None
+    """
+    try:
+        pool.start()
+        pool.gui.start()
+    except KeyboardInterrupt:
+        log.info('Exiting due to keyboard interrupt')
+        exit_flag.set()
+    finally:
+        pool.stop()
+        log.info('Exiting...')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,29 @@
+"""
+The stages that received frames pass through before they are acknowledged.
+"""
+from nepyc.server.pipeline.decode import DecodedImage, DecodeStage, decode_image
+from nepyc.server.pipeline.flight import SingleFlight, raw_digest
+from nepyc.server.pipeline.limits import ImageLimits, LimitError
+from nepyc.server.pipeline.queue import IngestQueue
+from nepyc.server.pipeline.rejects import RejectCache
+from nepyc.server.pipeline.session import PipelineSession
+from nepyc.server.pipeline.throttle import ClientThrottle, TokenBucket
+from nepyc.server.pipeline.uploads import UploadError, UploadSessions
+
+
+__all__ = [
+    'ClientThrottle',
+    'DecodedImage',
+    'DecodeStage',
+    'ImageLimits',
+    'LimitError',
+    'IngestQueue',
+    'PipelineSession',
+    'RejectCache',
+    'SingleFlight',
+    'TokenBucket',
+    'UploadError',
+    'UploadSessions',
+    'decode_image',
+    'raw_digest',
+]
@@ -0,0 +1,355 @@
+"""
+This module contains the decode-and-hash stage that incoming frames pass through before they are accepted.
+
+Decoding and hashing are CPU-bound and hold the GIL, so :class:`DecodeStage` can run them in a pool of worker processes.
+The work itself is done by :func:`decode_image`, which only takes the raw encoded bytes so it can be pickled to a worker.
+
+Example Usage:
+    >>> from nepyc.server.pipeline.decode import DecodeStage
+    >>> stage = DecodeStage(workers=4)
+    >>> decoded = stage.decode(image_data)
+    >>> decoded.size
+    (800, 600)
+"""
+import hashlib
+import io
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+import imagehash
+from PIL import Image
+from nepyc.log_engine import ROOT_LOGGER, Loggable
+from nepyc.server.pipeline.limits import ImageLimits, LimitError
+from nepyc.server.utils.buffers import MemoryViewReader
+
+
+MOD_LOGGER = ROOT_LOGGER.get_child('server.pipeline.decode')
+
+
+@dataclass(frozen=True)
+class DecodedImage:
+    """
+    The result of decoding and hashing a received frame.
+
+    Attributes:
+        image (PIL.Image.Image):
+            The fully loaded image.
+
+        average_hash (imagehash.ImageHash):
+            The perceptual (average) hash of the image.
+
+        md5 (str):
+            The hex MD5 digest of the decoded pixel data, as stored in the hash database.
+
+        format (str):
+            The encoded format of the frame (e.g. 'PNG').
+
+        mode (str):
+            The pixel mode of the image (e.g. 'RGB').
+
+        size (tuple[int, int]):
+            The width and height of the image.
+
+        byte_count (int):
+            The size of the encoded frame in bytes.
+    """
+    image:        Image.Image
+    average_hash: imagehash.ImageHash
+    md5:          str
+    format:       str
+    mode:         str
+    size:         tuple
+    byte_count:   int
+
+
+def open_image_data(image_data):
+    """
+    Return a seekable binary file object over received image data, without copying it.
+
+    Parameters:
+        image_data (bytes | bytearray | memoryview | BinaryIO):
+            The encoded image data, either as a buffer or as a binary file object (e.g. a spooled payload).
+
+    Returns:
+        BinaryIO:
+            A file object positioned at the start of the image data.
+    """
+    if hasattr(image_data, 'read'):
+        image_data.seek(0)
+        return image_data
+
+    return MemoryViewReader(image_data)
+
+
+def read_image_data(image_data) -> bytes:
+    """
+    Return received image data as `bytes`, e.g. to pickle it to a worker process.
+
+    Parameters:
+        image_data (bytes | bytearray | memoryview | BinaryIO):
+            The encoded image data, either as a buffer or as a binary file object.
+
+    Returns:
+        bytes:
+            The encoded image data.
+    """
+    if hasattr(image_data, 'read'):
+        return open_image_data(image_data).read()
+
+    return bytes(image_data)
+
+
+def apply_pixel_limit(limits: ImageLimits = None) -> None:
+    """
+    Set Pillow's decompression-bomb threshold from the image limits, in a decode worker process.
+
+    Pillow refuses to open an image larger than twice its own threshold, which defaults to about 89 million pixels;
+    that would refuse images within a higher `max_pixels` before :meth:`ImageLimits.check` saw them. With the threshold
+    set to `max_pixels` (or removed, if there is no pixel limit), :meth:`ImageLimits.check` is what refuses them.
+
+    The threshold is global to the process, so this is only applied in worker processes, which decode nothing else.
+
+    Parameters:
+        limits (ImageLimits, optional):
+            The limits decoded images must be within. If not given, Pillow's default threshold is left in place.
+
+    Returns:
+        None
+    """
+    if limits is not None:
+        Image.MAX_IMAGE_PIXELS = limits.max_pixels or None
+
+
+def decode_image(image_data, limits: ImageLimits = None) -> DecodedImage:
+    """
+    Decode a received frame and compute its hashes. If `limits` are given, the image's format and dimensions are read
+    from its header and checked before any pixel data is decoded.
+
+    Parameters:
+        image_data (bytes | bytearray | memoryview | BinaryIO):
+            The encoded image data received from the client, either as a buffer or as a binary file object.
+
+        limits (ImageLimits, optional):
+            The limits the image must be within.
+
+    Returns:
+        DecodedImage:
+            The decoded image, its hashes and metadata.
+
+    Raises:
+        OSError:
+            If the image data cannot be identified or decoded.
+
+        LimitError:
+            If the image exceeds `limits`, or is so large Pillow refuses to open it as a decompression bomb.
+    """
+    source = open_image_data(image_data)
+
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise LimitError(str(e)) from e
+
+    if limits is not None:
+        limits.check(image_format=image.format, width=image.width, height=image.height)
+
+    image.load()
+
+    return DecodedImage(
+        image=image,
+        average_hash=imagehash.average_hash(image),
+        md5=hashlib.md5(image.tobytes()).hexdigest(),
+        format=image.format,
+        mode=image.mode,
+        size=image.size,
+        byte_count=source.seek(0, io.SEEK_END),
+    )
+
+
+class DecodeStage(Loggable):
+    """
+    Run :func:`decode_image` inline or in a pool of worker processes.
+
+    Attributes:
+        workers (int):
+            The number of worker processes. If zero, frames are decoded inline on the calling thread.
+    """
+    def __init__(self, workers: int = 0, limits: ImageLimits = None):
+        """
+        Initialize the stage.
+
+        Parameters:
+            workers (int, optional):
+                The number of worker processes to decode with. If zero, frames are decoded inline on the calling thread.
+                Defaults to 0.
+
+            limits (ImageLimits, optional):
+                The limits decoded images must be within; see :func:`decode_image`. Worker processes set Pillow's
+                decompression-bomb threshold to match (see :func:`apply_pixel_limit`); frames decoded inline are still
+                refused by Pillow past twice its own threshold. Defaults to none.
+
+        Returns:
+            None
+
+        Raises:
+            TypeError:
+                If `workers` is not an integer.
+
+            ValueError:
+                If `workers` is negative.
+        """
+        super().__init__(MOD_LOGGER)
+
+        if not isinstance(workers, int):
+            raise TypeError('The number of decode workers must be an integer')
+
+        if workers < 0:
+            raise ValueError('The number of decode workers must not be negative')
+
+        self.__workers  = workers
+        self.__executor = None
+        self.__limits   = limits
+        self.__lock     = threading.Lock()
+        self.__closed   = False
+
+        # Frames decoded inline are opened under the process's own threshold, which other users of Pillow (e.g. the
+        # GUI) rely on, so it is left alone; only :meth:`ImageLimits.check` applies `limits` to them.
+        if workers:
+            self.__executor = self._create_executor()
+
+    @property
+    def limits(self):
+        """
+        Return the limits decoded images must be within.
+
+        Returns:
+            ImageLimits | None:
+                The limits, or None if images are not checked.
+        """
+        return self.__limits
+
+    @property
+    def workers(self) -> int:
+        """
+        Return the number of worker processes.
+
+        Returns:
+            int:
+                The number of worker processes; zero if frames are decoded inline.
+        """
+        return self.__workers
+
+    def submit(self, image_data) -> Future:
+        """
+        Submit a frame to be decoded.
+
+        Note:
+            Frames sent to worker processes are copied to `bytes` so they can be pickled; spooled frames are read back
+            from disk to do so.
+
+        Parameters:
+            image_data (bytes | bytearray | memoryview | BinaryIO):
+                The encoded image data received from the client.
+
+        Returns:
+            concurrent.futures.Future:
+                A future that resolves to a :class:`DecodedImage`, or raises the decoding error.
+        """
+        if self.__executor:
+            return self.__executor.submit(decode_image, read_image_data(image_data), self.limits)
+
+        future = Future()
+
+        try:
+            future.set_result(decode_image(image_data, self.limits))
+        except Exception as e:
+            future.set_exception(e)
+
+        return future
+
+    def decode(self, image_data) -> DecodedImage:
+        """
+        Decode a frame, blocking until the result comes back.
+
+        If a worker process dies (e.g. it is killed, or crashes decoding the frame), the pool is replaced so later
+        frames are decoded again, and the frame is refused as undecodable.
+
+        Parameters:
+            image_data (bytes | bytearray | memoryview | BinaryIO):
+                The encoded image data received from the client.
+
+        Returns:
+            DecodedImage:
+                The decoded image, its hashes and metadata.
+
+        Raises:
+            OSError:
+                If the image data cannot be identified or decoded, or the worker decoding it died.
+
+            LimitError:
+                If the image exceeds :attr:`limits`.
+        """
+        executor = self.__executor
+
+        try:
+            decoded = self.submit(image_data).result()
+        except BrokenProcessPool as e:
+            self._replace_executor(executor)
+            raise OSError(f'The decode worker died: {e}') from e
+
+        # Pillow does not pickle an image's format, which callers read from the image itself; an image returned by a
+        # worker process only has one if its class happens to carry it.
+        decoded.image.format = decoded.format
+
+        return decoded
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shut down the worker processes, if any.
+
+        Parameters:
+            wait (bool, optional):
+                Whether to wait for pending frames to finish decoding. Defaults to True.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__closed = True
+
+        if self.__executor:
+            self.create_logger().debug('Shutting down decode workers...')
+            self.__executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # Worker processes are spawned rather than forked, as the server process is multithreaded.
+        return ProcessPoolExecutor(
+            max_workers=self.__workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=apply_pixel_limit,
+            initargs=(self.__limits,)
+        )
+
+    def _replace_executor(self, broken) -> None:
+        """
+        Replace a broken pool of worker processes with a new one, unless another thread already has.
+        """
+        with self.__lock:
+            if self.__closed or broken is None or self.__executor is not broken:
+                return
+
+            self.create_logger().warning('A decode worker died; starting a new pool of decode workers')
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.__executor = self._create_executor()
+
+
+__all__ = [
+    'DecodedImage',
+    'DecodeStage',
+    'apply_pixel_limit',
+    'decode_image',
+    'open_image_data',
+    'read_image_data',
+]
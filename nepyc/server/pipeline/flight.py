@@ -0,0 +1,142 @@
+"""
+This module contains the single-flight layer that coalesces concurrent ingests of identical frames.
+
+When several clients upload the same image at the same moment, every copy would otherwise be decoded and hashed in
+parallel, only for all but one to be found to be duplicates once they try to save it. Frames are keyed by a digest of
+their raw bytes instead, before they are decoded: the first frame with a given key is ingested, and frames with the same
+key that arrive while it is in flight wait for its result rather than repeating the work.
+
+Only frames that are in flight at the same time are coalesced; the result is dropped as soon as the first frame settles,
+so this is not a cache. Frames that arrive later are deduplicated by the hash database as usual.
+
+Example Usage:
+    >>> from nepyc.server.pipeline.flight import SingleFlight, raw_digest
+    >>> flight = SingleFlight()
+    >>> result, leader = flight.run(raw_digest(image_data), server.decode_and_accept, image_data)
+"""
+import hashlib
+import threading
+from concurrent.futures import Future
+from nepyc.server.pipeline.decode import open_image_data
+
+
+# The size of the digests frames are keyed by, in bytes.
+RAW_DIGEST_SIZE = 16
+
+# The number of bytes hashed at a time when a frame is a file object (e.g. a spooled payload).
+READ_SIZE = 1024 * 1024
+
+
+def raw_digest(image_data) -> bytes:
+    """
+    Return the BLAKE2b digest of a frame's raw, still encoded, bytes.
+
+    Parameters:
+        image_data (bytes | bytearray | memoryview | BinaryIO):
+            The encoded image data, either as a buffer or as a binary file object, which is read from the start and
+            left at its end.
+
+    Returns:
+        bytes:
+            The digest; :data:`RAW_DIGEST_SIZE` bytes.
+    """
+    digest = hashlib.blake2b(digest_size=RAW_DIGEST_SIZE)
+
+    if not hasattr(image_data, 'read'):
+        digest.update(image_data)
+
+        return digest.digest()
+
+    source = open_image_data(image_data)
+
+    while chunk := source.read(READ_SIZE):
+        digest.update(chunk)
+
+    return digest.digest()
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time; callers with a key that is already in flight share its result.
+
+    Attributes:
+        in_flight (int):
+            The number of keys being worked on.
+
+        coalesced (int):
+            The number of calls answered with another call's result instead of being run.
+    """
+    def __init__(self):
+        """
+        Initialize the single-flight layer.
+
+        Returns:
+            None
+        """
+        self.__coalesced = 0
+        self.__flights   = {}
+        self.__lock      = threading.Lock()
+
+    @property
+    def coalesced(self) -> int:
+        return self.__coalesced
+
+    @property
+    def in_flight(self) -> int:
+        with self.__lock:
+            return len(self.__flights)
+
+    def run(self, key, function, *args, **kwargs):
+        """
+        Call `function` unless a call with the same key is already in flight, in which case wait for that call's result
+        instead. An exception raised by the call is raised to every caller sharing it.
+
+        Parameters:
+            key (Hashable):
+                The key calls are coalesced by; e.g. :func:`raw_digest` of a frame.
+
+            function (Callable):
+                The function to call.
+
+            *args:
+                The positional arguments to call `function` with.
+
+            **kwargs:
+                The keyword arguments to call `function` with.
+
+        Returns:
+            tuple[Any, bool]:
+                The result of the call, and whether this caller made it (True) or shared another caller's (False).
+        """
+        with self.__lock:
+            flight = self.__flights.get(key)
+
+            if flight is None:
+                flight = self.__flights[key] = Future()
+                leader = True
+            else:
+                self.__coalesced += 1
+                leader = False
+
+        if not leader:
+            return flight.result(), False
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+        finally:
+            with self.__lock:
+                del self.__flights[key]
+
+        return result, True
+
+
+__all__ = [
+    'RAW_DIGEST_SIZE',
+    'SingleFlight',
+    'raw_digest',
+]
@@ -0,0 +1,95 @@
+"""
+This module contains the limits incoming images are checked against.
+
+Limits are checked twice: against what an extended IMAGE frame declares in its metadata, before any of its body is
+received, and against what the decoder finds in the image header, before any pixel data is decompressed. The first check
+saves the bandwidth and memory of receiving an image that would be refused anyway; the second keeps a client that
+declared false metadata (or sent a legacy frame) from slipping a decompression bomb past the first.
+
+Example Usage:
+    >>> from nepyc.server.pipeline.limits import ImageLimits
+    >>> limits = ImageLimits(max_bytes=64 * 1024 * 1024, max_pixels=100_000_000, formats=('PNG', 'JPEG'))
+    >>> limits.violation(size=1024, image_format='GIF')
+    'format GIF is not allowed'
+"""
+from dataclasses import dataclass
+
+
+class LimitError(ValueError):
+    """
+    Raised when an image exceeds the server's limits.
+    """
+
+
+@dataclass(frozen=True)
+class ImageLimits:
+    """
+    The limits incoming images must be within.
+
+    Attributes:
+        max_bytes (int):
+            The largest encoded image (in bytes) accepted. Zero means no limit.
+
+        max_pixels (int):
+            The largest image (in pixels, width times height) accepted. Zero means no limit.
+
+        formats (tuple[str, ...]):
+            The image formats accepted, as named by Pillow (e.g. 'PNG'). Empty means any format.
+    """
+    max_bytes:  int = 0
+    max_pixels: int = 0
+    formats:    tuple = ()
+
+    def __post_init__(self):
+        object.__setattr__(self, 'formats', tuple(f.strip().upper() for f in self.formats if f.strip()))
+
+    def violation(self, size=None, image_format=None, width=None, height=None):
+        """
+        Return why an image is over the limits, if it is. Only the properties that are known are checked.
+
+        Parameters:
+            size (int, optional):
+                The size of the encoded image in bytes.
+
+            image_format (str, optional):
+                The format of the image.
+
+            width (int, optional):
+                The width of the image in pixels.
+
+            height (int, optional):
+                The height of the image in pixels.
+
+        Returns:
+            str | None:
+                A description of the first limit the image exceeds, or None if it is within the limits.
+        """
+        if self.max_bytes and size is not None and size > self.max_bytes:
+            return f'{size} bytes exceeds the limit of {self.max_bytes}'
+
+        if self.formats and image_format and image_format.upper() not in self.formats:
+            return f'format {image_format} is not allowed'
+
+        if self.max_pixels and width and height and width * height > self.max_pixels:
+            return f'{width}x{height} pixels exceeds the limit of {self.max_pixels}'
+
+        return None
+
+    def check(self, size=None, image_format=None, width=None, height=None) -> None:
+        """
+        Raise if an image is over the limits; see :meth:`violation`.
+
+        Raises:
+            LimitError:
+                If the image exceeds any of the limits.
+        """
+        reason = self.violation(size, image_format, width, height)
+
+        if reason is not None:
+            raise LimitError(reason)
+
+
+__all__ = [
+    'ImageLimits',
+    'LimitError',
+]
@@ -0,0 +1,312 @@
+"""
+This module contains the bounded ingest queue that sits between receiving frames and processing them.
+
+Connections offer received frames to the queue instead of processing them themselves. When the queue is full the offer
+is refused, so the server can answer with a BUSY ACK instead of accepting unbounded work.
+
+Frames may be offered on behalf of a client (any hashable key, such as its address). Each client's frames wait in their
+own line, and the workers take one frame from each client in turn, so a client with many frames queued does not delay a
+client with one. No client may hold more than half of the queue while frames are queued under keys, so there is always
+room for another client's frames.
+
+Example Usage:
+    >>> from nepyc.server.pipeline.queue import IngestQueue
+    >>> ingest_queue = IngestQueue(server.ingest, maxsize=64, workers=4)
+    >>> ingest_queue.start()
+    >>> future = ingest_queue.offer(image_data)
+    >>> if future is None:
+    ...     print('Busy')
+    ... else:
+    ...     ack, image = future.result()
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from nepyc.log_engine import ROOT_LOGGER, Loggable
+
+
+MOD_LOGGER = ROOT_LOGGER.get_child('server.pipeline.queue')
+
+
+class IngestQueue(Loggable):
+    """
+    A bounded queue of received frames, drained by a fixed pool of worker threads, round-robin across clients.
+
+    Attributes:
+        maxsize (int):
+            The maximum number of frames that may wait in the queue.
+
+        share (int):
+            The maximum number of frames a single client may have waiting in the queue.
+
+        workers (int):
+            The number of worker threads processing frames.
+    """
+    def __init__(self, handler, maxsize: int = 64, workers: int = 4):
+        """
+        Initialize the queue. Worker threads are not started until :meth:`start` is called.
+
+        Parameters:
+            handler (Callable):
+                The callable that processes a frame; it is called with the frame and, as `key`, the client the frame
+                was offered for, and its return value becomes the result of the frame's future.
+
+            maxsize (int, optional):
+                The maximum number of frames that may wait in the queue. Defaults to 64.
+
+            workers (int, optional):
+                The number of worker threads processing frames. Defaults to 4.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError:
+                If `maxsize` or `workers` is less than one.
+        """
+        super().__init__(MOD_LOGGER)
+
+        if maxsize < 1:
+            raise ValueError('The ingest queue size must be at least 1')
+
+        if workers < 1:
+            raise ValueError('The number of ingest workers must be at least 1')
+
+        self.__closed  = False
+        self.__closing = False
+        self.__count   = 0
+        self.__handler = handler
+        self.__lock    = threading.Lock()
+        self.__maxsize = maxsize
+        self.__pending = OrderedDict()
+        self.__ready   = threading.Condition()
+        self.__share   = max(1, maxsize // 2)
+        self.__threads = []
+        self.__workers = workers
+
+    @property
+    def closed(self) -> bool:
+        """
+        Return whether the queue has been shut down, and refuses frames until it is started again.
+
+        Returns:
+            bool:
+                True once :meth:`shutdown` has been called.
+        """
+        return self.__closed
+
+    @property
+    def full(self) -> bool:
+        """
+        Return whether the queue is currently full.
+
+        Returns:
+            bool:
+                True if a frame offered now would be refused.
+        """
+        return self.__count >= self.__maxsize
+
+    @property
+    def maxsize(self) -> int:
+        """
+        Return the maximum number of frames that may wait in the queue.
+
+        Returns:
+            int:
+                The queue capacity.
+        """
+        return self.__maxsize
+
+    @property
+    def size(self) -> int:
+        """
+        Return the approximate number of frames waiting in the queue.
+
+        Returns:
+            int:
+                The number of waiting frames.
+        """
+        return self.__count
+
+    @property
+    def share(self) -> int:
+        """
+        Return the maximum number of frames a single client may have waiting in the queue.
+
+        Returns:
+            int:
+                The per-client share of the queue.
+        """
+        return self.__share
+
+    @property
+    def started(self) -> bool:
+        """
+        Return whether the worker threads have been started.
+
+        Returns:
+            bool:
+                True if the worker threads are running.
+        """
+        return bool(self.__threads)
+
+    @property
+    def workers(self) -> int:
+        """
+        Return the number of worker threads processing frames.
+
+        Returns:
+            int:
+                The number of worker threads.
+        """
+        return self.__workers
+
+    def offer(self, frame, key=None):
+        """
+        Offer a frame to the queue without blocking. The worker threads are started by the first offer, but not again
+        once the queue has been shut down.
+
+        Parameters:
+            frame:
+                The frame to process; passed to the handler as-is, along with `key`.
+
+            key (Hashable, optional):
+                The client the frame came from. Frames offered without a key share one line, and are not limited to
+                the per-client :attr:`share`.
+
+        Returns:
+            concurrent.futures.Future:
+                A future for the handler's result, or None if the queue is full or shut down, or the client already has
+                its share of it.
+        """
+        if not self.started:
+            self._start(reopen=False)
+
+        future = Future()
+
+        with self.__ready:
+            line = self.__pending.get(key)
+
+            if self.__closed or self.__count >= self.__maxsize:
+                return None
+
+            if key is not None and line is not None and len(line) >= self.__share:
+                return None
+
+            if line is None:
+                line = self.__pending[key] = deque()
+
+            line.append((frame, key, future))
+            self.__count += 1
+            self.__ready.notify()
+
+        return future
+
+    def start(self) -> None:
+        """
+        Start the worker threads, reopening the queue if it has been shut down. Calling this more than once has no
+        effect.
+
+        Returns:
+            None
+        """
+        self._start(reopen=True)
+
+    def _start(self, reopen: bool) -> None:
+        with self.__lock:
+            if self.__threads or (self.__closed and not reopen):
+                return
+
+            with self.__ready:
+                self.__closed  = False
+                self.__closing = False
+
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'nepyc-ingest-{i}', daemon=True)
+                thread.start()
+                self.__threads.append(thread)
+
+        self.create_logger().debug(f'Started {self.workers} ingest worker(s)')
+
+    def shutdown(self, wait: bool = True, timeout: float = None) -> bool:
+        """
+        Stop the worker threads once the frames already queued have been processed. Frames offered from then on are
+        refused.
+
+        Parameters:
+            wait (bool, optional):
+                Whether to wait for the worker threads to exit. Defaults to True.
+
+            timeout (float, optional):
+                The maximum number of seconds to wait for, in all. Defaults to none, which waits indefinitely.
+
+        Returns:
+            bool:
+                True if the worker threads have exited; always False if `wait` is False and any were running.
+        """
+        with self.__lock:
+            threads, self.__threads = self.__threads, []
+
+            with self.__ready:
+                self.__closed  = True
+                self.__closing = True
+                self.__ready.notify_all()
+
+        if not wait:
+            return not threads
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+        return not any(thread.is_alive() for thread in threads)
+
+    def _work(self) -> None:
+        while True:
+            item = self._next()
+
+            if item is None:
+                return
+
+            frame, key, future = item
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(self.__handler(frame, key=key))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _next(self):
+        """
+        Wait for the next frame, taking one from each client's line in turn.
+
+        Returns:
+            tuple | None:
+                The frame, the key it was offered under and its future, or None once the queue is shutting down and no frames are left.
+        """
+        with self.__ready:
+            while not self.__pending:
+                if self.__closing:
+                    return None
+
+                self.__ready.wait()
+
+            key, line = next(iter(self.__pending.items()))
+            item = line.popleft()
+            self.__count -= 1
+
+            if line:
+                self.__pending.move_to_end(key)
+            else:
+                del self.__pending[key]
+
+            return item
+
+
+__all__ = [
+    'IngestQueue',
+]
@@ -0,0 +1,187 @@
+"""
+This module contains the negative cache of frames that recently failed validation.
+
+A client that keeps retrying a corrupt or oversized file would otherwise have every attempt opened and decoded, only to
+fail the same way. Frames are keyed by a digest of their raw bytes (see :func:`nepyc.server.pipeline.flight.raw_digest`),
+and the digest of a frame refused as invalid, or for exceeding the image limits, is remembered with the ACK type it was
+refused with; a repeat within the TTL is refused straight away, without being decoded.
+
+The cache counts its hits per client, so the clients that keep resending the same bad frame can be found.
+
+Example Usage:
+    >>> from nepyc.server.pipeline.rejects import RejectCache
+    >>> rejects = RejectCache(capacity=4096, ttl=600)
+    >>> rejects.add(digest, REJECT_ACK_MAP[b'INV'])
+    >>> rejects.get(digest, key='192.0.2.1')
+    <class 'nepyc.proto.ack.models.reject.invalid.InvalidAck'>
+    >>> rejects.offenders()
+    [('192.0.2.1', 1)]
+"""
+import threading
+from collections import OrderedDict
+from nepyc.proto.ack.journal import AckJournal
+
+
+class RejectCache:
+    """
+    A bounded, expiring cache of the digests of frames refused as invalid, and of the clients that resend them.
+
+    Attributes:
+        capacity (int):
+            The maximum number of digests remembered; zero disables the cache.
+
+        ttl (float):
+            The number of seconds a digest is remembered for.
+
+        hits (int):
+            The number of frames refused from the cache.
+
+        misses (int):
+            The number of frames looked up and not found.
+    """
+    # The number of clients whose hits are counted; the client seen least recently is forgotten first.
+    MAX_CLIENTS = 1024
+
+    def __init__(self, capacity: int = AckJournal.DEFAULT_CAPACITY, ttl: float = AckJournal.DEFAULT_TTL):
+        """
+        Initialize the cache.
+
+        Parameters:
+            capacity (int, optional):
+                The maximum number of digests remembered; zero disables the cache. Defaults to 4096.
+
+            ttl (float, optional):
+                The number of seconds a digest is remembered for; zero for no expiry. Defaults to 300.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError:
+                If `capacity` or `ttl` is negative.
+        """
+        if capacity < 0:
+            raise ValueError('The capacity must not be negative')
+
+        self.__capacity = capacity
+        self.__journal  = AckJournal(capacity, ttl) if capacity else None
+        self.__lock     = threading.Lock()
+        self.__clients  = OrderedDict()
+        self.__ttl      = ttl
+
+    @property
+    def capacity(self) -> int:
+        return self.__capacity
+
+    @property
+    def enabled(self) -> bool:
+        return self.__journal is not None
+
+    @property
+    def hits(self) -> int:
+        return self.__journal.hits if self.enabled else 0
+
+    @property
+    def misses(self) -> int:
+        return self.__journal.misses if self.enabled else 0
+
+    @property
+    def ttl(self) -> float:
+        return self.__ttl
+
+    def add(self, digest: bytes, ack_type) -> None:
+        """
+        Remember that a frame was refused.
+
+        Parameters:
+            digest (bytes):
+                The digest of the frame's raw bytes.
+
+            ack_type (type[nepyc.proto.ack.Ack]):
+                The ACK type the frame was refused with.
+
+        Returns:
+            None
+        """
+        if self.enabled:
+            self.__journal.add(digest, ack_type)
+
+    def get(self, digest: bytes, key=None):
+        """
+        Look up a frame, counting a hit against the client that sent it.
+
+        Parameters:
+            digest (bytes):
+                The digest of the frame's raw bytes.
+
+            key (Hashable, optional):
+                The client the frame came from; e.g. its source address.
+
+        Returns:
+            type[nepyc.proto.ack.Ack] | None:
+                The ACK type the frame was refused with before, or None if it was not (recently) refused.
+        """
+        if not self.enabled:
+            return None
+
+        ack_type = self.__journal.get(digest)
+
+        if ack_type is not None and key is not None:
+            with self.__lock:
+                self.__clients[key] = self.__clients.pop(key, 0) + 1
+
+                while len(self.__clients) > self.MAX_CLIENTS:
+                    self.__clients.popitem(last=False)
+
+        return ack_type
+
+    def client_hits(self, key) -> int:
+        """
+        Return the number of frames from a client that were refused from the cache.
+
+        Parameters:
+            key (Hashable):
+                The client.
+
+        Returns:
+            int:
+                The number of hits; zero if the client has not been seen, or has been forgotten.
+        """
+        with self.__lock:
+            return self.__clients.get(key, 0)
+
+    def offenders(self, count: int = 10) -> list:
+        """
+        Return the clients with the most frames refused from the cache.
+
+        Parameters:
+            count (int, optional):
+                The maximum number of clients returned. Defaults to 10.
+
+        Returns:
+            list[tuple[Hashable, int]]:
+                The clients and their hit counts, most hits first.
+        """
+        with self.__lock:
+            return sorted(self.__clients.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def stats(self) -> dict:
+        """
+        Return the cache's size and counters.
+
+        Returns:
+            dict:
+                The number of digests remembered, the hit, miss and eviction counts, and the number of clients whose
+                hits are counted.
+        """
+        stats = self.__journal.stats() if self.enabled else {'size': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+
+        with self.__lock:
+            stats['clients'] = len(self.__clients)
+
+        return stats
+
+
+__all__ = [
+    'RejectCache',
+]
@@ -0,0 +1,223 @@
+"""
+This module contains the per-connection state for pipelined uploads.
+
+A client using extended frames (see :mod:`nepyc.proto.frames`) does not wait for an ACK before sending its next frame,
+so a connection can have many frames in flight at once. The session tracks them in the order they arrived, and writes
+an ACK envelope for each one as soon as it settles. Frames that settle out of order are acknowledged out of order; a run
+of successful frames at the head of the connection that settle together is acknowledged with a single cumulative ACK.
+
+Example Usage:
+    >>> from nepyc.server.pipeline.session import PipelineSession
+    >>> session = PipelineSession(client.sendall, server.images.append)
+    >>> session.track(header.seq, server.ingest_queue.offer(payload.data), cleanup=payload.close)
+"""
+import threading
+from collections import OrderedDict
+from nepyc.log_engine import ROOT_LOGGER, Loggable
+from nepyc.proto.ack import DISPATCHER, REJECT_ACK_MAP, OKAck
+from nepyc.proto.frames import AckFlag, pack_ack
+
+
+MOD_LOGGER = ROOT_LOGGER.get_child('server.pipeline.session')
+
+
+class PipelineSession(Loggable):
+    """
+    The frames in flight on one pipelined connection, and the ACK envelopes owed for them.
+
+    Attributes:
+        in_flight (int):
+            The number of frames that have not been acknowledged yet.
+    """
+    def __init__(self, write, on_image=None):
+        """
+        Initialize the session.
+
+        Parameters:
+            write (Callable[[bytes], None]):
+                Writes bytes to the connection. It is only ever called by one thread at a time.
+
+            on_image (Callable, optional):
+                Called with the image of every frame that was accepted.
+
+        Returns:
+            None
+        """
+        super().__init__(MOD_LOGGER)
+        self.__flushing = False
+        self.__lock     = threading.Lock()
+        self.__on_image = on_image
+        self.__pending  = OrderedDict()
+        self.__settled  = threading.Condition(self.__lock)
+        self.__write    = write
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Return the number of frames that have not been acknowledged yet.
+
+        Returns:
+            int:
+                The number of frames in flight.
+        """
+        return len(self.__pending)
+
+    def track(self, seq: int, future, cleanup=None) -> None:
+        """
+        Track a frame that has been handed to the ingest queue; it is acknowledged once `future` resolves.
+
+        Parameters:
+            seq (int):
+                The sequence id of the frame.
+
+            future (concurrent.futures.Future):
+                The future returned by :meth:`IngestQueue.offer`, resolving to an `(ack, image)` tuple.
+
+            cleanup (Callable, optional):
+                Called once the future has resolved, before the frame is acknowledged; e.g. to close its payload.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__pending[seq] = None
+
+        def settle(done):
+            if cleanup is not None:
+                cleanup()
+
+            try:
+                ack, image = done.result()
+            except Exception as e:
+                self.create_logger().error(f'Frame {seq} failed: {e}')
+                ack, image = DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']), None
+
+            self.settle(seq, ack, image)
+
+        future.add_done_callback(settle)
+
+    def reply(self, seq: int, ack) -> None:
+        """
+        Acknowledge a frame that was answered without being processed; e.g. with a BUSY ACK.
+
+        Parameters:
+            seq (int):
+                The sequence id of the frame.
+
+            ack (nepyc.proto.ack.Ack):
+                The ACK to send.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__pending[seq] = None
+
+        self.settle(seq, ack)
+
+    def settle(self, seq: int, ack, image=None) -> None:
+        """
+        Record the outcome of a tracked frame and flush every ACK envelope that is ready.
+
+        Whichever thread settles a frame while no other thread is flushing becomes the flusher, and keeps writing until
+        nothing is left to send; frames settled in the meantime are picked up by its next pass instead of contending for
+        the connection.
+
+        Parameters:
+            seq (int):
+                The sequence id of the frame.
+
+            ack (nepyc.proto.ack.Ack):
+                The ACK for the frame.
+
+            image (optional):
+                The accepted image, if any.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__pending[seq] = (ack, image)
+
+            if self.__flushing:
+                return
+
+            self.__flushing = True
+
+        while True:
+            with self.__lock:
+                envelopes, images = self._collect()
+
+                if not envelopes:
+                    self.__flushing = False
+                    self.__settled.notify_all()
+                    return
+
+            if self.__on_image is not None:
+                for image in images:
+                    self.__on_image(image)
+
+            try:
+                self.__write(b''.join(envelopes))
+            except OSError as e:
+                self.create_logger().debug(f'Unable to send {len(envelopes)} ACK(s): {e}')
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Wait for every frame in flight to be acknowledged; e.g. before the connection is closed while the server drains.
+
+        Parameters:
+            timeout (float, optional):
+                The maximum number of seconds to wait. Defaults to none, which waits indefinitely.
+
+        Returns:
+            bool:
+                True if every frame was acknowledged in time.
+        """
+        with self.__settled:
+            return self.__settled.wait_for(lambda: not self.__pending and not self.__flushing, timeout)
+
+    def _collect(self):
+        """
+        Remove every settled frame from the pending list and build the envelopes acknowledging them. Must be called
+        with the lock held.
+
+        Returns:
+            tuple[list[bytes], list]:
+                The envelopes to write, in order, and the images that were accepted.
+        """
+        envelopes = []
+        images    = []
+        run       = []
+
+        for seq, outcome in self.__pending.items():
+            if outcome is None or not isinstance(outcome[0], OKAck):
+                break
+
+            run.append(seq)
+
+        if run:
+            ack, _ = self.__pending[run[-1]]
+            flags  = AckFlag.CUMULATIVE if len(run) > 1 else AckFlag.NONE
+            envelopes.append(pack_ack(ack, run[-1], flags))
+
+        run = set(run)
+
+        for seq, outcome in list(self.__pending.items()):
+            if outcome is None:
+                continue
+
+            ack, image = self.__pending.pop(seq)
+
+            if seq not in run:
+                envelopes.append(pack_ack(ack, seq))
+
+            if image:
+                images.append(image)
+
+        return envelopes, images
+
+
+__all__ = [
+    'PipelineSession',
+]
@@ -0,0 +1,276 @@
+"""
+This module contains the per-client rate limits applied to incoming frames.
+
+Each client, identified by its source address, gets two token buckets: one metering images per second and one metering
+bytes per second. A frame is admitted only if both buckets can pay for it; otherwise it is answered with a THROTTLE ACK
+telling the client how long to wait, before its body is processed. A bucket may go into debt to admit a frame larger
+than it can ever hold, so large images are slowed down rather than refused outright; the client just waits longer
+before its next frame.
+
+Example Usage:
+    >>> from nepyc.server.pipeline.throttle import ClientThrottle
+    >>> throttle = ClientThrottle(images_per_second=5, bytes_per_second=10 * 1024 * 1024)
+    >>> throttle.admit('192.0.2.1', size=2 * 1024 * 1024)
+    0.0
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    A token bucket holding up to `rate * burst` tokens, refilled continuously at `rate` tokens per second.
+
+    Attributes:
+        rate (float):
+            The number of tokens added per second.
+
+        capacity (float):
+            The maximum number of tokens the bucket holds.
+
+        tokens (float):
+            The number of tokens in the bucket as of its last update; negative while the bucket is in debt.
+    """
+    def __init__(self, rate: float, burst: float, now: float):
+        """
+        Initialize a full bucket.
+
+        Parameters:
+            rate (float):
+                The number of tokens added per second.
+
+            burst (float):
+                The number of seconds of tokens the bucket holds when full.
+
+            now (float):
+                The current time on the caller's monotonic clock.
+
+        Returns:
+            None
+        """
+        self.rate     = rate
+        self.capacity = rate * burst
+        self.tokens   = self.capacity
+        self.updated  = now
+
+    def refill(self, now: float) -> None:
+        """
+        Add the tokens earned since the last update.
+
+        Parameters:
+            now (float):
+                The current time on the caller's monotonic clock.
+
+        Returns:
+            None
+        """
+        self.tokens  = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float) -> float:
+        """
+        Return how long until the bucket can pay `cost` tokens; zero if it can now. A cost larger than the capacity can
+        be paid by a full bucket, which then goes into debt.
+
+        Parameters:
+            cost (float):
+                The number of tokens needed.
+
+        Returns:
+            float:
+                The wait in seconds.
+        """
+        needed = min(cost, self.capacity)
+
+        return max(0.0, (needed - self.tokens) / self.rate)
+
+    @property
+    def full(self) -> bool:
+        return self.tokens >= self.capacity
+
+
+class ClientThrottle:
+    """
+    Per-client image and byte rate limits. A rate of zero disables that limit.
+
+    Attributes:
+        images_per_second (float):
+            The sustained number of images each client may send per second.
+
+        bytes_per_second (float):
+            The sustained number of bytes each client may send per second.
+
+        burst (float):
+            The number of seconds' worth of images and bytes a client may send at once after being idle.
+
+        throttled (int):
+            The number of frames refused so far.
+    """
+    def __init__(self, images_per_second: float = 0, bytes_per_second: float = 0, burst: float = 1.0,
+                 clock=time.monotonic):
+        """
+        Initialize the throttle.
+
+        Parameters:
+            images_per_second (float, optional):
+                The sustained number of images each client may send per second. Defaults to 0, no limit.
+
+            bytes_per_second (float, optional):
+                The sustained number of bytes each client may send per second. Defaults to 0, no limit.
+
+            burst (float, optional):
+                The number of seconds' worth of images and bytes a client may send at once. Defaults to 1.
+
+            clock (Callable[[], float], optional):
+                The monotonic clock buckets are refilled by. Defaults to :func:`time.monotonic`.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError:
+                If a rate is negative or `burst` is not positive.
+        """
+        if images_per_second < 0 or bytes_per_second < 0:
+            raise ValueError('Rate limits must not be negative')
+
+        if burst <= 0:
+            raise ValueError('The burst must be positive')
+
+        self.__buckets   = OrderedDict()
+        self.__burst     = burst
+        self.__bytes     = bytes_per_second
+        self.__clock     = clock
+        self.__images    = images_per_second
+        self.__lock      = threading.Lock()
+        self.__throttled = 0
+
+    @property
+    def burst(self) -> float:
+        return self.__burst
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.__bytes
+
+    @property
+    def clients(self) -> int:
+        """
+        Return the number of clients whose buckets are kept; those of idle clients are dropped once they have refilled.
+
+        Returns:
+            int:
+                The number of clients.
+        """
+        return len(self.__buckets)
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Return whether any limit is set.
+
+        Returns:
+            bool:
+                False if every frame is admitted.
+        """
+        return bool(self.__images or self.__bytes)
+
+    @property
+    def images_per_second(self) -> float:
+        return self.__images
+
+    @property
+    def throttled(self) -> int:
+        return self.__throttled
+
+    def admit(self, key, size: int, images: int = 1) -> float:
+        """
+        Charge a client for a frame, if both of its buckets can pay for it.
+
+        Parameters:
+            key (Hashable):
+                The client; e.g. its source address.
+
+            size (int):
+                The size of the frame's body in bytes.
+
+            images (int, optional):
+                The number of images the frame carries. Defaults to 1; zero for a frame that only carries part of one.
+
+        Returns:
+            float:
+                Zero if the frame is admitted; otherwise how many seconds the client should wait before sending it
+                again. A refused frame is not charged.
+        """
+        if not self.enabled:
+            return 0.0
+
+        with self.__lock:
+            now = self.__clock()
+            buckets = self._buckets(key, now)
+            costs = (images, size)
+
+            wait = max(
+                (bucket.wait_time(cost) for bucket, cost in zip(buckets, costs) if bucket is not None and cost),
+                default=0.0
+            )
+
+            if wait:
+                self.__throttled += 1
+
+                return wait
+
+            for bucket, cost in zip(buckets, costs):
+                if bucket is not None:
+                    bucket.tokens -= cost
+
+            self._prune()
+
+            return 0.0
+
+    def _buckets(self, key, now):
+        """
+        Return a client's (refilled) image and byte buckets, creating them if needed. Must be called with the lock held.
+        """
+        buckets = self.__buckets.pop(key, None)
+
+        if buckets is None:
+            buckets = (
+                TokenBucket(self.__images, self.__burst, now) if self.__images else None,
+                TokenBucket(self.__bytes, self.__burst, now) if self.__bytes else None,
+            )
+
+        for bucket in buckets:
+            if bucket is not None:
+                bucket.refill(now)
+
+        # Most recently used last, so the buckets most likely to be full again are at the front.
+        self.__buckets[key] = buckets
+
+        return buckets
+
+    def _prune(self) -> None:
+        """
+        Drop the buckets of clients that have been idle long enough for them to refill; they are no different from new
+        ones. Must be called with the lock held.
+        """
+        now = self.__clock()
+
+        while len(self.__buckets) > 1:
+            key, buckets = next(iter(self.__buckets.items()))
+
+            for bucket in buckets:
+                if bucket is not None:
+                    bucket.refill(now)
+
+            if not all(bucket.full for bucket in buckets if bucket is not None):
+                break
+
+            del self.__buckets[key]
+
+
+__all__ = [
+    'ClientThrottle',
+    'TokenBucket',
+]
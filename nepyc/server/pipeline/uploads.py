@@ -0,0 +1,289 @@
+"""
+This module contains the staging area for resumable, chunked uploads.
+
+A client on an unreliable link can upload an image in chunks instead of in one frame. It opens an upload with an UPLOAD
+frame declaring the upload's id and total size, and the server answers with the offset it has committed so far; zero
+for a new upload. The client then sends CHUNK frames, each carrying the offset its data starts at, and each is answered
+with the new committed offset. If the connection drops, the client reconnects, opens the upload again and resumes from
+the committed offset instead of starting over.
+
+Partial uploads are staged on disk, one file per upload, named after the upload's id and total size so they survive a
+server restart. An upload that has not received a chunk for longer than the timeout is deleted.
+
+Example Usage:
+    >>> from nepyc.server.pipeline.uploads import UploadSessions
+    >>> uploads = UploadSessions('~/Pictures/nepyc/.uploads', timeout=3600)
+    >>> uploads.open(upload_id, total=len(data))
+    0
+    >>> uploads.write(upload_id, 0, data[:65536])
+    65536
+"""
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from nepyc.log_engine import ROOT_LOGGER, Loggable
+
+
+MOD_LOGGER = ROOT_LOGGER.get_child('server.pipeline.uploads')
+
+# The suffix of the files partial uploads are staged in.
+PART_SUFFIX = '.part'
+
+
+class UploadError(ValueError):
+    """
+    Raised when a chunk does not belong to a known upload or does not fit in it.
+    """
+
+
+class UploadSessions(Loggable):
+    """
+    The partial uploads staged in one directory.
+
+    Attributes:
+        directory (pathlib.Path):
+            The directory partial uploads are staged in.
+
+        timeout (float):
+            The number of seconds an upload is kept after its last chunk.
+    """
+    def __init__(self, directory, timeout: float):
+        """
+        Initialize the staging area. The directory is created when the first upload is opened.
+
+        Parameters:
+            directory (str | pathlib.Path):
+                The directory partial uploads are staged in.
+
+            timeout (float):
+                The number of seconds an upload is kept after its last chunk.
+
+        Returns:
+            None
+        """
+        super().__init__(MOD_LOGGER)
+        self.__directory = Path(directory).expanduser()
+        self.__lock      = threading.Lock()
+        self.__timeout   = timeout
+
+    @property
+    def directory(self) -> Path:
+        """
+        Return the directory partial uploads are staged in.
+
+        Returns:
+            pathlib.Path:
+                The staging directory.
+        """
+        return self.__directory
+
+    @property
+    def timeout(self) -> float:
+        """
+        Return the number of seconds an upload is kept after its last chunk.
+
+        Returns:
+            float:
+                The timeout in seconds.
+        """
+        return self.__timeout
+
+    def open(self, upload_id: bytes, total: int) -> int:
+        """
+        Open an upload, or find the one already staged under the same id and size, and return its committed offset.
+        Expired uploads are deleted first.
+
+        Parameters:
+            upload_id (bytes):
+                The id the client chose for the upload.
+
+            total (int):
+                The total size of the upload in bytes.
+
+        Returns:
+            int:
+                The number of bytes already committed; zero for a new upload.
+        """
+        log = self.create_logger()
+
+        with self.__lock:
+            self._expire()
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            path = self.path(upload_id, total)
+
+            for stale in self.directory.glob(f'{upload_id.hex()}-*{PART_SUFFIX}'):
+                if stale != path:
+                    log.debug(f'Replacing upload {upload_id.hex()} of a different size')
+                    stale.unlink(missing_ok=True)
+
+            if not path.exists():
+                log.debug(f'Opening upload {upload_id.hex()} of {total} bytes')
+                path.touch()
+
+            return path.stat().st_size
+
+    def write(self, upload_id: bytes, offset: int, data) -> int:
+        """
+        Append a chunk to an upload, if it starts at the committed offset, and return the new committed offset. A chunk
+        that starts anywhere else is ignored, so a client that resends a chunk after a dropped connection does not
+        corrupt the upload; it learns the committed offset from the return value instead.
+
+        Parameters:
+            upload_id (bytes):
+                The id of the upload.
+
+            offset (int):
+                The offset in the upload that the chunk starts at.
+
+            data (bytes | bytearray | memoryview | BinaryIO):
+                The chunk.
+
+        Returns:
+            int:
+                The committed offset after the chunk.
+
+        Raises:
+            UploadError:
+                If no upload with this id is staged, or the chunk runs past the end of the upload.
+        """
+        with self.__lock:
+            path, total = self.find(upload_id)
+            committed   = path.stat().st_size
+
+            if offset != committed:
+                return committed
+
+            with open(path, 'ab') as part:
+                if hasattr(data, 'read'):
+                    shutil.copyfileobj(data, part)
+                else:
+                    part.write(data)
+
+                part.flush()
+
+                if part.tell() > total:
+                    part.truncate(committed)
+                    raise UploadError(f'Chunk at {offset} runs past the end of the {total} byte upload')
+
+                os.fsync(part.fileno())
+
+                return part.tell()
+
+    def complete(self, upload_id: bytes):
+        """
+        Return the staged file of an upload if every byte of it has been committed.
+
+        Parameters:
+            upload_id (bytes):
+                The id of the upload.
+
+        Returns:
+            pathlib.Path | None:
+                The staged file, or None if the upload is not complete yet.
+
+        Raises:
+            UploadError:
+                If no upload with this id is staged.
+        """
+        with self.__lock:
+            path, total = self.find(upload_id)
+
+            return path if path.stat().st_size == total else None
+
+    def discard(self, upload_id: bytes) -> None:
+        """
+        Delete a staged upload, once it has been ingested.
+
+        Parameters:
+            upload_id (bytes):
+                The id of the upload.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            for path in self.directory.glob(f'{upload_id.hex()}-*{PART_SUFFIX}'):
+                path.unlink(missing_ok=True)
+
+    def expire(self) -> int:
+        """
+        Delete every staged upload that has not received a chunk within the timeout. This is done whenever an upload is
+        opened, and by the server when it starts and when it is drained, so abandoned uploads do not stay on disk.
+
+        Returns:
+            int:
+                The number of uploads deleted.
+        """
+        with self.__lock:
+            return self._expire()
+
+    def _expire(self) -> int:
+        """
+        Delete every expired upload; see :meth:`expire`. Must be called with the lock held.
+        """
+        if not self.directory.is_dir():
+            return 0
+
+        deadline = time.time() - self.timeout
+        expired  = 0
+
+        for path in self.directory.glob(f'*{PART_SUFFIX}'):
+            try:
+                if path.stat().st_mtime < deadline:
+                    path.unlink()
+                    expired += 1
+            except FileNotFoundError:
+                continue
+
+        if expired:
+            self.create_logger().info(f'Expired {expired} stale upload(s)')
+
+        return expired
+
+    def find(self, upload_id: bytes):
+        """
+        Find the staged file of an upload.
+
+        Parameters:
+            upload_id (bytes):
+                The id of the upload.
+
+        Returns:
+            tuple[pathlib.Path, int]:
+                The staged file and the total size of the upload.
+
+        Raises:
+            UploadError:
+                If no upload with this id is staged.
+        """
+        for path in self.directory.glob(f'{upload_id.hex()}-*{PART_SUFFIX}'):
+            return path, int(path.name[:-len(PART_SUFFIX)].rsplit('-', 1)[1])
+
+        raise UploadError(f'No upload {upload_id.hex()} is staged')
+
+    def path(self, upload_id: bytes, total: int) -> Path:
+        """
+        Return the path an upload is staged at.
+
+        Parameters:
+            upload_id (bytes):
+                The id of the upload.
+
+            total (int):
+                The total size of the upload in bytes.
+
+        Returns:
+            pathlib.Path:
+                The path of the staged file.
+        """
+        return self.directory.joinpath(f'{upload_id.hex()}-{total}{PART_SUFFIX}')
+
+
+__all__ = [
+    'PART_SUFFIX',
+    'UploadError',
+    'UploadSessions',
+]
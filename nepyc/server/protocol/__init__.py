@@ -1,10 +1,22 @@
-from nepyc.proto.ack import DISPATCHER, DuplicateAck, InvalidAck, OKAck
+import struct
+from nepyc.proto.ack import (DISPATCHER, BusyAck, DuplicateAck, InvalidAck, LimitAck, OffsetAck, OKAck, ProceedAck,
+                             SummaryAck, ThrottleAck)
+
+
+# The length prefix that precedes every image frame sent by a client.
+SIZE_HEADER = struct.Struct('!I')
 
 
 ACK_MAP = {
     OKAck.status: OKAck,
+    ProceedAck.status: ProceedAck,
+    OffsetAck.status: OffsetAck,
+    SummaryAck.status: SummaryAck,
     DuplicateAck.status: DuplicateAck,
-    InvalidAck.status: InvalidAck
+    InvalidAck.status: InvalidAck,
+    BusyAck.status: BusyAck,
+    LimitAck.status: LimitAck,
+    ThrottleAck.status: ThrottleAck
 }
 
 
@@ -113,6 +125,7 @@ def deserialize_ack(data):
 
 
 __all__ = [
+    'SIZE_HEADER',
     'ack_lookup',
     'deserialize_ack',
     'send_ack',
@@ -1,11 +1,20 @@
-from nepyc.proto.ack import DISPATCHER, REJECT_ACK_MAP, OKAck
+from nepyc.proto.ack import (DISPATCHER, REJECT_ACK_MAP, BusyAck, LimitAck, OffsetAck, OKAck, ProceedAck, SummaryAck,
+                             ThrottleAck)
 from nepyc.common.utils import is_port_free
+from nepyc.common.utils.sockets import SocketOptions, recv_discard, recv_exactly
 from nepyc.server.cli.config import ENV_CONFIG as CONFIG
+from nepyc.server.connections import (ConnectionClock, ConnectionDrain, ConnectionLimits, ConnectionStats, DeadlineExceeded,
+                                      GuardedSocket)
 from nepyc.log_engine import ROOT_LOGGER, Loggable
 from nepyc.server.gui import SlideshowGUI
-from nepyc.server.utils.hashes import check_hash, load_hash_data, append_hash_to_file
-from nepyc.server.utils.images import assign_number, load_all_images
-from nepyc.server.protocol import ack_lookup, send_ack, deserialize_ack, status_lookup
+from nepyc.server.index import HammingIndex, HashStore, hash_to_int
+from nepyc.server.utils.images import load_all_images
+from nepyc.proto.frames import (CHUNK_META, FRAME_HEADER, HAVE_DIGEST_SIZE, UPLOAD_META, FrameHeader, FrameType, ImageMeta,
+                                is_extended)
+from nepyc.server.pipeline import (ClientThrottle, DecodeStage, ImageLimits, IngestQueue, LimitError, PipelineSession,
+                                   RejectCache, SingleFlight, UploadError, UploadSessions, raw_digest)
+from nepyc.server.utils.buffers import BodyStream, MemoryBudget, MemoryPayload, SpooledPayload
+from nepyc.server.protocol import SIZE_HEADER, ack_lookup, send_ack, deserialize_ack, status_lookup
 import socket
 import threading
 from PIL import Image
@@ -15,10 +24,19 @@ from nepyc.server.signals import exit_flag
 from pathlib import Path
 import sys
 import hashlib
+import math
+import os
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import Future
 
 
 MOD_LOGGER = ROOT_LOGGER.get_child('server.server')
 
+# The ingest engines the server can run with.
+ENGINES = ('threaded', 'asyncio')
+
 
 class ImageServer(Loggable):
     """
@@ -42,6 +60,67 @@ class ImageServer(Loggable):
         port (int):
             The port to bind the server to.
 
+        engine (str):
+            The ingest engine to serve connections with, one of :data:`ENGINES`.
+
+        read_size (int):
+            The maximum number of bytes requested from a client socket per `recv_into` call.
+
+        decode_stage (nepyc.server.pipeline.DecodeStage):
+            The stage that decodes and hashes received frames, inline or in worker processes.
+
+        ingest_queue (nepyc.server.pipeline.IngestQueue):
+            The bounded queue between receiving frames and processing them.
+
+        busy_retry_after (int):
+            The retry-after hint (in milliseconds) sent to clients in a BUSY ACK when the ingest queue is full.
+
+        max_frame_size (int):
+            The largest frame (in bytes) the server accepts, or zero for no limit. Larger frames are rejected before
+            their body is read.
+
+        spool_threshold (int):
+            Frames larger than this (in bytes) are spooled to disk instead of being received into memory.
+
+        memory_budget (nepyc.server.utils.buffers.MemoryBudget):
+            The budget of bytes that all in-flight frames may hold in memory at once.
+
+        limits (nepyc.server.pipeline.ImageLimits):
+            The size, format and pixel-count limits incoming images must be within.
+
+        reuse_port (bool):
+            If True, the listening socket is bound with `SO_REUSEPORT` so several acceptor processes can share the port.
+
+        hash_store (nepyc.server.index.HashStore):
+            The record of saved images; possibly a proxy to a store shared with other acceptor processes.
+
+        tcp (bool):
+            If True, the server listens on its TCP host and port.
+
+        unix_socket (pathlib.Path):
+            The path of the Unix domain socket the server listens on, if any.
+
+        uploads (nepyc.server.pipeline.UploadSessions):
+            The partial chunked uploads, staged in a hidden directory inside the save directory.
+
+        connection_limits (nepyc.server.connections.ConnectionLimits):
+            The idle, header, body and throughput deadlines every connection must meet.
+
+        connections (nepyc.server.connections.ConnectionStats):
+            The counters of connections served, refused and closed for missing a deadline.
+
+        throttle (nepyc.server.pipeline.ClientThrottle):
+            The per-client rate limits.
+
+        single_flight (nepyc.server.pipeline.SingleFlight):
+            Coalesces the ingest of identical frames that are in flight at the same time.
+
+        rejects (nepyc.server.pipeline.RejectCache):
+            The frames recently refused as invalid, and the clients that resend them.
+
+        socket_options (nepyc.common.utils.sockets.SocketOptions):
+            The transport options applied to the listening sockets and every client connection.
+
         gui (nepyc.server.gui.SlideshowGUI):
             The GUI object for the slideshow aspect of the nePyc server system.
     """
@@ -49,6 +128,43 @@ class ImageServer(Loggable):
     DEFAULT_BIND_PORT = CONFIG.BIND_PORT
     DEFAULT_DO_SAVE   = CONFIG.SAVE_IMAGES
     DEFAULT_SAVE_DIR  = CONFIG.SAVE_IMAGE_DIR
+    DEFAULT_ENGINE    = CONFIG.ENGINE
+    DEFAULT_READ_SIZE = CONFIG.READ_SIZE
+    DEFAULT_DECODE_WORKERS = CONFIG.DECODE_WORKERS
+    DEFAULT_QUEUE_SIZE     = CONFIG.INGEST_QUEUE_SIZE
+    DEFAULT_INGEST_WORKERS = CONFIG.INGEST_WORKERS
+    DEFAULT_BUSY_RETRY_AFTER = CONFIG.BUSY_RETRY_AFTER
+    DEFAULT_MAX_FRAME_SIZE   = CONFIG.MAX_FRAME_SIZE
+    DEFAULT_SPOOL_THRESHOLD  = CONFIG.SPOOL_THRESHOLD
+    DEFAULT_MEMORY_BUDGET    = CONFIG.MEMORY_BUDGET
+    DEFAULT_ALLOWED_FORMATS  = CONFIG.ALLOWED_FORMATS
+    DEFAULT_MAX_PIXELS       = CONFIG.MAX_PIXELS
+    DEFAULT_TCP              = CONFIG.TCP
+    DEFAULT_UNIX_SOCKET      = CONFIG.UNIX_SOCKET
+    DEFAULT_UPLOAD_TIMEOUT   = CONFIG.UPLOAD_TIMEOUT
+    DEFAULT_IDLE_TIMEOUT     = CONFIG.IDLE_TIMEOUT
+    DEFAULT_HEADER_TIMEOUT   = CONFIG.HEADER_TIMEOUT
+    DEFAULT_BODY_TIMEOUT     = CONFIG.BODY_TIMEOUT
+    DEFAULT_MIN_THROUGHPUT   = CONFIG.MIN_THROUGHPUT
+    DEFAULT_MAX_CONNECTIONS  = CONFIG.MAX_CONNECTIONS
+    DEFAULT_CLIENT_IMAGE_RATE = CONFIG.CLIENT_IMAGE_RATE
+    DEFAULT_CLIENT_BYTE_RATE  = CONFIG.CLIENT_BYTE_RATE
+    DEFAULT_CLIENT_BURST      = CONFIG.CLIENT_BURST
+    DEFAULT_DRAIN_TIMEOUT     = CONFIG.DRAIN_TIMEOUT
+    DEFAULT_TCP_NODELAY       = CONFIG.TCP_NODELAY
+    DEFAULT_KEEPALIVE         = CONFIG.KEEPALIVE
+    DEFAULT_RECV_BUFFER       = CONFIG.RECV_BUFFER
+    DEFAULT_SEND_BUFFER       = CONFIG.SEND_BUFFER
+    DEFAULT_LISTEN_BACKLOG    = CONFIG.LISTEN_BACKLOG
+    DEFAULT_REJECT_CACHE_SIZE = CONFIG.REJECT_CACHE_SIZE
+    DEFAULT_REJECT_CACHE_TTL  = CONFIG.REJECT_CACHE_TTL
+    DEFAULT_DUPLICATE_DISTANCE = CONFIG.DUPLICATE_DISTANCE
+    DEFAULT_EXPECTED_LIBRARY_SIZE = CONFIG.EXPECTED_LIBRARY_SIZE
+    DEFAULT_BLOOM_ERROR_RATE  = CONFIG.BLOOM_ERROR_RATE
+
+    # Frames refused before their body is read are read and dropped, so the connection can be reused, if their body is
+    # no larger than this; otherwise the connection is closed instead.
+    MAX_DISCARD = 1024 * 1024
 
     def __init__(
             self,
@@ -56,7 +172,43 @@ class ImageServer(Loggable):
             port=DEFAULT_BIND_PORT,
             save_incoming_images=False,
             save_directory=CONFIG.SAVE_IMAGE_DIR,
-            display_saved_images=False
+            display_saved_images=False,
+            engine=DEFAULT_ENGINE,
+            read_size=DEFAULT_READ_SIZE,
+            decode_workers=DEFAULT_DECODE_WORKERS,
+            queue_size=DEFAULT_QUEUE_SIZE,
+            ingest_workers=DEFAULT_INGEST_WORKERS,
+            busy_retry_after=DEFAULT_BUSY_RETRY_AFTER,
+            max_frame_size=DEFAULT_MAX_FRAME_SIZE,
+            spool_threshold=DEFAULT_SPOOL_THRESHOLD,
+            memory_budget=DEFAULT_MEMORY_BUDGET,
+            allowed_formats=DEFAULT_ALLOWED_FORMATS,
+            max_pixels=DEFAULT_MAX_PIXELS,
+            reuse_port=False,
+            hash_store=None,
+            display_queue=None,
+            tcp=DEFAULT_TCP,
+            unix_socket=DEFAULT_UNIX_SOCKET,
+            upload_timeout=DEFAULT_UPLOAD_TIMEOUT,
+            idle_timeout=DEFAULT_IDLE_TIMEOUT,
+            header_timeout=DEFAULT_HEADER_TIMEOUT,
+            body_timeout=DEFAULT_BODY_TIMEOUT,
+            min_throughput=DEFAULT_MIN_THROUGHPUT,
+            max_connections=DEFAULT_MAX_CONNECTIONS,
+            client_image_rate=DEFAULT_CLIENT_IMAGE_RATE,
+            client_byte_rate=DEFAULT_CLIENT_BYTE_RATE,
+            client_burst=DEFAULT_CLIENT_BURST,
+            drain_timeout=DEFAULT_DRAIN_TIMEOUT,
+            tcp_nodelay=DEFAULT_TCP_NODELAY,
+            keepalive=DEFAULT_KEEPALIVE,
+            recv_buffer=DEFAULT_RECV_BUFFER,
+            send_buffer=DEFAULT_SEND_BUFFER,
+            listen_backlog=DEFAULT_LISTEN_BACKLOG,
+            reject_cache_size=DEFAULT_REJECT_CACHE_SIZE,
+            reject_cache_ttl=DEFAULT_REJECT_CACHE_TTL,
+            duplicate_distance=DEFAULT_DUPLICATE_DISTANCE,
+            expected_library_size=DEFAULT_EXPECTED_LIBRARY_SIZE,
+            bloom_error_rate=DEFAULT_BLOOM_ERROR_RATE
     ):
         """
         Initialize the ImageServer instance.
@@ -80,6 +232,148 @@ class ImageServer(Loggable):
             display_saved_images (bool):
                 If True, images received and saved from previous sessions will be displayed. Optional, defaults to False.
 
+            engine (str):
+                The ingest engine to serve connections with; 'threaded' spawns a thread per connection, 'asyncio'
+                multiplexes all connections on an event loop. Optional, defaults to 'threaded'.
+
+            read_size (int):
+                The maximum number of bytes requested from a client socket per `recv_into` call. Optional, defaults to
+                64 KiB.
+
+            decode_workers (int):
+                The number of worker processes that decode and hash received frames. If zero, frames are decoded on
+                the connection's own thread. Optional, defaults to 0.
+
+            queue_size (int):
+                The maximum number of received frames waiting to be processed. When the queue is full, new frames are
+                answered with a BUSY ACK. Optional, defaults to 64.
+
+            ingest_workers (int):
+                The number of threads processing frames from the ingest queue. Optional, defaults to 4.
+
+            busy_retry_after (int):
+                The retry-after hint (in milliseconds) sent to clients in a BUSY ACK. Optional, defaults to 500.
+
+            max_frame_size (int):
+                The largest frame (in bytes) the server accepts. Frames that declare a larger size are answered with an
+                invalid ACK and the connection is closed before any of the body is read. Zero means no limit. Optional,
+                defaults to 64 MiB.
+
+            spool_threshold (int):
+                Frames larger than this (in bytes) are spooled to a temporary file in the save directory instead of
+                being received into memory. Optional, defaults to 8 MiB.
+
+            memory_budget (int):
+                The number of bytes that all in-flight frames may hold in memory at once. Frames that do not fit in the
+                remaining budget are spooled to disk. Optional, defaults to 256 MiB.
+
+            allowed_formats (str | Iterable[str]):
+                The image formats accepted, as named by Pillow; either an iterable or a comma-separated string. Empty
+                accepts any format. Optional, defaults to 'PNG,JPEG,GIF,BMP,TIFF,WEBP'.
+
+            max_pixels (int):
+                The largest image (width times height) accepted. Zero means no limit. Without decode workers, Pillow
+                also refuses images past twice its own decompression-bomb threshold (about 179 megapixels). Optional,
+                defaults to 100 megapixels.
+
+            reuse_port (bool):
+                Bind the listening socket with `SO_REUSEPORT`, and skip the check that the port is free, so several
+                acceptor processes can listen on the same port. Optional, defaults to False.
+
+            hash_store (nepyc.server.index.HashStore):
+                The record of saved images to deduplicate against. Optional, defaults to a store private to this server,
+                loaded from the save directory on first use.
+
+            display_queue (multiprocessing.Queue):
+                If given, accepted images are put on this queue (as thumbnails) for a display process to show, instead
+                of being collected by this server. Optional.
+
+            tcp (bool):
+                Listen on the TCP host and port. Optional, defaults to True.
+
+            unix_socket (str | pathlib.Path):
+                The path of a Unix domain socket to listen on as well as, or (if `tcp` is False) instead of, TCP. A
+                stale socket file left at the path is replaced. Optional, defaults to none.
+
+            upload_timeout (int):
+                The number of seconds a partial chunked upload is kept after its last chunk before it is deleted.
+                Optional, defaults to one hour.
+
+            idle_timeout (float):
+                The number of seconds a connection may wait for the first byte of its next frame before it is closed.
+                Zero means no limit. Optional, defaults to 300.
+
+            header_timeout (float):
+                The number of seconds a client has to send the rest of a frame's header and metadata once its first
+                byte has arrived. Zero means no limit. Optional, defaults to 10.
+
+            body_timeout (float):
+                The number of seconds a frame's body may go without any progress before the connection is closed. Zero
+                means no limit. Optional, defaults to 30.
+
+            min_throughput (int):
+                The minimum average rate (in bytes per second) a frame's body must arrive at, once it has been arriving
+                for a few seconds. Zero means no limit. Optional, defaults to 1024.
+
+            max_connections (int):
+                The maximum number of connections served at once; further connections are closed as soon as they are
+                accepted. Zero means no limit. Optional, defaults to 256.
+
+            client_image_rate (float):
+                The number of images per second each client address may send; frames over the limit are answered with
+                a THROTTLED ACK. Zero means no limit. Optional, defaults to 0.
+
+            client_byte_rate (int):
+                The number of bytes per second each client address may send. Zero means no limit. Optional, defaults
+                to 0.
+
+            client_burst (float):
+                The number of seconds' worth of images and bytes a client may send at once after being idle. Optional,
+                defaults to 1.
+
+            drain_timeout (float):
+                The number of seconds :meth:`stop` lets connections finish the frames they are receiving, and the ingest
+                queue process them, before the server shuts down anyway. Optional, defaults to 30.
+
+            tcp_nodelay (bool):
+                Set `TCP_NODELAY` on client connections, so ACKs are not held back by Nagle's algorithm. Optional,
+                defaults to True.
+
+            keepalive (bool):
+                Send TCP keepalive probes on idle client connections. Optional, defaults to True.
+
+            recv_buffer (int):
+                The receive buffer size (`SO_RCVBUF`, in bytes) of the listening sockets and the connections they
+                accept. Zero keeps the kernel's default, and its autotuning. Optional, defaults to 0.
+
+            send_buffer (int):
+                The send buffer size (`SO_SNDBUF`, in bytes). Zero keeps the kernel's default. Optional, defaults to 0.
+
+            listen_backlog (int):
+                The number of pending connections the listening sockets queue before they are accepted. Optional,
+                defaults to 128.
+
+            reject_cache_size (int):
+                The number of frames recently refused as invalid, or for exceeding the image limits, to remember, so
+                that a client resending one is refused without it being decoded again. Zero disables the cache.
+                Optional, defaults to 4096.
+
+            reject_cache_ttl (float):
+                The number of seconds a refused frame is remembered for. Optional, defaults to 600.
+
+            duplicate_distance (int):
+                The largest number of bits the average hashes of two images may differ in for the second to be refused
+                as a duplicate of the first, so re-encoded or resized copies of an image are caught. Zero refuses only
+                images with identical average hashes. Optional, defaults to 4.
+
+            expected_library_size (int):
+                The number of images the save directory is expected to grow to. If given, the hash store keeps a Bloom
+                filter sized for it in front of the hash database, rather than every hash in memory; see
+                :class:`~nepyc.server.index.HashStore`. Optional, defaults to 0, no filter.
+
+            bloom_error_rate (float):
+                The false-positive rate the Bloom filter is sized for. Optional, defaults to 0.01.
+
         Returns:
             None
 
@@ -98,14 +392,60 @@ class ImageServer(Loggable):
         log = self.class_logger
         self.__display_saved_images = display_saved_images
 
+        self.__drain_lock  = threading.Lock()
+        self.__drained     = None
+        self.__engine      = None
+        self.__engine_runner = None
+        self.__gui_stopped = False
         self.__host        = None
         self.__lock        = threading.Lock()
         self.__port        = None
+        self.__read_size   = None
         self.__running     = False
         self.__save_images = False
         self.__server      = None
         self.__images      = []
-        self.__image_hashes = {}
+        self.__image_hashes = HammingIndex()
+        self.__frame_digests = set()
+        self.__accepted_hashes = set()
+        self.__duplicate_distance = duplicate_distance
+        self.__expected_library_size = expected_library_size
+        self.__bloom_error_rate = bloom_error_rate
+        self.__hash_store  = hash_store
+        self.__display_queue = display_queue
+        self.__reuse_port  = reuse_port
+        self.__tcp         = tcp
+        self.__unix_server = None
+        self.__unix_socket = Path(unix_socket).expanduser() if unix_socket else None
+        self.__upload_timeout = upload_timeout
+        self.__uploads     = None
+        self.__connections = ConnectionStats(max_connections)
+        self.__connection_drain = ConnectionDrain()
+        self.__drain_timeout = drain_timeout
+        self.__connection_limits = ConnectionLimits(
+            idle_timeout=idle_timeout,
+            header_timeout=header_timeout,
+            body_timeout=body_timeout,
+            min_throughput=min_throughput
+        )
+        self.__throttle = ClientThrottle(
+            images_per_second=client_image_rate,
+            bytes_per_second=client_byte_rate,
+            burst=client_burst
+        )
+        self.__single_flight = SingleFlight()
+        self.__rejects = RejectCache(capacity=reject_cache_size, ttl=reject_cache_ttl)
+        self.__socket_options = SocketOptions(
+            nodelay=tcp_nodelay,
+            keepalive=keepalive,
+            recv_buffer=recv_buffer,
+            send_buffer=send_buffer,
+            backlog=listen_backlog
+        )
+
+        if not tcp and not self.__unix_socket:
+            log.error('The server must listen on TCP, a Unix socket, or both')
+            raise ValueError('The server must listen on TCP, a Unix socket, or both')
 
         self.save_images = save_incoming_images
         log.debug(f'Save images set to {self.save_images}')
@@ -123,6 +463,30 @@ class ImageServer(Loggable):
         self.port = port
         log.debug(f'Port set to {self.port}')
 
+        self.engine = engine
+        log.debug(f'Engine set to {self.engine}')
+
+        self.read_size = read_size
+        log.debug(f'Read size set to {self.read_size}')
+
+        if isinstance(allowed_formats, str):
+            allowed_formats = allowed_formats.split(',')
+
+        self.__limits = ImageLimits(max_bytes=max_frame_size, max_pixels=max_pixels, formats=tuple(allowed_formats))
+        log.debug(f'Image limits set to {self.__limits}')
+
+        self.__decode_stage = DecodeStage(decode_workers, limits=self.__limits)
+        log.debug(f'Decode stage created with {decode_workers} worker(s)')
+
+        self.__ingest_queue = IngestQueue(self.ingest, maxsize=queue_size, workers=ingest_workers)
+        log.debug(f'Ingest queue created with capacity {queue_size} and {ingest_workers} worker(s)')
+
+        self.__busy_retry_after = busy_retry_after
+
+        self.__spool_threshold = spool_threshold
+        self.__memory_budget   = MemoryBudget(memory_budget)
+        log.debug(f'Frame limit {max_frame_size}, spool threshold {spool_threshold}, memory budget {memory_budget}')
+
         self.__gui = SlideshowGUI(self)
         log.debug(f'GUI created: {self.gui}')
 
@@ -141,6 +505,28 @@ class ImageServer(Loggable):
                     log.debug(f'Creating manifest file {target_dir.joinpath(".manifest")}')
                     target_dir.joinpath('.manifest').touch()
 
+    @property
+    def busy_retry_after(self) -> int:
+        """
+        Return the retry-after hint (in milliseconds) sent to clients in a BUSY ACK.
+
+        Returns:
+            int:
+                The retry-after hint in milliseconds.
+        """
+        return self.__busy_retry_after
+
+    @property
+    def decode_stage(self):
+        """
+        Return the stage that decodes and hashes received frames.
+
+        Returns:
+            nepyc.server.pipeline.DecodeStage:
+                The decode stage.
+        """
+        return self.__decode_stage
+
     @property
     def display_saved_images(self):
         """
@@ -153,6 +539,46 @@ class ImageServer(Loggable):
         """
         return self.__display_saved_images
 
+    @property
+    def engine(self):
+        """
+        Return the name of the ingest engine the server serves connections with.
+
+        Returns:
+            str:
+                The engine name, one of :data:`ENGINES`.
+        """
+        return self.__engine
+
+    @engine.setter
+    def engine(self, new):
+        """
+        Set the ingest engine the server serves connections with. If the server is already running, an error will be
+        raised.
+
+        Parameters:
+            new (str):
+                The engine name, one of :data:`ENGINES`.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError:
+                If the server is already running, or the engine is unknown.
+        """
+        log = self.create_logger()
+
+        if self.running:
+            log.error('Cannot change engine while server is running')
+            raise ValueError('Cannot change engine while server is running')
+
+        if new not in ENGINES:
+            log.error(f'Unknown engine: {new}')
+            raise ValueError(f'Unknown engine "{new}", must be one of: {", ".join(ENGINES)}')
+
+        self.__engine = new
+
     @property
     def exit_flag(self):
         """
@@ -215,6 +641,95 @@ class ImageServer(Loggable):
 
         self.__host = new
 
+    @property
+    def hash_store(self):
+        """
+        Return the record of saved images, loading it from the save directory on first use if none was given.
+
+        Returns:
+            nepyc.server.index.HashStore:
+                The hash store.
+        """
+        with self.__lock:
+            if self.__hash_store is None:
+                self.__hash_store = HashStore(
+                    self.save_directory,
+                    expected_size=self.__expected_library_size,
+                    error_rate=self.__bloom_error_rate
+                )
+
+            return self.__hash_store
+
+    @property
+    def connection_limits(self) -> ConnectionLimits:
+        """
+        Return the deadlines every connection must meet.
+
+        Returns:
+            nepyc.server.connections.ConnectionLimits:
+                The connection limits.
+        """
+        return self.__connection_limits
+
+    @property
+    def connections(self) -> ConnectionStats:
+        """
+        Return the counters of connections served, refused and closed for missing a deadline.
+
+        Returns:
+            nepyc.server.connections.ConnectionStats:
+                The connection counters.
+        """
+        return self.__connections
+
+    @property
+    def connection_drain(self) -> ConnectionDrain:
+        """
+        Return the connections being served, which are drained when the server stops.
+
+        Returns:
+            nepyc.server.connections.ConnectionDrain:
+                The connection drain.
+        """
+        return self.__connection_drain
+
+    @property
+    def drain_timeout(self) -> float:
+        """
+        Return the number of seconds in-flight frames are given to finish when the server stops.
+
+        Returns:
+            float:
+                The drain timeout.
+        """
+        return self.__drain_timeout
+
+    @property
+    def throttle(self) -> ClientThrottle:
+        """
+        Return the per-client rate limits.
+
+        Returns:
+            nepyc.server.pipeline.ClientThrottle:
+                The throttle every frame is charged to.
+        """
+        return self.__throttle
+
+    @property
+    def uploads(self):
+        """
+        Return the staging area of partial chunked uploads, creating it on first use.
+
+        Returns:
+            nepyc.server.pipeline.UploadSessions:
+                The upload sessions.
+        """
+        with self.__lock:
+            if self.__uploads is None:
+                self.__uploads = UploadSessions(Path(self.save_directory).joinpath('.uploads'), self.__upload_timeout)
+
+            return self.__uploads
+
     @property
     def images(self):
         """
@@ -238,17 +753,53 @@ class ImageServer(Loggable):
         """
         self.__images = []
 
+    @property
+    def duplicate_distance(self) -> int:
+        """
+        Return the largest number of bits the average hashes of two images may differ in for them to count as
+        duplicates.
+
+        Returns:
+            int:
+                The Hamming distance; zero if only identical average hashes count.
+        """
+        return self.__duplicate_distance
+
+    @property
+    def accepted_hashes(self) -> set:
+        """
+        Return the MD5 digests of the pixel data of the images accepted this session, which HAVE frames are answered
+        from (see :meth:`has_image`). Cleared with :attr:`image_hashes`.
+
+        Returns:
+            set[str]:
+                The hex MD5 digests.
+        """
+        return self.__accepted_hashes
+
+    @property
+    def frame_digests(self) -> set:
+        """
+        Return the digests of the raw bytes of the frames found to be duplicates, or accepted, this session; a frame
+        with one of these digests is refused as a duplicate without being decoded. Cleared with :attr:`image_hashes`.
+
+        Returns:
+            set[bytes]:
+                The frame digests; see :func:`nepyc.server.pipeline.flight.raw_digest`.
+        """
+        return self.__frame_digests
+
     @property
     def image_hashes(self):
         """
         Return the image hashes.
 
-        This will return the image hashes collected by the server. This will return a dictionary where the keys are the
-        hashes of the images and the values are the file numbers of the images. This will return an empty dictionary if
-        no images have been received.
+        This will return the average hashes of the images accepted by the server this session, indexed for
+        near-duplicate lookups. The value stored with each hash is the MD5 digest of the image's pixel data. The index
+        is empty if no images have been received.
 
         Returns:
-            dict:
+            nepyc.server.index.HammingIndex:
                 The image hashes collected by the server.
         """
         return self.__image_hashes
@@ -256,12 +807,59 @@ class ImageServer(Loggable):
     @image_hashes.deleter
     def image_hashes(self):
         """
-        Deletes the image hashes. This will remove all image hashes from the hash database.
+        Deletes the image hashes. This will remove all image hashes, frame digests and accepted hashes collected this
+        session; the hash database is not touched.
 
         Returns:
             None
         """
-        self.__image_hashes = {}
+        self.__image_hashes = HammingIndex()
+        self.__frame_digests = set()
+        self.__accepted_hashes = set()
+
+    @property
+    def ingest_queue(self):
+        """
+        Return the bounded queue between receiving frames and processing them.
+
+        Returns:
+            nepyc.server.pipeline.IngestQueue:
+                The ingest queue.
+        """
+        return self.__ingest_queue
+
+    @property
+    def limits(self):
+        """
+        Return the limits incoming images must be within.
+
+        Returns:
+            nepyc.server.pipeline.ImageLimits:
+                The image limits.
+        """
+        return self.__limits
+
+    @property
+    def max_frame_size(self) -> int:
+        """
+        Return the largest frame (in bytes) the server accepts.
+
+        Returns:
+            int:
+                The maximum frame size in bytes.
+        """
+        return self.__limits.max_bytes
+
+    @property
+    def memory_budget(self):
+        """
+        Return the budget of bytes that all in-flight frames may hold in memory at once.
+
+        Returns:
+            nepyc.server.utils.buffers.MemoryBudget:
+                The memory budget.
+        """
+        return self.__memory_budget
 
     @property
     def port(self):
@@ -309,13 +907,62 @@ class ImageServer(Loggable):
             log.error('Port must be an integer')
             raise TypeError('Port must be an integer')
 
-        if not is_port_free(new, self.host):
+        if self.tcp and not self.reuse_port and not is_port_free(new, self.host):
             log.warning(f'Port {new} is not free, server may not be able to bind to it.')
             raise ConnectionError(f'Port {new} is not free, server may not be able to bind to it.')
 
         self.__port = new
         log.debug(f'Port set to {self.port}')
 
+    @property
+    def read_size(self) -> int:
+        """
+        Return the maximum number of bytes requested from a client socket per `recv_into` call.
+
+        Returns:
+            int:
+                The read size in bytes.
+        """
+        return self.__read_size
+
+    @read_size.setter
+    def read_size(self, new) -> None:
+        """
+        Set the maximum number of bytes requested from a client socket per `recv_into` call.
+
+        Parameters:
+            new (int):
+                The new read size in bytes; must be a positive integer.
+
+        Returns:
+            None
+
+        Raises:
+            TypeError:
+                If the read size is not an integer.
+
+            ValueError:
+                If the read size is not positive.
+        """
+        if not isinstance(new, int):
+            raise TypeError('Read size must be an integer')
+
+        if new <= 0:
+            raise ValueError('Read size must be greater than zero')
+
+        self.__read_size = new
+
+    @property
+    def reuse_port(self) -> bool:
+        """
+        Return whether the listening socket is bound with `SO_REUSEPORT`.
+
+        Returns:
+            bool:
+                True if several acceptor processes may share the port.
+        """
+        return self.__reuse_port
+
     @property
     def running(self) -> bool:
         """
@@ -349,254 +996,1254 @@ class ImageServer(Loggable):
         self.__running = new
 
     @property
-    def save_images(self) -> bool:
+    def rejects(self) -> RejectCache:
         """
-        Return the save images flag. This will return the flag that determines if incoming images should be saved to the
-        save directory. If the flag is set to True, the save directory will be created if it does not exist.
-
-        - If the flag is set to False, the save directory will not be created if it does not exist, and incoming images
-        will not be saved to storage.
-
-        - If the flag is set to True, the save directory will be created if it does not exist, and incoming images will
-        be saved to storage.
+        Return the negative cache of frames recently refused as invalid.
 
         Returns:
-            bool:
-                The save images flag.
+            nepyc.server.pipeline.RejectCache:
+                The cache, and its per-client hit counters.
         """
-        return self.__save_images
+        return self.__rejects
 
-    @save_images.setter
-    def save_images(self, new) -> None:
+    @property
+    def single_flight(self) -> SingleFlight:
         """
-        Set the save images flag. This will set the flag that determines if incoming images should be saved to the save
-        directory. If the flag is set to True, the save directory will be created if it does not exist. If the flag is
-        set to False, the save directory will not be created if it does not exist. If the flag is set to False and the
-        save directory does not exist, incoming images will not be saved.
-
-        Parameters:
-            new (bool):
-                The new value of the save images flag.
+        Return the single-flight layer that coalesces the ingest of identical frames in flight at the same time.
 
         Returns:
-            None
+            nepyc.server.pipeline.SingleFlight:
+                The single-flight layer :meth:`ingest` runs through.
         """
-        if not isinstance(new, bool):
-            raise TypeError('The save images flag must be a boolean!')
-
-        self.__save_images = new
+        return self.__single_flight
 
     @property
-    def server(self):
+    def socket_options(self) -> SocketOptions:
         """
-        Return the server socket.
+        Return the transport options applied to the listening sockets and every client connection.
 
         Returns:
-            socket.socket:
-                The server socket.
+            nepyc.common.utils.sockets.SocketOptions:
+                The socket options.
         """
-        return self.__server
+        return self.__socket_options
+
+    @property
+    def tcp(self) -> bool:
+        """
+        Return whether the server listens on its TCP host and port.
+
+        Returns:
+            bool:
+                True if the server listens on TCP.
+        """
+        return self.__tcp
+
+    @property
+    def unix_server(self):
+        """
+        Return the Unix domain listening socket, if it has been bound.
+
+        Returns:
+            socket.socket | None:
+                The Unix domain socket.
+        """
+        return self.__unix_server
+
+    @property
+    def unix_socket(self):
+        """
+        Return the path of the Unix domain socket the server listens on, if any.
+
+        Returns:
+            pathlib.Path | None:
+                The socket path.
+        """
+        return self.__unix_socket
+
+    @property
+    def save_images(self) -> bool:
+        """
+        Return the save images flag. This will return the flag that determines if incoming images should be saved to the
+        save directory. If the flag is set to True, the save directory will be created if it does not exist.
+
+        - If the flag is set to False, the save directory will not be created if it does not exist, and incoming images
+        will not be saved to storage.
+
+        - If the flag is set to True, the save directory will be created if it does not exist, and incoming images will
+        be saved to storage.
+
+        Returns:
+            bool:
+                The save images flag.
+        """
+        return self.__save_images
+
+    @save_images.setter
+    def save_images(self, new) -> None:
+        """
+        Set the save images flag. This will set the flag that determines if incoming images should be saved to the save
+        directory. If the flag is set to True, the save directory will be created if it does not exist. If the flag is
+        set to False, the save directory will not be created if it does not exist. If the flag is set to False and the
+        save directory does not exist, incoming images will not be saved.
+
+        Parameters:
+            new (bool):
+                The new value of the save images flag.
+
+        Returns:
+            None
+        """
+        if not isinstance(new, bool):
+            raise TypeError('The save images flag must be a boolean!')
+
+        self.__save_images = new
+
+    @property
+    def spool_directory(self) -> Path:
+        """
+        Return the directory oversized frames are spooled to; a hidden directory inside the save directory.
+
+        Returns:
+            pathlib.Path:
+                The spool directory.
+        """
+        return Path(self.save_directory).joinpath('.spool')
+
+    @property
+    def spool_threshold(self) -> int:
+        """
+        Return the size (in bytes) above which frames are spooled to disk instead of being received into memory.
+
+        Returns:
+            int:
+                The spool threshold in bytes.
+        """
+        return self.__spool_threshold
+
+    @property
+    def server(self):
+        """
+        Return the server socket.
+
+        Returns:
+            socket.socket:
+                The server socket.
+        """
+        return self.__server
 
     @property
     def size_of_images(self):
         """
-        Return the total size (in bytes) of all received images.
+        Return the total size (in bytes) of all received images.
+
+        Returns:
+            int:
+                The total size of all images in bytes.
+        """
+        total_size = 0
+        for image in self.images:
+            with BytesIO() as img_buffer:
+                image.save(img_buffer, format=image.format)
+                total_size += len(img_buffer.getvalue())
+
+        return total_size
+
+    def allocate_payload(self, size):
+        """
+        Allocate somewhere to receive a frame body of `size` bytes. Frames up to the spool threshold that fit in the
+        remaining memory budget get a preallocated in-memory buffer; anything else is spooled to a temporary file in the
+        spool directory.
+
+        Parameters:
+            size (int):
+                The size (in bytes) of the frame body.
+
+        Returns:
+            nepyc.server.utils.buffers.MemoryPayload | nepyc.server.utils.buffers.SpooledPayload:
+                The payload to receive the frame body into. It must be closed once the frame has been processed.
+        """
+        log = self.create_logger()
+
+        if size <= self.spool_threshold and self.memory_budget.try_acquire(size):
+            return MemoryPayload(size, self.memory_budget)
+
+        log.debug(f'Spooling {size} byte frame to {self.spool_directory}')
+        self.spool_directory.mkdir(parents=True, exist_ok=True)
+
+        return SpooledPayload(size, max_size=0, directory=self.spool_directory)
+
+    def bind(self):
+        """
+        Bind the server to the specified host and port. If the server is already running, an error will be raised. If
+        the host is not set, an error will be raised. If the port is not free, an error will be raised. If a Unix socket
+        is configured, it is bound as well (see :meth:`bind_unix`).
+
+        Returns:
+            socket.socket:
+                The server socket, or None if the server does not listen on TCP.
+        """
+        log = self.create_logger()
+
+        if self.unix_socket and not self.unix_server:
+            self.bind_unix()
+
+        if not self.tcp:
+            return None
+
+        log.debug(f'Binding server to {self.host}:{self.port}')
+
+        if self.server:
+            log.error('Server is already running, cannot bind again')
+            raise ValueError('Server is already running')
+
+        if not self.host:
+            log.error('Host must be set before binding')
+            raise ValueError('Host must be set before binding')
+
+        if not self.reuse_port and not is_port_free(self.port, self.host):
+            log.error(f'Port {self.port} is not free, cannot bind to it')
+            raise ValueError(f'Port {self.port} is not free, cannot bind to it')
+
+        # Check if the server socket is already initialized
+        if self.__server:
+            log.debug('Server socket already initialized, skipping bind.')
+            return self.__server
+
+        self.__server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        if self.reuse_port:
+            self.__server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+        self.socket_options.configure_buffers(self.__server)
+
+        try:
+            self.server.bind((self.host, self.port))
+        except PermissionError as e:
+            log.error(f'Error binding to {self.host}:{self.port}: {e}')
+            self.stop()
+
+        log.debug(f'Server bound to {self.host}:{self.port}')
+
+        return self.server
+
+    def bind_unix(self):
+        """
+        Bind the Unix domain socket at :attr:`unix_socket`, replacing a stale socket file left at the path.
+
+        Returns:
+            socket.socket:
+                The Unix domain socket.
+
+        Raises:
+            FileExistsError:
+                If something other than a socket exists at the path.
+        """
+        log = self.create_logger()
+        path = self.unix_socket
+        log.debug(f'Binding server to unix://{path}')
+
+        if path.is_socket():
+            log.debug(f'Removing stale socket {path}')
+            path.unlink()
+        elif path.exists():
+            log.error(f'{path} exists and is not a socket')
+            raise FileExistsError(f'{path} exists and is not a socket')
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.__unix_server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket_options.configure_buffers(self.__unix_server)
+        self.__unix_server.bind(str(path))
+
+        log.debug(f'Server bound to unix://{path}')
+
+        return self.__unix_server
+
+    def listen(self):
+        """
+        Listen for incoming connections. This will listen for incoming connections and then handle them in a separate
+        thread. This will continue to listen for incoming connections until the server is stopped. This will not return
+        until the server is stopped...
+
+        If the server listens on both TCP and a Unix socket, the Unix socket is served by its own accept thread.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+
+        listeners = [listener for listener in (self.server, self.unix_server) if listener]
+
+        for listener in listeners:
+            listener.listen(self.socket_options.backlog)
+
+        log.debug(f'Server listening on {self.host}:{self.port}' if self.tcp else f'Server listening on {self.unix_socket}')
+        self.running = True
+
+        for listener in listeners[1:]:
+            threading.Thread(target=self.accept_loop, args=(listener,), daemon=True).start()
+
+        self.accept_loop(listeners[0])
+
+    def accept_loop(self, listener):
+        """
+        Accept connections on a listening socket, handling each one in its own thread, until the server is stopped.
+
+        Parameters:
+            listener (socket.socket):
+                The listening socket.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+
+        try:
+            while self.running:
+                listener.settimeout(30)
+
+                try:
+                    conn, addr = listener.accept()
+                    log.debug(f'Accepted connection from {addr}')
+                    threading.Thread(target=self.handle_client, args=(conn, addr), daemon=True).start()
+
+                except socket.timeout:
+                    continue
+
+                except OSError:
+                    if not self.running:
+                        break
+                    log.error('Error accepting connection')
+                    break  # Break out of the loop, socket's been closed.
+
+                log.debug(f'Connection from {addr}')
+
+        except KeyboardInterrupt:
+            log.debug('Keyboard interrupt received, stopping server')
+            self.running = False
+
+        finally:
+            listener.close()
+
+    def handle_client(self, client, addr):
+        """
+        Handle a client connection. This will receive image data from the client and then process it. If the image data
+        is valid, it will be added to the list of images. If the image data is a duplicate, a duplicate ACK message will
+        be sent to the client. If the image data is invalid, an invalid ACK message will be sent to the client. If the
+        image data is valid and the save images flag is set, the image will be saved to the save directory.
+
+        Extended frames (see :mod:`nepyc.proto.frames`) are handed to :meth:`handle_frame` instead, which does not wait
+        for a frame to be processed before reading the next one.
+
+        Every read is bounded by the :attr:`connection_limits`; a connection that misses a deadline is closed and
+        counted in :attr:`connections`, as is one accepted while the server is serving its maximum number already. Once
+        the server starts draining (see :meth:`drain`), the connection is closed as soon as it is idle.
+
+        Parameters:
+            client (socket.socket):
+                The client sopcket to send the ACK.
+
+            addr:
+                The address of the client.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+
+        if not self.connections.open():
+            log.warning(f'Refusing client {addr}; already serving {self.connections.max_connections} connections')
+            client.close()
+
+            return
+
+        log.debug(f'Handling client {addr}')
+        self.socket_options.configure(client)
+
+        guarded = GuardedSocket(client, ConnectionClock(self.connection_limits))
+        self.connection_drain.register(guarded.clock, lambda: client.shutdown(socket.SHUT_RD))
+
+        try:
+            self.serve_client(guarded, addr)
+        except DeadlineExceeded as e:
+            log.info(f'Closing client {addr}: {e}')
+            self.connections.timed_out(e.kind)
+        finally:
+            self.connections.close()
+            self.connection_drain.unregister(guarded.clock)
+
+    def serve_client(self, client, addr):
+        """
+        Receive and acknowledge frames from a client until it disconnects; see :meth:`handle_client`.
+
+        Parameters:
+            client (nepyc.server.connections.GuardedSocket):
+                The client socket, bounded by the connection's deadlines.
+
+            addr:
+                The address of the client.
+
+        Returns:
+            None
+
+        Raises:
+            nepyc.server.connections.DeadlineExceeded:
+                If the client misses one of its deadlines.
+        """
+        log = self.create_logger()
+        session = None
+
+        with client:
+            while True:
+                client.clock.expect_frame()
+
+                if self.connection_drain.draining:
+                    break
+
+                size_data = self.receive_data(client)
+
+                if size_data is None:
+                    break
+
+                if is_extended(size_data):
+                    if session is None:
+                        session = PipelineSession(client.sendall, self.show_image)
+
+                    if not self.handle_frame(client, session, addr):
+                        break
+
+                    continue
+
+                size = SIZE_HEADER.unpack(size_data)[0]
+
+                if self.max_frame_size and size > self.max_frame_size:
+                    log.warning(f'Frame of {size} bytes from {addr} exceeds the limit of {self.max_frame_size}, closing')
+                    send_ack(DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']), client)
+                    break
+
+                if self.ingest_queue.full:
+                    log.debug(f'Ingest queue is full, discarding {size} byte frame from {addr}')
+                    client.clock.expect_body()
+
+                    if recv_discard(client, size, self.read_size) < size:
+                        break
+
+                    send_ack(self.busy_ack(), client)
+                    continue
+
+                wait = self.throttle.admit(self.client_key(addr), size)
+
+                if wait:
+                    log.debug(f'Throttling {size} byte frame from {addr} for {wait:.3f}s')
+                    client.clock.expect_body()
+
+                    if recv_discard(client, size, self.read_size) < size:
+                        break
+
+                    send_ack(self.throttle_ack(wait), client)
+                    continue
+
+                client.clock.expect_body()
+                payload = self.receive_image_data(client, size)
+
+                if payload is None:
+                    break
+
+                try:
+                    image = self.process_image(payload.data, client, key=self.client_key(addr))
+                finally:
+                    payload.close()
+
+                if image:
+                    self.show_image(image)
+
+                log.debug('Response sent to client.')
+
+            if session is not None and self.connection_drain.draining:
+                session.wait(self.connection_drain.remaining)
+
+    def handle_frame(self, client, session, addr=None):
+        """
+        Handle one extended frame whose prefix has already been read. The frame is offered to the ingest queue and
+        tracked by `session`, which acknowledges it once it has been processed; this returns as soon as the body has
+        been received, so the client can keep sending. HAVE frames are answered straight away by :meth:`answer_have`,
+        the frames of chunked uploads are handled by :meth:`open_upload` and :meth:`settle_chunk`, and TAR frames by
+        :meth:`ingest_archive`.
+
+        Parameters:
+            client (nepyc.server.connections.GuardedSocket):
+                The client socket to read the rest of the frame from, bounded by the connection's deadlines.
+
+            session (nepyc.server.pipeline.PipelineSession):
+                The pipelined session of the connection.
+
+            addr (optional):
+                The address of the client, for logging and for its rate limits.
+
+        Returns:
+            bool:
+                True if the connection should be kept open, False if it should be closed.
+        """
+        log = self.create_logger()
+
+        header_data = recv_exactly(client, FRAME_HEADER.size)
+
+        if header_data is None:
+            return False
+
+        header = FrameHeader.unpack(header_data)
+
+        meta = recv_exactly(client, header.meta_size) if header.meta_size else b''
+
+        if meta is None:
+            return False
+
+        if header.type == FrameType.HAVE and header.body_size == HAVE_DIGEST_SIZE:
+            digest = recv_exactly(client, HAVE_DIGEST_SIZE)
+
+            if digest is None:
+                return False
+
+            session.reply(header.seq, self.answer_have(digest))
+
+            return True
+
+        screened = self.screen_frame(header, meta, addr)
+
+        if screened is not None:
+            ack, keep_open = screened
+            log.debug(f'Frame {header.seq} from {addr} answered with {ack.status} without processing')
+
+            if keep_open:
+                client.clock.expect_body()
+
+                if recv_discard(client, header.body_size, self.read_size) < header.body_size:
+                    return False
+
+            session.reply(header.seq, ack)
+
+            return keep_open
+
+        if header.type == FrameType.UPLOAD:
+            session.reply(header.seq, self.open_upload(meta))
+
+            return True
+
+        if header.type == FrameType.TAR:
+            client.clock.expect_body()
+            stream = BodyStream(lambda view: client.recv_into(view, min(len(view), self.read_size)), header.body_size)
+
+            try:
+                session.reply(header.seq, self.ingest_archive(stream, self.client_key(addr), client.clock))
+            except ConnectionError as e:
+                log.debug(f'Archive {header.seq} from {addr} cut short: {e}')
+
+                return False
+
+            return True
+
+        client.clock.expect_body()
+        payload = self.receive_image_data(client, header.body_size)
+
+        if payload is None:
+            return False
+
+        if header.type == FrameType.CHUNK:
+            try:
+                self.settle_chunk(session, header.seq, meta, payload.data, key=self.client_key(addr))
+            finally:
+                payload.close()
+
+            return True
+
+        future = self.ingest_queue.offer(payload.data, key=self.client_key(addr))
+
+        if future is None:
+            payload.close()
+            session.reply(header.seq, self.busy_ack())
+        else:
+            session.track(header.seq, future, cleanup=payload.close)
+
+        return True
+
+    def screen_frame(self, header, meta=b'', addr=None):
+        """
+        Decide whether an extended frame can be answered from its header alone, before its body is read. Frames over
+        the image :attr:`limits`, judging by their size and by the format and dimensions they declare, are answered with
+        a limit ACK, and frames over their client's rate limits with a THROTTLED ACK.
+
+        Parameters:
+            header (nepyc.proto.frames.FrameHeader):
+                The header of the frame.
+
+            meta (bytes | bytearray, optional):
+                The frame's metadata.
+
+            addr (optional):
+                The address of the client, which its rate limits are kept under; see :meth:`client_key`.
+
+        Returns:
+            tuple[nepyc.proto.ack.Ack, bool] | None:
+                None if the frame should be received and processed. Otherwise, the ACK to answer it with and whether the
+                connection can be kept open; if so, the body must be read and discarded first.
+        """
+        log = self.create_logger()
+        discardable = header.body_size <= self.MAX_DISCARD
+
+        if header.type == FrameType.HAVE and header.body_size != HAVE_DIGEST_SIZE:
+            return DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']), False
+
+        if header.type == FrameType.UPLOAD:
+            if header.meta_size != UPLOAD_META.size or header.body_size:
+                return DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']), discardable
+
+            return None
+
+        if header.type == FrameType.CHUNK:
+            if header.meta_size != CHUNK_META.size:
+                return DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']), discardable
+
+            if self.limits.violation(header.body_size) is not None:
+                return DISPATCHER.dispatch(LimitAck), discardable
+
+            return self.screen_rate(header, addr, images=0)
+
+        if header.type == FrameType.TAR:
+            if header.meta_size:
+                return DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']), discardable
+
+            # Each image in the archive is checked against the limits, charged to the client's image rate, and waits
+            # for room in the ingest queue, as it is read (see ingest_archive); the archive itself is only charged for
+            # its bytes.
+            return self.screen_rate(header, addr, images=0)
+
+        if header.type != FrameType.IMAGE:
+            return DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']), discardable
+
+        image_meta = ImageMeta.unpack(meta) or ImageMeta('')
+        reason = self.limits.violation(header.body_size, image_meta.format, image_meta.width, image_meta.height)
+
+        if reason is not None:
+            log.warning(f'Refusing frame {header.seq}: {reason}')
+
+            return DISPATCHER.dispatch(LimitAck), discardable
+
+        if self.ingest_queue.full:
+            return self.busy_ack(), True
+
+        return self.screen_rate(header, addr)
+
+    def screen_rate(self, header, addr=None, images=1):
+        """
+        Charge a frame to its client's rate limits; see :attr:`throttle`.
+
+        Parameters:
+            header (nepyc.proto.frames.FrameHeader):
+                The header of the frame.
+
+            addr (optional):
+                The address of the client.
+
+            images (int, optional):
+                The number of images the frame carries. Defaults to 1; zero for a chunk, so a chunked upload is charged
+                for its bytes as they arrive but not for an image until it is complete (see :meth:`settle_chunk`).
+
+        Returns:
+            tuple[nepyc.proto.ack.ThrottleAck, bool] | None:
+                None if the frame is admitted; otherwise a THROTTLED ACK and True, as the body is read and discarded
+                so the client can keep using the connection.
+        """
+        wait = self.throttle.admit(self.client_key(addr), header.body_size, images)
+
+        if not wait:
+            return None
+
+        self.create_logger().debug(f'Throttling frame {header.seq} from {addr} for {wait:.3f}s')
+
+        return self.throttle_ack(wait), True
+
+    def open_upload(self, meta):
+        """
+        Answer an UPLOAD frame; open the chunked upload it declares, or find the one already open under its id.
+
+        Parameters:
+            meta (bytes | bytearray):
+                The frame's metadata; see :data:`nepyc.proto.frames.UPLOAD_META`.
+
+        Returns:
+            nepyc.proto.ack.Ack:
+                An offset ACK carrying the number of bytes already committed, or a limit ACK if the upload is larger
+                than the server accepts.
+        """
+        log = self.create_logger()
+        upload_id, total = UPLOAD_META.unpack(meta)
+        reason = self.limits.violation(total)
+
+        if reason is not None:
+            log.warning(f'Refusing upload {upload_id.hex()}: {reason}')
+
+            return DISPATCHER.dispatch(LimitAck)
+
+        return DISPATCHER.dispatch(OffsetAck, offset=self.uploads.open(upload_id, total))
+
+    def settle_chunk(self, session, seq, meta, data, key=None):
+        """
+        Commit a CHUNK frame to its upload and acknowledge it. While the upload is incomplete, the chunk is answered with
+        the new committed offset. Once it is complete, the image is charged to the client's rate limits, the staged file
+        is offered to the ingest queue and the chunk is answered with the ACK for the image, like an IMAGE frame; if the
+        client is over its image rate, or the queue is full, it is answered with a THROTTLED or BUSY ACK and the upload
+        is kept, so resending the chunk completes it.
+
+        Parameters:
+            session (nepyc.server.pipeline.PipelineSession):
+                The pipelined session of the connection.
+
+            seq (int):
+                The sequence id of the frame.
+
+            meta (bytes | bytearray):
+                The frame's metadata; see :data:`nepyc.proto.frames.CHUNK_META`.
+
+            data (bytes | bytearray | memoryview | BinaryIO):
+                The chunk.
+
+            key (Hashable, optional):
+                The client the completed image is charged to and queued for; see :meth:`IngestQueue.offer`.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+        upload_id, offset = CHUNK_META.unpack(meta)
+
+        try:
+            committed = self.uploads.write(upload_id, offset, data)
+            path = self.uploads.complete(upload_id)
+        except (UploadError, OSError) as e:
+            log.warning(f'Refusing chunk {seq}: {e}')
+            session.reply(seq, DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']))
+
+            return
+
+        if path is None:
+            session.reply(seq, DISPATCHER.dispatch(OffsetAck, offset=committed))
+
+            return
+
+        # The chunks were only charged for their bytes; the image is charged once it is complete.
+        wait = self.throttle.admit(key, 0)
+
+        if wait:
+            log.debug(f'Throttling completed upload {upload_id.hex()} for {wait:.3f}s')
+            session.reply(seq, self.throttle_ack(wait))
+
+            return
+
+        image_file = open(path, 'rb')
+        future = self.ingest_queue.offer(image_file, key=key)
+
+        if future is None:
+            image_file.close()
+            session.reply(seq, self.busy_ack())
+
+            return
+
+        def cleanup():
+            image_file.close()
+            self.uploads.discard(upload_id)
+
+        log.debug(f'Upload {upload_id.hex()} complete, ingesting {committed} bytes')
+        session.track(seq, future, cleanup=cleanup)
+
+    def ingest_archive(self, stream, key=None, clock=None):
+        """
+        Ingest the images in a TAR frame's archive, one member at a time as the archive arrives, and summarize the
+        outcome of each. Every image is checked against the :attr:`limits` and offered to the ingest queue like an
+        IMAGE frame, while the next one is read; if the queue refuses it, the archive is not read any further until
+        the images already offered from it have been processed. Each image is charged to the client's image rate
+        before it is read, and the archive is paused for as long as the client is over it. Members that are not
+        regular files are skipped.
+
+        If the archive is corrupt, the image being read is counted as invalid and the rest of the body is dropped, so
+        the connection can carry on with the next frame.
+
+        Parameters:
+            stream (nepyc.server.utils.buffers.BodyStream):
+                The frame body.
+
+            key (Hashable, optional):
+                The client the images are queued for; see :meth:`IngestQueue.offer`.
+
+            clock (nepyc.server.connections.ConnectionClock, optional):
+                The clock bounding the connection's reads. The body deadlines start afresh after every wait for the
+                client's image rate or for room in the ingest queue, so time spent waiting is not held against the
+                client.
+
+        Returns:
+            nepyc.proto.ack.SummaryAck:
+                The outcome of every image in the archive, in order.
+
+        Raises:
+            ConnectionError:
+                If the connection is closed before the end of the body, or the ingest queue has been shut down (e.g.
+                the server's drain deadline passed) while an image was waiting for room in it; the archive is abandoned,
+                and the connection must be closed.
+
+            nepyc.server.connections.DeadlineExceeded:
+                If the client misses one of its deadlines.
+        """
+        log = self.create_logger()
+        outcomes = []
+        window   = deque()
+
+        def settle(block=False):
+            while window and (block or window[0].done()):
+                try:
+                    ack, image = window.popleft().result()
+                except Exception as e:
+                    log.error(f'Archive member failed: {e}')
+                    ack, image = DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']), None
+
+                outcomes.append(ack.CODE)
+                block = False
+
+                if image:
+                    self.show_image(image)
+
+        def settled(ack):
+            future = Future()
+            future.set_result((ack, None))
+
+            return future
+
+        try:
+            with tarfile.open(fileobj=stream, mode='r|*') as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+
+                    if len(outcomes) + len(window) >= SummaryAck.MAX_MEMBERS:
+                        log.warning(f'Archive has more than {SummaryAck.MAX_MEMBERS} images; dropping the rest')
+                        break
+
+                    if self.limits.violation(member.size) is not None:
+                        log.warning(f'Refusing archive member {member.name!r} of {member.size} bytes')
+                        window.append(settled(DISPATCHER.dispatch(LimitAck)))
+                        continue
+
+                    # The archive was only charged for its bytes; each image in it is charged here.
+                    wait = self.throttle.admit(key, 0)
+
+                    while wait and not self.ingest_queue.closed:
+                        time.sleep(wait)
+                        wait = self.throttle.admit(key, 0)
+
+                    # The body deadlines start afresh once the waits are over, so they are not held against the client.
+                    if clock is not None:
+                        clock.expect_body()
+
+                    payload = self.allocate_payload(member.size)
+
+                    try:
+                        source = archive.extractfile(member)
+
+                        while payload.received < member.size:
+                            chunk = source.read(min(member.size - payload.received, self.read_size))
+
+                            if not chunk:
+                                raise tarfile.ReadError(f'Archive member {member.name!r} is truncated')
+
+                            payload.write(chunk)
+
+                        future = self.ingest_queue.offer(payload.data, key=key)
+
+                        while future is None:
+                            if self.ingest_queue.closed:
+                                raise ConnectionAbortedError('The ingest queue has shut down; abandoning the archive')
+
+                            if window:
+                                settle(block=True)
+                            else:
+                                time.sleep(self.busy_retry_after / 1000)
+
+                            future = self.ingest_queue.offer(payload.data, key=key)
+                    except BaseException:
+                        payload.close()
+                        raise
+
+                    future.add_done_callback(lambda _, payload=payload: payload.close())
+                    window.append(future)
+                    settle()
+
+                    # Likewise for the next member's header, after any wait for room in the ingest queue.
+                    if clock is not None:
+                        clock.expect_body()
+
+        except tarfile.TarError as e:
+            log.warning(f'Corrupt archive after {len(outcomes) + len(window)} image(s): {e}')
+            window.append(settled(DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV'])))
+
+        while window:
+            settle(block=True)
+
+        if clock is not None:
+            clock.expect_body()
+
+        stream.discard(self.read_size)
+        log.debug(f'Archive ingested; {len(outcomes)} image(s)')
+
+        return DISPATCHER.dispatch(SummaryAck, outcomes=outcomes)
+
+    def answer_have(self, digest):
+        """
+        Answer a HAVE frame; tell the client whether it needs to send the image with the given digest.
+
+        Parameters:
+            digest (bytes | bytearray):
+                The raw digest carried by the frame; see :func:`nepyc.proto.frames.pixel_digest`.
 
         Returns:
-            int:
-                The total size of all images in bytes.
+            nepyc.proto.ack.Ack:
+                A duplicate ACK if the image has already been accepted (see :meth:`has_image`), otherwise a proceed
+                ACK.
         """
-        total_size = 0
-        for image in self.images:
-            with BytesIO() as img_buffer:
-                image.save(img_buffer, format=image.format)
-                total_size += len(img_buffer.getvalue())
+        if self.has_image(bytes(digest).hex()):
+            return DISPATCHER.dispatch(REJECT_ACK_MAP[b'DUP'])
 
-        return total_size
+        return DISPATCHER.dispatch(ProceedAck)
 
-    def bind(self):
+    def error_ack(self, error):
         """
-        Bind the server to the specified host and port. If the server is already running, an error will be raised. If
-        the host is not set, an error will be raised. If the port is not free, an error will be raised.
+        Create the ACK a frame is refused with when ingesting it raised an error, rather than returning an ACK.
+
+        Parameters:
+            error (Exception):
+                The error raised.
 
         Returns:
-            socket.socket:
-                The server socket.
+            nepyc.proto.ack.Ack:
+                A LIMIT ACK if the image exceeds the image limits (or Pillow's decompression-bomb threshold), otherwise
+                an invalid ACK.
         """
-        log = self.create_logger()
-        log.debug(f'Binding server to {self.host}:{self.port}')
+        if isinstance(error, (LimitError, Image.DecompressionBombError)):
+            return DISPATCHER.dispatch(LimitAck)
 
-        if self.server:
-            log.error('Server is already running, cannot bind again')
-            raise ValueError('Server is already running')
+        return DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV'])
 
-        if not self.host:
-            log.error('Host must be set before binding')
-            raise ValueError('Host must be set before binding')
+    def busy_ack(self):
+        """
+        Create a BUSY ACK carrying the server's retry-after hint.
 
-        if not is_port_free(self.port, self.host):
-            log.error(f'Port {self.port} is not free, cannot bind to it')
-            raise ValueError(f'Port {self.port} is not free, cannot bind to it')
+        Returns:
+            nepyc.proto.ack.BusyAck:
+                The BUSY ACK to send to the client.
+        """
+        return DISPATCHER.dispatch(BusyAck, retry_after=self.busy_retry_after)
 
-        # Check if the server socket is already initialized
-        if self.__server:
-            log.debug('Server socket already initialized, skipping bind.')
-            return self.__server
+    def throttle_ack(self, wait):
+        """
+        Create a THROTTLED ACK telling the client how long to wait before sending its frame again.
 
-        self.__server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        Parameters:
+            wait (float):
+                The number of seconds until the client's rate limits admit the frame; see :meth:`ClientThrottle.admit`.
 
-        try:
-            self.server.bind((self.host, self.port))
-        except PermissionError as e:
-            log.error(f'Error binding to {self.host}:{self.port}: {e}')
-            self.stop()
+        Returns:
+            nepyc.proto.ack.ThrottleAck:
+                The THROTTLED ACK to send to the client.
+        """
+        return DISPATCHER.dispatch(ThrottleAck, retry_after=math.ceil(wait * 1000))
 
-        log.debug(f'Server bound to {self.host}:{self.port}')
+    @staticmethod
+    def client_key(addr):
+        """
+        Return the key a client's rate limits and share of the ingest queue are kept under; its source address, so
+        every connection from the same host shares them.
 
-        return self.server
+        Parameters:
+            addr (tuple | str | None):
+                The address of the client, as returned by `accept`; a Unix socket peer has no address.
 
-    def listen(self):
+        Returns:
+            Hashable:
+                The client's key.
         """
-        Listen for incoming connections. This will listen for incoming connections and then handle them in a separate
-        thread. This will continue to listen for incoming connections until the server is stopped. This will not return
-        until the server is stopped...
+        if isinstance(addr, tuple):
+            return addr[0]
+
+        return addr or 'local'
+
+    def has_image(self, img_hash):
+        """
+        Return whether an image has already been accepted this session (see :attr:`accepted_hashes`) or, if the save
+        images flag is set, saved (see :attr:`hash_store`). The hash database is not opened when images are not saved.
+
+        Parameters:
+            img_hash (str):
+                The hex MD5 digest of the image's pixel data.
 
         Returns:
-            None
+            bool:
+                True if the image has already been accepted or saved.
         """
-        log = self.create_logger()
+        if img_hash in self.accepted_hashes:
+            return True
 
-        self.server.listen()
-        log.debug(f'Server listening on {self.host}:{self.port}')
-        self.running = True
+        return self.save_images and self.hash_store.contains(img_hash)
+
+    def ingest(self, image_data, key=None):
+        """
+        Ingest a received frame. This does not touch the client connection, so it can be run from any engine or
+        executor; the caller is responsible for sending the returned ACK.
+
+        Frames are keyed by a digest of their raw bytes, and run through the :attr:`single_flight` layer, so identical
+        frames that arrive at the same time (e.g. the same image uploaded by several clients at once) are decoded and
+        checked only once, by :meth:`decode_and_accept`. The first of them is answered with the outcome; the others are
+        duplicates of it if it was accepted, and are refused in the same way if it was not.
+
+        A frame whose digest is in the :attr:`rejects` cache, because the same bytes were recently refused as invalid,
+        is refused again straight away, and the hit is counted against the client.
+
+        Duplicates are found in two tiers. The digest is the first: a frame with the same bytes as one already accepted
+        (see :attr:`frame_digests` and :meth:`HashStore.contains_digest`) is an exact re-send, and is refused without
+        being decoded. Only frames that miss it are decoded, and checked by their perceptual hash in :meth:`accept`.
+
+        Parameters:
+            image_data (bytes | bytearray | memoryview | BinaryIO):
+                The image data received from the client. It is opened in place, without being copied.
+
+            key (Hashable, optional):
+                The client the frame came from; see :meth:`client_key`.
+
+        Returns:
+            tuple[nepyc.proto.ack.Ack, PIL.Image]:
+                The ACK to send to the client, and the image object if the image data is valid and new, otherwise None.
+        """
+        log     = self.create_logger()
+        digest  = raw_digest(image_data)
+        refused = self.rejects.get(digest, key=key)
+
+        if refused is not None:
+            log.debug(f'Refusing a known-invalid frame from {key} ({self.rejects.client_hits(key)} so far)')
+
+            return DISPATCHER.dispatch(refused), None
+
+        if self.is_known_frame(digest):
+            log.debug('Frame is an exact re-send of an accepted image, ignoring...')
+
+            return DISPATCHER.dispatch(REJECT_ACK_MAP[b'DUP']), None
+
+        (ack, image), leader = self.single_flight.run(digest, self.decode_and_accept, image_data, digest=digest)
+
+        if leader:
+            return ack, image
+
+        log.debug('Frame coalesced with a concurrent upload of the same image')
+
+        if isinstance(ack, OKAck):
+            return DISPATCHER.dispatch(REJECT_ACK_MAP[b'DUP']), None
+
+        return DISPATCHER.dispatch(type(ack)), None
+
+    def decode_and_accept(self, image_data, digest=None):
+        """
+        Decode and accept a received frame. The frame is decoded and hashed by the :attr:`decode_stage` (possibly in a
+        worker process) and the result is then checked for duplicates. If the image is not a duplicate, it will save the
+        image to the save directory and append the hash of the image to the hash database.
+
+        Parameters:
+            image_data (bytes | bytearray | memoryview | BinaryIO):
+                The image data received from the client.
+
+            digest (bytes, optional):
+                The digest of the frame's raw bytes. If given, and the frame is not an image Pillow can identify or
+                exceeds the image limits, the digest is added to the :attr:`rejects` cache. Other decoding failures,
+                such as a decode worker dying, say nothing certain about the frame, so it is not cached for them.
+
+        Returns:
+            tuple[nepyc.proto.ack.Ack, PIL.Image]:
+                The ACK to send to the client, and the image object if the image data is valid and new, otherwise None.
+        """
+        log = self.create_logger()
+        log.debug('Processing image data...')
 
         try:
-            while self.running:
-                self.server.settimeout(30)
+            decoded = self.decode_stage.decode(image_data)
 
-                try:
-                    conn, addr = self.server.accept()
-                    log.debug(f'Accepted connection from {addr}')
-                    threading.Thread(target=self.handle_client, args=(conn, addr)).start()
+        except (LimitError, Image.DecompressionBombError) as e:
+            log.warning(f'Refusing image: {e}')
+            refused = LimitAck
 
-                except socket.timeout:
-                    continue
+        except Image.UnidentifiedImageError as e:
+            log.error(f'Invalid image data: {e}')
+            refused = REJECT_ACK_MAP[b'INV']
 
-                except OSError:
-                    if not self.running:
-                        break
-                    log.error('Error accepting connection')
-                    break  # Break out of the loop, socket's been closed.
+        except (OSError, ValueError) as e:
+            log.error(f'Invalid image data: {e}')
 
-                log.debug(f'Connection from {addr}')
+            return DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']), None
 
-        except KeyboardInterrupt:
-            log.debug('Keyboard interrupt received, stopping server')
-            self.running = False
+        else:
+            return self.accept(decoded, digest=digest)
 
-        finally:
-            self.server.close()
+        if digest is not None:
+            self.rejects.add(digest, refused)
 
-    def handle_client(self, client, addr):
+        return DISPATCHER.dispatch(refused), None
+
+    def is_known_frame(self, digest):
         """
-        Handle a client connection. This will receive image data from the client and then process it. If the image data
-        is valid, it will be added to the list of images. If the image data is a duplicate, a duplicate ACK message will
-        be sent to the client. If the image data is invalid, an invalid ACK message will be sent to the client. If the
-        image data is valid and the save images flag is set, the image will be saved to the save directory.
+        Return whether a frame has exactly the same bytes as one already accepted, or refused as a duplicate, this
+        session, or (if the save images flag is set) as one already saved.
 
         Parameters:
-            client (socket.socket):
-                The client sopcket to send the ACK.
+            digest (bytes):
+                The digest of the frame's raw bytes; see :func:`nepyc.server.pipeline.flight.raw_digest`.
 
-            addr:
-                The address of the client.
+        Returns:
+            bool:
+                True if the frame is an exact re-send, and need not be decoded.
+        """
+        if digest in self.frame_digests:
+            return True
+
+        return self.save_images and self.hash_store.contains_digest(digest)
+
+    def accept(self, decoded, digest=None):
+        """
+        Accept a decoded frame. This checks the image for duplicates and, if the save images flag is set, saves it.
+
+        An image is a duplicate if its average hash is within :attr:`duplicate_distance` of one accepted earlier this
+        session (see :attr:`image_hashes`) or, when saving, of one already saved (see :attr:`hash_store`).
+
+        Parameters:
+            decoded (nepyc.server.pipeline.DecodedImage):
+                The decoded image and its hashes.
+
+            digest (bytes, optional):
+                The digest of the frame's raw bytes. If given, it is added to :attr:`frame_digests` once the image is
+                accepted or found to be a duplicate, and saved with the image.
 
         Returns:
-            None
+            tuple[nepyc.proto.ack.Ack, PIL.Image]:
+                The ACK to send to the client, and the image object if the image is new, otherwise None.
         """
         log = self.create_logger()
-        log.debug(f'Handling client {addr}')
+        average_hash = hash_to_int(decoded.average_hash)
 
-        with client:
-            while True:
-                size_data = self.receive_data(client)
+        if not self.image_hashes.add_if_new(average_hash, decoded.md5, distance=self.duplicate_distance):
+            log.debug('Duplicate image received, ignoring...')
+            self.remember_frame(digest)
 
-                if not size_data:
-                    break
+            return DISPATCHER.dispatch(REJECT_ACK_MAP[b'DUP']), None
 
-                size = struct.unpack('!I', size_data)[0]
+        if self.save_images:
+            log.debug('Saving image...')
 
-                image_data = self.receive_image_data(client, size)
+            try:
+                saved = self.save_image(
+                    decoded.image,
+                    img_hash=decoded.md5,
+                    average_hash=average_hash,
+                    raw_digest=digest
+                )
+            except (OSError, ValueError) as e:
+                log.error(f'Unable to save image: {e}')
+                self.image_hashes.remove(average_hash)
 
-                if not image_data:
-                    break
+                return DISPATCHER.dispatch(REJECT_ACK_MAP[b'INV']), None
 
-                if image := self.process_image(image_data, client):
-                    log.debug('Image added to list of images')
-                    self.images.append(image)
+            if not saved:
+                self.remember_frame(digest)
 
-                log.debug('Response sent to client.')
+                return DISPATCHER.dispatch(REJECT_ACK_MAP[b'DUP']), None
+
+        self.remember_frame(digest)
+        self.__accepted_hashes.add(decoded.md5)
+
+        return DISPATCHER.dispatch(OKAck), decoded.image
+
+    def remember_frame(self, digest):
+        """
+        Add a frame's digest to :attr:`frame_digests`, so a re-send of it is refused without being decoded.
 
-    def process_image(self, image_data, client):
+        Parameters:
+            digest (bytes | None):
+                The digest of the frame's raw bytes; nothing is done if it is None.
+
+        Returns:
+            None
         """
-        Process the image data received from the client. This will load the image data into a PIL Image object and then
-        check if the image is a duplicate. If the image is not a duplicate, it will save the image to the save directory
-        and append the hash of the image to the hash database. If the image is a duplicate, it will send a duplicate ACK
-        message to the client. If the image data is invalid, it will send an invalid ACK message to the client.
+        if digest is not None:
+            self.__frame_digests.add(digest)
+
+    def process_image(self, image_data, client, key=None):
+        """
+        Process the image data received from the client. This offers the image data to the :attr:`ingest_queue`, waits
+        for it to be ingested (see :meth:`ingest`) and then sends exactly one ACK message to the client; OK if the image
+        was accepted, a duplicate ACK if the image is a duplicate, an invalid ACK if the image data is invalid, or a BUSY
+        ACK if the ingest queue is full.
 
         Args:
-            image_data (bytes):
+            image_data (bytes | bytearray | memoryview):
                 The image data received from the client.
 
             client (socket.socket):
                 The client socket.
 
+            key (Hashable, optional):
+                The client the image is queued for; see :meth:`IngestQueue.offer`.
+
         Returns:
             PIL.Image:
                 The image object if the image data is valid, otherwise None.
         """
-        log = self.create_logger()
-        log.debug('Processing image data...')
-
-        try:
-            image = Image.open(BytesIO(image_data))
-            image.load()
-
-            if check_hash(image, self.image_hashes):
-                log.debug('Duplicate image received, ignoring...')
-                send_ack(DISPATCHER.dispatch(REJECT_ACK_MAP['DUP']), client)
+        future = self.ingest_queue.offer(image_data, key=key)
 
-                return None
+        if future is None:
+            self.create_logger().debug('Ingest queue is full, frame rejected')
+            send_ack(self.busy_ack(), client)
 
-            if self.save_images:
-                log.debug('Saving image...')
-                self.save_image(image, client)
+            return None
 
-            ack = DISPATCHER.dispatch(OKAck)
+        try:
+            ack, image = future.result()
+        except (Image.DecompressionBombError, OSError, ValueError) as e:
+            self.create_logger().error(f'Unable to ingest image: {e}')
+            ack, image = self.error_ack(e), None
 
-            send_ack(ack, client)
+        send_ack(ack, client)
 
-            return image
+        return image
 
-        except (OSError, ValueError) as e:
-            log.error(f'Invalid image data: {e}')
+    def receive_data(self, client):
+        """
+        Receive the 4-byte size header of a frame from the client. Short reads are retried until the whole header has
+        arrived.
 
-            ack = DISPATCHER.dispatch(REJECT_ACK_MAP['INV'])
-            send_ack(ack, client)
+        Parameters:
+            client (socket.socket):
+                The client socket connection to receive the header from.
 
-    def receive_data(self, client):
+        Returns:
+            bytearray:
+                The size header, or None if the client disconnected or an error occurred.
+        """
         log = self.create_logger()
 
         try:
-            size_data = client.recv(4)
+            size_data = recv_exactly(client, SIZE_HEADER.size)
 
-            if not size_data:
+            if size_data is None:
                 log.debug('No more data from client')
                 return None
 
-            log.debug(f'Received size data: {size_data}')
+            log.debug(f'Received size data: {bytes(size_data)}')
             return size_data
 
+        except DeadlineExceeded:
+            raise
         except socket.timeout:
             log.error('Socket timeout occurred while receiving size data')
             return None
@@ -609,7 +2256,9 @@ class ImageServer(Loggable):
 
     def receive_image_data(self, client, size):
         """
-        Receive image data from the client. This will receive the image data in chunks and then return the full image data.
+        Receive image data from the client into a payload from :meth:`allocate_payload`; either a single preallocated
+        buffer filled in place with `recv_into`, or a temporary file for frames that are spooled to disk. At most
+        :attr:`read_size` bytes are read per call.
 
         Parameters:
             client (socket.socket):
@@ -619,48 +2268,62 @@ class ImageServer(Loggable):
                 The size (in bytes) of the image data to receive.
 
         Returns:
-            bytes:
-                The full image data.
+            nepyc.server.utils.buffers.MemoryPayload | nepyc.server.utils.buffers.SpooledPayload:
+                The payload holding the full image data, or None if the client disconnected or an error occurred. The
+                caller must close the payload once the frame has been processed.
         """
         log = self.create_logger()
 
-        data = b''
-        try:
-            while len(data) < size:
-                packet = client.recv(min(size - len(data), 1024))
-
-                if not packet:
-                    log.debug('No more data from client')
+        payload = self.allocate_payload(size)
 
-                    return None
+        try:
+            if not payload.recv_from(client, self.read_size):
+                log.debug(f'No more data from client; received {payload.received} of {size} bytes')
+                payload.close()
 
-                data += packet
-                log.debug(f'Received {len(packet)} bytes of image data, total received: {len(data)} bytes')
+                return None
 
-            log.debug(f'Image data received. Total size: {len(data)}')
-            return data
+            log.debug(f'Image data received. Total size: {size}')
+            return payload
 
+        except DeadlineExceeded:
+            payload.close()
+            raise
         except socket.timeout:
             log.error('Socket timeout occurred while receiving image data')
-            return None
         except socket.error as e:
             log.error(f'Socket error occurred while receiving image data: {e}')
-            return None
         except Exception as e:
             log.error(f'An unexpected error occurred while receiving image data: {e}')
-            return None
+
+        payload.close()
+
+        return None
 
     def run_server(self):
         """
-        Run the server. This will bind the server to the host and port, then listen for incoming connections.
+        Run the server with the configured engine. The threaded engine will bind the server to the host and port, then
+        listen for incoming connections; the asyncio engine binds and serves on its own event loop. Partial uploads that
+        have expired are deleted first.
 
         Returns:
             None
         """
+        # Uploads abandoned while the server was down would otherwise stay on disk until the next one is opened.
+        self.uploads.expire()
+
+        if self.engine == 'asyncio':
+            from nepyc.server.async_engine import AsyncEngine
+
+            self.__engine_runner = AsyncEngine(self)
+            self.__engine_runner.run()
+
+            return
+
         self.bind()
         self.listen()
 
-    def save_image(self, image, client):
+    def save_image(self, image, img_hash=None, average_hash=None, raw_digest=None):
         """
         Save an image to the save directory. This will save the image to the save directory and then append the hash of it
         to the hash database.
@@ -669,32 +2332,87 @@ class ImageServer(Loggable):
             image (PIL.Image):
                 The image to save.
 
-            client (socket.socket):
-                The client socket connection to send ACK messages to.
+            img_hash (str, optional):
+                The hex MD5 digest of the image's pixel data, if it has already been computed.
+
+            average_hash (int, optional):
+                The image's average hash. If given, the image is not saved if it is within :attr:`duplicate_distance` of
+                one already saved.
+
+            raw_digest (bytes, optional):
+                The digest of the encoded bytes the image was received as, recorded with it in the hash database so a
+                re-send of the same bytes is recognised without being decoded.
 
         Returns:
-            None
+            bool:
+                True if the image was saved, False if it (or a near-duplicate of it) was already in the hash database.
         """
         log = self.create_logger()
-        log.debug('Loading hashes...')
 
-        known_hashes, missing_numbers, max_number = load_hash_data(self.save_directory)
+        if img_hash is None:
+            img_hash = hashlib.md5(image.tobytes()).hexdigest()
 
-        img_hash = hashlib.md5(image.tobytes()).hexdigest()
+        # Claiming the hash reserves a file number, and refuses concurrent saves of the same image, across every ingest
+        # worker and acceptor process sharing the hash store.
+        file_number = self.hash_store.claim(
+            img_hash,
+            average_hash,
+            distance=self.duplicate_distance,
+            raw_digest=raw_digest
+        )
 
-        if img_hash not in known_hashes:
-            log.debug('Image not in hash database, saving...')
+        if file_number is None:
+            log.debug('Image already in hash database, ignoring...')
 
-            file_number, max_number = assign_number(missing_numbers, max_number)
+            return False
 
-            file_name = f'{file_number}.png'
-            image.save(f'{self.save_directory}/{file_name}')
-            log.debug(f'Image saved to {self.save_directory}/{file_name}')
-            append_hash_to_file(self.save_directory, img_hash, file_number)
+        log.debug('Image not in hash database, saving...')
+        file_name = f'{file_number}.png'
 
-        else:
-            log.debug('Image already in hash database, ignoring...')
-            send_ack(DISPATCHER.dispatch(REJECT_ACK_MAP['DUP']), client)
+        # Written to a hidden temporary file first, and renamed into place once it is on disk, so a crash part way
+        # through never leaves a truncated image under the name the hash database points to.
+        partial = Path(self.save_directory, f'.{file_name}.tmp')
+
+        try:
+            with open(partial, 'wb') as file:
+                image.save(file, format='PNG')
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(partial, Path(self.save_directory, file_name))
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            self.hash_store.release(img_hash)
+            raise
+
+        self.hash_store.commit(img_hash)
+        log.debug(f'Image saved to {self.save_directory}/{file_name}')
+
+        return True
+
+    def show_image(self, image):
+        """
+        Hand an accepted image to the slideshow; either by adding it to :attr:`images`, or, if this server feeds a
+        separate display process, by putting a thumbnail of it on the display queue.
+
+        Parameters:
+            image (PIL.Image):
+                The accepted image.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+
+        if self.__display_queue is None:
+            log.debug('Image added to list of images')
+            self.images.append(image)
+
+            return
+
+        thumbnail = image.copy()
+        thumbnail.thumbnail((self.gui.width, self.gui.height))
+        self.__display_queue.put(thumbnail)
 
     def start(self) -> None:
         """
@@ -730,31 +2448,113 @@ class ImageServer(Loggable):
 
         server_thread.join()
 
-    def stop(self, from_gui=False):
+    def drain(self, timeout=None):
         """
-        Stop the server and the GUI. This will close the server socket and then stop the GUI.
+        Shut the server down without losing work. The listeners are closed, so no new connections are accepted; idle
+        connections are closed, and the rest once the frames they are receiving have been processed and acknowledged;
+        the ingest queue finishes the frames already queued; expired partial uploads are deleted; and the hash database
+        is flushed to disk. If the deadline passes first, whatever is still in flight is abandoned.
+
+        The server is only drained once; e.g. when it is stopped both by the GUI exiting and by :mod:`nepyc.server.main`
+        on the way out. Later calls wait for that drain to finish, and return its result.
 
         Parameters:
-            from_gui (bool):
-                If True, the GUI will not be stopped.
+            timeout (float, optional):
+                The number of seconds to wait for in-flight frames. Defaults to :attr:`drain_timeout`.
 
         Returns:
-            None
+            bool:
+                True if every in-flight frame was finished before the deadline.
         """
+        with self.__drain_lock:
+            if self.__drained is None:
+                self.__drained = self._drain(self.drain_timeout if timeout is None else timeout)
+
+            return self.__drained
+
+    def _drain(self, timeout):
         log = self.create_logger()
-        log.debug('Stopping server...')
 
+        # Started before the listeners are closed, so the asyncio engine waits for its connections once they are.
+        interrupted = self.connection_drain.start(timeout)
         self.running = False
 
+        if self.__engine_runner:
+            self.__engine_runner.stop()
+
         if self.server:
+            try:
+                # Wakes the accept loop, which closing the socket from another thread does not do on every platform.
+                self.server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
             try:
                 self.server.close()
             except Exception as e:
                 log.error(f'Error stopping server: {e}')
 
+        if self.unix_server:
+            try:
+                # The asyncio engine's listener owns the socket, and closes it on its own loop.
+                if self.engine != 'asyncio':
+                    self.unix_server.shutdown(socket.SHUT_RDWR)
+                    self.unix_server.close()
+
+                self.unix_socket.unlink(missing_ok=True)
+            except Exception as e:
+                log.error(f'Error stopping Unix socket listener: {e}')
+
+        log.info(f'Draining {self.connections.active} connection(s) for up to {timeout}s '
+                 f'({interrupted} idle connection(s) closed)')
+
+        drained = self.connection_drain.wait()
+        drained = self.ingest_queue.shutdown(timeout=self.connection_drain.remaining) and drained
+        self.decode_stage.shutdown(wait=False)
+
+        try:
+            self.uploads.expire()
+        except OSError as e:
+            log.error(f'Error expiring stale uploads: {e}')
+
+        if self.__hash_store is not None:
+            try:
+                self.__hash_store.flush()
+                log.info(f'Hash store: {self.__hash_store.stats()}')
+            except Exception as e:
+                log.error(f'Error flushing the hash database: {e}')
+
+        if drained:
+            log.info('Drained all in-flight frames')
+        else:
+            log.warning(f'Drain deadline passed; abandoning {self.connections.active} connection(s) and '
+                        f'{self.ingest_queue.size} queued frame(s)')
+
+        return drained
+
+    def stop(self, from_gui=False):
+        """
+        Stop the server and the GUI. The server is drained first (see :meth:`drain`), so frames already being received
+        are processed and acknowledged, for up to :attr:`drain_timeout` seconds, before the GUI is stopped. Stopping a
+        server that has already been stopped has no further effect.
+
+        Parameters:
+            from_gui (bool):
+                If True, the GUI will not be stopped.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+        log.debug('Stopping server...')
+
+        self.drain()
+
         log.debug('Server stopped.')
-        if not from_gui:
+        if not (from_gui or self.__gui_stopped):
             self.gui.queue.put('EXIT')
             self.gui.on_exit()
 
+        self.__gui_stopped = True
+
         log.debug('GUI stopped...')
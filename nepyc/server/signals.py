@@ -1,6 +1,10 @@
 
 """
-This module contains the signal handler for SIGINT (Ctrl+C)
+This module contains the signal handler for SIGINT (Ctrl+C) and SIGTERM.
+
+The first signal sets :data:`exit_flag`, which asks the server to drain (see
+:meth:`nepyc.server.server.ImageServer.drain`) and exit; frames already being received are finished first. A second
+signal exits straight away, for when the drain itself is stuck.
 
 Example Usage:
     >>> from nepyc.server.signals import setup_signal_handler
@@ -22,14 +26,17 @@ exit_flag = Event()
 
 def setup_signal_handler():
     """
-    Setup the signal handler for SIGINT (Ctrl+C)
+    Setup the signal handler for SIGINT (Ctrl+C) and SIGTERM. The first signal sets :data:`exit_flag`; the second
+    exits the process immediately.
 
     Returns:
         None
     """
     def signal_handler(signum, frame):
+        if exit_flag.is_set():
+            os._exit(1)
+
         exit_flag.set()
-        os._exit(0)
 
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
@@ -0,0 +1,447 @@
+"""
+Buffer helpers for receiving frames and handing them to PIL without copying them.
+
+Small frames are received into a single preallocated buffer (:class:`MemoryPayload`), charged against a server-wide
+:class:`MemoryBudget`. Frames that are too large, or that do not fit in the remaining budget, are spooled to disk instead
+(:class:`SpooledPayload`). Frame bodies that are parsed as they arrive, such as the archive carried by a TAR frame, are
+read through a :class:`BodyStream` instead.
+
+Example Usage:
+    >>> from PIL import Image
+    >>> from nepyc.server.utils.buffers import MemoryViewReader
+    >>> image = Image.open(MemoryViewReader(image_data))
+"""
+import io
+import threading
+from tempfile import SpooledTemporaryFile
+from nepyc.common.utils.sockets import recv_into_exactly
+
+
+class MemoryViewReader(io.RawIOBase):
+    """
+    A read-only, seekable file object over any buffer (bytes, bytearray or memoryview).
+
+    Unlike :class:`io.BytesIO`, wrapping a :class:`bytearray` or :class:`memoryview` does not copy it, so a frame received
+    with `recv_into` can be opened by PIL directly.
+    """
+    def __init__(self, buffer):
+        """
+        Initialize the reader.
+
+        Parameters:
+            buffer (bytes | bytearray | memoryview):
+                The buffer to read from.
+
+        Returns:
+            None
+        """
+        super().__init__()
+        self.__view     = memoryview(buffer).cast('B')
+        self.__position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        """
+        Read up to `len(b)` bytes into `b`.
+
+        Parameters:
+            b (memoryview):
+                The writable buffer to read into.
+
+        Returns:
+            int:
+                The number of bytes read; 0 at the end of the buffer.
+        """
+        start = self.__position
+        count = min(len(b), len(self.__view) - start)
+
+        if count <= 0:
+            return 0
+
+        b[:count] = self.__view[start:start + count]
+        self.__position += count
+
+        return count
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.__position + offset
+        elif whence == io.SEEK_END:
+            position = len(self.__view) + offset
+        else:
+            raise ValueError(f'Invalid whence ({whence})')
+
+        if position < 0:
+            raise ValueError(f'Negative seek position {position}')
+
+        self.__position = position
+
+        return position
+
+    def tell(self) -> int:
+        return self.__position
+
+
+class MemoryBudget:
+    """
+    A thread-safe count of bytes held in memory by in-flight frames, capped at a limit.
+
+    Attributes:
+        limit (int):
+            The maximum number of bytes that may be held at once.
+
+        used (int):
+            The number of bytes currently held.
+    """
+    def __init__(self, limit: int):
+        """
+        Initialize the budget.
+
+        Parameters:
+            limit (int):
+                The maximum number of bytes that may be held at once.
+
+        Returns:
+            None
+        """
+        if limit < 0:
+            raise ValueError('The memory budget must not be negative')
+
+        self.__limit = limit
+        self.__lock  = threading.Lock()
+        self.__used  = 0
+
+    @property
+    def limit(self) -> int:
+        return self.__limit
+
+    @property
+    def used(self) -> int:
+        return self.__used
+
+    def try_acquire(self, size: int) -> bool:
+        """
+        Reserve `size` bytes of the budget, if they are available.
+
+        Parameters:
+            size (int):
+                The number of bytes to reserve.
+
+        Returns:
+            bool:
+                True if the bytes were reserved, False if that would exceed the limit.
+        """
+        with self.__lock:
+            if self.__used + size > self.__limit:
+                return False
+
+            self.__used += size
+
+        return True
+
+    def release(self, size: int) -> None:
+        """
+        Return `size` previously reserved bytes to the budget.
+
+        Parameters:
+            size (int):
+                The number of bytes to return.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__used = max(self.__used - size, 0)
+
+
+class MemoryPayload:
+    """
+    A frame body received into a single preallocated buffer.
+
+    Attributes:
+        size (int):
+            The size of the frame body in bytes.
+
+        data (memoryview):
+            The frame body; only complete once :attr:`received` equals :attr:`size`.
+    """
+    def __init__(self, size: int, budget: MemoryBudget = None):
+        """
+        Initialize the payload. The bytes are expected to have already been reserved from `budget`; they are returned
+        to it by :meth:`close`.
+
+        Parameters:
+            size (int):
+                The size of the frame body in bytes.
+
+            budget (MemoryBudget, optional):
+                The budget the buffer is charged against.
+
+        Returns:
+            None
+        """
+        self.__budget   = budget
+        self.__buffer   = bytearray(size)
+        self.__view     = memoryview(self.__buffer)
+        self.__received = 0
+
+    @property
+    def data(self) -> memoryview:
+        return self.__view
+
+    @property
+    def received(self) -> int:
+        return self.__received
+
+    @property
+    def size(self) -> int:
+        return len(self.__view)
+
+    def recv_from(self, sock, read_size: int) -> bool:
+        """
+        Receive the rest of the frame body from `sock`, directly into the buffer.
+
+        Parameters:
+            sock (socket.socket):
+                The socket to read from.
+
+            read_size (int):
+                The maximum number of bytes requested per `recv_into` call.
+
+        Returns:
+            bool:
+                True if the whole body was received, False if the peer closed the connection first.
+        """
+        self.__received += recv_into_exactly(sock, self.__view[self.__received:], read_size)
+
+        return self.__received == self.size
+
+    def write(self, chunk) -> None:
+        """
+        Append a chunk of the frame body.
+
+        Parameters:
+            chunk (bytes | bytearray | memoryview):
+                The chunk to append.
+
+        Returns:
+            None
+        """
+        end = self.__received + len(chunk)
+        self.__view[self.__received:end] = chunk
+        self.__received = end
+
+    def close(self) -> None:
+        """
+        Release the buffer and return its bytes to the memory budget.
+
+        Returns:
+            None
+        """
+        if self.__budget is not None:
+            self.__budget.release(self.size)
+            self.__budget = None
+
+
+class SpooledPayload:
+    """
+    A frame body spooled to a temporary file rather than held in memory.
+
+    Attributes:
+        size (int):
+            The size of the frame body in bytes.
+
+        data (tempfile.SpooledTemporaryFile):
+            The file holding the frame body, rewound to the start.
+    """
+    def __init__(self, size: int, max_size: int = 0, directory=None):
+        """
+        Initialize the payload.
+
+        Parameters:
+            size (int):
+                The size of the frame body in bytes.
+
+            max_size (int, optional):
+                The number of bytes held in memory before the file rolls over to disk. Defaults to 0, which writes
+                straight to disk.
+
+            directory (str | pathlib.Path, optional):
+                The directory the temporary file is created in. Defaults to the system temporary directory.
+
+        Returns:
+            None
+        """
+        self.__file     = SpooledTemporaryFile(max_size=max_size, dir=directory)
+        self.__size     = size
+        self.__received = 0
+
+        if not max_size:
+            self.__file.rollover()
+
+    @property
+    def data(self):
+        self.__file.seek(0)
+        return self.__file
+
+    @property
+    def received(self) -> int:
+        return self.__received
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    def recv_from(self, sock, read_size: int) -> bool:
+        """
+        Receive the rest of the frame body from `sock`, through a single scratch buffer of at most `read_size` bytes.
+
+        Parameters:
+            sock (socket.socket):
+                The socket to read from.
+
+            read_size (int):
+                The maximum number of bytes requested per `recv_into` call.
+
+        Returns:
+            bool:
+                True if the whole body was received, False if the peer closed the connection first.
+        """
+        scratch = memoryview(bytearray(min(self.__size - self.__received, read_size) or 1))
+
+        while self.__received < self.__size:
+            count = sock.recv_into(scratch, min(self.__size - self.__received, len(scratch)))
+
+            if not count:
+                return False
+
+            self.write(scratch[:count])
+
+        return True
+
+    def write(self, chunk) -> None:
+        """
+        Append a chunk of the frame body.
+
+        Parameters:
+            chunk (bytes | bytearray | memoryview):
+                The chunk to append.
+
+        Returns:
+            None
+        """
+        self.__file.write(chunk)
+        self.__received += len(chunk)
+
+    def close(self) -> None:
+        """
+        Close and delete the temporary file.
+
+        Returns:
+            None
+        """
+        self.__file.close()
+
+
+
+class BodyStream(io.RawIOBase):
+    """
+    A read-only file object over a frame body that is still arriving. Bytes are read from the connection only as they
+    are asked for, so a body can be parsed as a stream (e.g. by :mod:`tarfile`) without being received in full first.
+    The stream ends after exactly `size` bytes, leaving the connection at the start of the next frame.
+
+    Attributes:
+        remaining (int):
+            The number of bytes of the body not read yet.
+    """
+    def __init__(self, read_into, size: int):
+        """
+        Initialize the stream.
+
+        Parameters:
+            read_into (Callable[[memoryview], int]):
+                Reads between one and `len(view)` bytes from the connection into `view` and returns how many; zero if
+                the connection has been closed.
+
+            size (int):
+                The size of the frame body in bytes.
+
+        Returns:
+            None
+        """
+        super().__init__()
+        self.__read_into = read_into
+        self.__remaining = size
+
+    @property
+    def remaining(self) -> int:
+        return self.__remaining
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        """
+        Read up to `len(b)` bytes of the body into `b`.
+
+        Parameters:
+            b (memoryview):
+                The writable buffer to read into.
+
+        Returns:
+            int:
+                The number of bytes read; 0 at the end of the body.
+
+        Raises:
+            ConnectionError:
+                If the connection is closed before the end of the body.
+        """
+        view = memoryview(b).cast('B')[:self.__remaining]
+
+        if not view:
+            return 0
+
+        count = self.__read_into(view)
+
+        if not count:
+            raise ConnectionError(f'Connection closed with {self.__remaining} bytes of the frame body still to come')
+
+        self.__remaining -= count
+
+        return count
+
+    def discard(self, read_size: int) -> int:
+        """
+        Read and drop the rest of the body.
+
+        Parameters:
+            read_size (int):
+                The maximum number of bytes read at a time.
+
+        Returns:
+            int:
+                The number of bytes dropped.
+        """
+        dropped = self.__remaining
+        buffer  = memoryview(bytearray(min(read_size, dropped)))
+
+        while self.__remaining:
+            self.readinto(buffer)
+
+        return dropped
+
+
+__all__ = [
+    'BodyStream',
+    'MemoryBudget',
+    'MemoryPayload',
+    'MemoryViewReader',
+    'SpooledPayload',
+]
@@ -47,8 +47,6 @@ def load_hash_data(pic_dir):
         max_number = max(token_numbers)
         missing_numbers = sorted(set(range(1, max_number + 1)) - token_numbers)
 
-    print(known_hashes, missing_numbers, max_number)
-
     return known_hashes, missing_numbers, max_number
 
 def append_hash_to_file(pic_dir, hash, number):
@@ -58,10 +56,10 @@ def append_hash_to_file(pic_dir, hash, number):
         f.write(f'{hash} {number}\n')
 
 
-def check_hash(image, hashes):
+def check_hash(image, hashes, image_hash=None):
     log = MOD_LOGGER.get_child('check_hash')
 
-    hash = imagehash.average_hash(image)
+    hash = image_hash if image_hash is not None else imagehash.average_hash(image)
 
     if hash in hashes:
         log.debug(f'Hash {hash} already exists')
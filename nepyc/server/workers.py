@@ -0,0 +1,276 @@
+"""
+This module contains the multi-process worker mode of the nePyc server.
+
+A single :class:`~nepyc.server.server.ImageServer` process is bound by the GIL however many threads it runs. In worker
+mode, the main process forks several acceptor processes, each running its own `ImageServer` on the same host and port
+with `SO_REUSEPORT`, so the kernel spreads incoming connections across them. The acceptors share one
+:class:`~nepyc.server.index.HashStore`, served from a manager process, so deduplication and file numbering stay
+consistent between them; accepted images are sent back to the main process, which runs the only slideshow.
+
+Note:
+    Worker mode needs `SO_REUSEPORT` and the `fork` start method, so it is only available on Linux and the BSDs.
+
+Example Usage:
+    >>> from nepyc.server.workers import WorkerPool
+    >>> pool = WorkerPool(4, host='0.0.0.0', port=8085, save_incoming_images=True)
+    >>> pool.start()
+    >>> pool.gui.start()
+"""
+import multiprocessing
+import queue
+import socket
+import threading
+import time
+from nepyc.log_engine import ROOT_LOGGER, Loggable
+from nepyc.server.gui import SlideshowGUI
+from nepyc.server.index import IndexManager
+from nepyc.server.signals import exit_flag, setup_signal_handler
+from nepyc.server.utils.images import load_all_images
+
+
+MOD_LOGGER = ROOT_LOGGER.get_child('server.workers')
+
+
+def run_acceptor(server_kwargs, hash_store, display_queue):
+    """
+    Run one acceptor process; the target of every process started by :class:`WorkerPool`. The process serves until it
+    is sent SIGTERM or SIGINT, then drains its server (see :meth:`~nepyc.server.server.ImageServer.drain`) and exits.
+
+    Parameters:
+        server_kwargs (dict):
+            The keyword arguments to create the process's :class:`~nepyc.server.server.ImageServer` with.
+
+        hash_store (nepyc.server.index.HashStore):
+            A proxy to the shared hash store.
+
+        display_queue (multiprocessing.Queue):
+            The queue accepted images are sent to the display process on.
+
+    Returns:
+        None
+    """
+    from nepyc.server.server import ImageServer
+
+    server = ImageServer(**server_kwargs, reuse_port=True, hash_store=hash_store, display_queue=display_queue)
+    setup_signal_handler()
+
+    threading.Thread(target=server.run_server, daemon=True).start()
+    exit_flag.wait()
+    server.drain()
+
+
+class WorkerPool(Loggable):
+    """
+    Several acceptor processes sharing one port, one hash store and one slideshow.
+
+    Attributes:
+        workers (int):
+            The number of acceptor processes.
+
+        images (list[PIL.Image]):
+            Thumbnails of the images accepted by any acceptor, for the slideshow.
+
+        running (bool):
+            Whether the acceptor processes have been started and not yet stopped.
+
+        gui (nepyc.server.gui.SlideshowGUI):
+            The slideshow, run by the main process.
+    """
+    # Seconds an acceptor is given to exit after its drain timeout, before it is killed.
+    KILL_GRACE = 5.0
+
+    def __init__(self, workers: int, **server_kwargs):
+        """
+        Initialize the pool. No processes are started until :meth:`start` is called.
+
+        Parameters:
+            workers (int):
+                The number of acceptor processes to start.
+
+            **server_kwargs:
+                The keyword arguments every acceptor's :class:`~nepyc.server.server.ImageServer` is created with.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError:
+                If `workers` is less than one, or a Unix domain socket is configured.
+
+            OSError:
+                If this platform does not support `SO_REUSEPORT`.
+        """
+        super().__init__(MOD_LOGGER)
+
+        if workers < 1:
+            raise ValueError('The number of workers must be at least 1')
+
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise OSError('Worker mode needs SO_REUSEPORT, which this platform does not support')
+
+        if server_kwargs.get('unix_socket') or not server_kwargs.get('tcp', True):
+            raise ValueError('Worker mode serves TCP only; Unix domain sockets cannot be shared with SO_REUSEPORT')
+
+        self.__context       = multiprocessing.get_context('fork')
+        self.__display_queue = None
+        self.__drainer       = None
+        self.__images        = []
+        self.__manager       = None
+        self.__processes     = []
+        self.__running       = False
+        self.__server_kwargs = server_kwargs
+        self.__workers       = workers
+
+        self.__gui = SlideshowGUI(self)
+
+        if server_kwargs.get('display_saved_images') and server_kwargs.get('save_directory'):
+            self.__images.extend(load_all_images(server_kwargs['save_directory']))
+
+    @property
+    def gui(self):
+        """
+        Return the slideshow, run by the main process.
+
+        Returns:
+            nepyc.server.gui.SlideshowGUI:
+                The slideshow.
+        """
+        return self.__gui
+
+    @property
+    def images(self):
+        """
+        Return the thumbnails of the images accepted by any acceptor.
+
+        Returns:
+            list[PIL.Image]:
+                The images for the slideshow.
+        """
+        return self.__images
+
+    @property
+    def running(self) -> bool:
+        """
+        Return whether the acceptor processes have been started and not yet stopped.
+
+        Returns:
+            bool:
+                The running flag.
+        """
+        return self.__running
+
+    @property
+    def workers(self) -> int:
+        """
+        Return the number of acceptor processes.
+
+        Returns:
+            int:
+                The number of acceptor processes.
+        """
+        return self.__workers
+
+    def start(self) -> None:
+        """
+        Start the hash store's manager process and the acceptor processes.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+
+        self.__manager = IndexManager(ctx=self.__context)
+        self.__manager.start()
+
+        from nepyc.server.server import ImageServer
+
+        save_directory = self.__server_kwargs.get('save_directory', ImageServer.DEFAULT_SAVE_DIR)
+        hash_store = self.__manager.HashStore(
+            save_directory,
+            expected_size=self.__server_kwargs.get('expected_library_size', ImageServer.DEFAULT_EXPECTED_LIBRARY_SIZE),
+            error_rate=self.__server_kwargs.get('bloom_error_rate', ImageServer.DEFAULT_BLOOM_ERROR_RATE)
+        )
+        log.debug(f'Shared hash store started for {save_directory}')
+
+        self.__display_queue = self.__context.Queue()
+
+        for number in range(self.workers):
+            process = self.__context.Process(
+                target=run_acceptor,
+                args=(self.__server_kwargs, hash_store, self.__display_queue),
+                name=f'nepyc-acceptor-{number}'
+            )
+            process.start()
+            self.__processes.append(process)
+
+        log.info(f'Started {self.workers} acceptor processes')
+
+        # Only start threads in this process once every acceptor has been forked.
+        self.__running = True
+        self.__drainer = threading.Thread(target=self._drain_display_queue, daemon=True)
+        self.__drainer.start()
+
+    def stop(self, from_gui=False) -> None:
+        """
+        Stop the acceptor processes, the hash store's manager and the slideshow. Each acceptor is sent SIGTERM and
+        drains its server; one that has not exited a few seconds after its drain timeout is killed.
+
+        Parameters:
+            from_gui (bool):
+                If True, the GUI will not be stopped.
+
+        Returns:
+            None
+        """
+        log = self.create_logger()
+
+        if not self.__running:
+            return
+
+        log.debug('Stopping acceptor processes...')
+
+        from nepyc.server.server import ImageServer
+
+        drain_timeout = self.__server_kwargs.get('drain_timeout', ImageServer.DEFAULT_DRAIN_TIMEOUT)
+        deadline = time.monotonic() + drain_timeout + self.KILL_GRACE
+
+        for process in self.__processes:
+            process.terminate()
+
+        for process in self.__processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+
+            if process.is_alive():
+                log.warning(f'{process.name} did not drain in time, killing it')
+                process.kill()
+                process.join()
+
+        self.__processes.clear()
+
+        # Keep collecting thumbnails until every acceptor has drained.
+        self.__running = False
+
+        if self.__manager is not None:
+            self.__manager.shutdown()
+            self.__manager = None
+
+        log.debug('Acceptor processes stopped.')
+
+        if not from_gui:
+            self.gui.queue.put('EXIT')
+            self.gui.on_exit()
+
+    def _drain_display_queue(self) -> None:
+        while self.__running:
+            try:
+                self.__images.append(self.__display_queue.get(timeout=0.5))
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+
+__all__ = [
+    'WorkerPool',
+    'run_acceptor',
+]
@@ -0,0 +1,81 @@
+"""
+Tests for the fixed-width ACK wire format; see :mod:`nepyc.proto.ack`.
+"""
+import pytest
+from nepyc.proto.ack import CODE_MAP, RECEIVER, Ack, BusyAck, OffsetAck, SummaryAck, ThrottleAck
+from nepyc.proto.ack.models.base import WIRE_FORMAT
+from nepyc.proto.frames import ACK_HEADER, PREFIX, pack_ack, unpack_ack_header
+
+
+@pytest.mark.parametrize('ack_type', sorted(CODE_MAP.values(), key=lambda ack_type: ack_type.CODE))
+def test_round_trip_keeps_type_and_seq(ack_type):
+    ack = ack_type()
+    data = ack.to_bytes()
+
+    assert Ack.payload_size(data) == len(data) - WIRE_FORMAT.size
+
+    decoded = Ack.from_bytes(data)
+
+    assert type(decoded) is ack_type
+    assert decoded.seq == ack.seq
+    assert decoded.status == ack.status
+    assert decoded.to_bytes() == data
+
+
+@pytest.mark.parametrize('ack_type', [BusyAck, ThrottleAck])
+def test_round_trip_keeps_retry_after(ack_type):
+    decoded = Ack.from_bytes(ack_type(retry_after=1234).to_bytes())
+
+    assert decoded.retry_after == 1234
+
+
+def test_round_trip_keeps_offset():
+    decoded = Ack.from_bytes(OffsetAck(offset=2 ** 40 + 7).to_bytes())
+
+    assert decoded.offset == 2 ** 40 + 7
+
+
+def test_round_trip_keeps_summary_outcomes():
+    outcomes = [OffsetAck.CODE, BusyAck.CODE, SummaryAck.CODE, 0x00]
+    decoded = Ack.from_bytes(SummaryAck(outcomes=outcomes).to_bytes())
+
+    assert decoded.outcomes == outcomes
+
+
+def test_summary_of_most_members_fits_length_field():
+    ack = SummaryAck(outcomes=[0x00] * SummaryAck.MAX_MEMBERS)
+
+    assert len(Ack.from_bytes(ack.to_bytes()).outcomes) == SummaryAck.MAX_MEMBERS
+
+
+def test_trailing_bytes_are_not_read_as_payload():
+    data = OffsetAck(offset=5).to_bytes()
+
+    assert Ack.from_bytes(data + b'next frame').offset == 5
+
+
+def test_receiver_journals_received_acks():
+    ack = RECEIVER.receive(BusyAck(retry_after=10).to_bytes())
+
+    assert RECEIVER.get_received_ack(ack.seq) is ack
+
+
+def test_envelope_carries_frame_seq():
+    ack = OffsetAck(offset=99)
+    envelope = pack_ack(ack, seq=42)
+
+    flags, seq, size = unpack_ack_header(envelope[:len(PREFIX) + ACK_HEADER.size])
+    body = envelope[-size:]
+
+    assert seq == 42
+    assert Ack.from_bytes(body).offset == 99
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'\x00' * (WIRE_FORMAT.size - 1), 'shorter than its header'),
+    (WIRE_FORMAT.pack(WIRE_FORMAT.size - 2, 99, 0x00, 1), 'Unsupported ACK wire format version'),
+    (WIRE_FORMAT.pack(WIRE_FORMAT.size - 2, 1, 0xEE, 1), 'Unknown ACK code'),
+])
+def test_malformed_acks_are_refused(data, message):
+    with pytest.raises(ValueError, match=message):
+        Ack.from_bytes(data)
@@ -0,0 +1,113 @@
+"""
+Tests for ingesting the images in a TAR frame's archive; see :meth:`nepyc.server.server.ImageServer.ingest_archive`.
+"""
+import io
+import random
+import tarfile
+import pytest
+from PIL import Image
+from nepyc.server.server import ImageServer
+from nepyc.server.utils.buffers import BodyStream
+
+
+def png(seed, size=(32, 32)):
+    rng = random.Random(seed)
+    image = Image.new('RGB', size)
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(size[0] * size[1])])
+    data = io.BytesIO()
+    image.save(data, format='PNG')
+
+    return data.getvalue()
+
+
+def archive(*members):
+    data = io.BytesIO()
+
+    with tarfile.open(fileobj=data, mode='w') as tar:
+        for number, member in enumerate(members):
+            info = tarfile.TarInfo(f'{number}.png')
+            info.size = len(member)
+            tar.addfile(info, io.BytesIO(member))
+
+    return data.getvalue()
+
+
+def stream(body, on_read=None):
+    """
+    A TAR frame's body, arriving from memory; `on_read` is called with the number of bytes read so far.
+    """
+    source = io.BytesIO(body)
+
+    def read_into(view):
+        count = source.readinto(view)
+
+        if on_read is not None:
+            on_read(source.tell())
+
+        return count
+
+    return BodyStream(read_into, len(body))
+
+
+@pytest.fixture
+def server(tmp_path):
+    # A single ingest worker, so the images of an archive are processed in order.
+    server = ImageServer(
+        host='127.0.0.1',
+        port=0,
+        save_incoming_images=True,
+        save_directory=tmp_path,
+        ingest_workers=1,
+        max_frame_size=16384
+    )
+    yield server
+    server.ingest_queue.shutdown()
+    server.decode_stage.shutdown()
+    server.hash_store.index.close()
+
+
+def test_each_image_is_answered_in_order(server):
+    body = archive(png(1), png(2), png(1), b'not an image')
+    summary = server.ingest_archive(stream(body), key='client')
+
+    assert summary.statuses == ['OK', 'OK', 'DUPLICATE', 'INVALID']
+    assert sorted(path.name for path in server.save_directory.glob('*.png')) == ['1.png', '2.png']
+
+
+def test_member_over_limit_is_refused_without_being_read(server):
+    body = archive(png(1), png(2, (128, 128)), png(3))
+    summary = server.ingest_archive(stream(body), key='client')
+
+    assert summary.statuses == ['OK', 'LIMIT', 'OK']
+
+
+def test_truncated_archive_counts_the_cut_image_as_invalid(server):
+    first = png(1)
+    body = archive(first, png(2))
+
+    # Cut off halfway through the second image, after the first one's header and padded data.
+    cut = 512 + 512 * -(-len(first) // 512) + 512 + 100
+    summary = server.ingest_archive(stream(body[:cut]), key='client')
+
+    assert summary.statuses == ['OK', 'INVALID']
+
+
+def test_corrupt_archive_is_invalid_and_its_body_dropped(server):
+    body = b'\x00garbage' * 200
+    frame = stream(body)
+    summary = server.ingest_archive(frame, key='client')
+
+    assert summary.statuses == ['INVALID']
+    assert frame.remaining == 0
+
+
+def test_archive_is_abandoned_once_the_queue_shuts_down(server):
+    body = archive(*(png(seed) for seed in range(4)))
+
+    def shut_down(position):
+        # As the server's drain does, while the archive is still arriving.
+        if position > len(body) // 2:
+            server.ingest_queue.shutdown(wait=False)
+
+    with pytest.raises(ConnectionError):
+        server.ingest_archive(stream(body, shut_down), key='client')
@@ -0,0 +1,169 @@
+"""
+Tests for the deadlines enforced on client connections; see :mod:`nepyc.server.connections`.
+"""
+import socket
+import pytest
+from nepyc.server.connections import ConnectionClock, ConnectionLimits, DeadlineExceeded, GuardedSocket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+LIMITS = ConnectionLimits(idle_timeout=300, header_timeout=10, body_timeout=30, min_throughput=1000)
+
+
+@pytest.fixture
+def now():
+    return FakeClock()
+
+
+@pytest.fixture
+def clock(now):
+    return ConnectionClock(LIMITS, clock=now)
+
+
+def test_idle_connection_has_until_its_idle_deadline(clock, now):
+    assert clock.phase == 'idle'
+    assert clock.timeout() == 300
+
+    now.now += 299
+
+    assert clock.timeout() == pytest.approx(1)
+
+    now.now += 1
+
+    with pytest.raises(DeadlineExceeded) as missed:
+        clock.timeout()
+
+    assert missed.value.kind == 'idle'
+
+
+def test_first_byte_starts_the_header_deadline(clock, now):
+    now.now += 200
+    clock.received(0)
+
+    assert clock.phase == 'idle'
+
+    clock.received(1)
+
+    assert clock.phase == 'header'
+    assert clock.timeout() == 10
+
+    # Reads during the header do not extend its deadline.
+    now.now += 6
+    clock.received(100)
+
+    assert clock.timeout() == pytest.approx(4)
+
+    now.now += 4
+
+    with pytest.raises(DeadlineExceeded) as missed:
+        clock.timeout()
+
+    assert missed.value.kind == 'header'
+
+
+def test_body_waits_at_most_its_timeout_per_read(clock, now):
+    clock.received(1)
+    clock.expect_body()
+
+    assert clock.phase == 'body'
+    assert clock.timeout() == 30
+
+    # The body has no overall deadline, only one on each read; the header's has been cleared.
+    now.now += 60
+
+    assert clock.timeout() == 30
+    assert clock.missed().kind == 'body'
+
+
+def test_slow_body_is_forgiven_during_the_grace_period(clock, now):
+    clock.expect_body()
+
+    now.now += ConnectionLimits.THROUGHPUT_GRACE
+    clock.received(10)
+
+    now.now += 1
+
+    with pytest.raises(DeadlineExceeded) as missed:
+        clock.received(10)
+
+    assert missed.value.kind == 'throughput'
+
+
+def test_body_must_keep_up_the_minimum_throughput(clock, now):
+    clock.expect_body()
+
+    for _ in range(10):
+        now.now += 1
+        clock.received(1000)
+
+    # A stall drags the average below the minimum, past the grace period.
+    now.now += 1
+
+    with pytest.raises(DeadlineExceeded):
+        clock.check_throughput()
+
+
+def test_expect_body_restarts_the_throughput_window(clock, now):
+    clock.expect_body()
+    now.now += 60
+    clock.expect_body()
+
+    # At the minimum throughput since the restart; the minute before it is forgotten.
+    for _ in range(10):
+        now.now += 1
+        clock.received(1000)
+
+
+def test_next_frame_restarts_the_idle_deadline(clock, now):
+    clock.expect_body()
+    now.now += 1000
+    clock.expect_frame()
+
+    assert clock.phase == 'idle'
+    assert clock.timeout() == 300
+
+
+def test_zero_limits_disable_every_deadline(now):
+    clock = ConnectionClock(ConnectionLimits(), clock=now)
+    now.now += 10 ** 6
+
+    assert clock.timeout() is None
+
+    clock.received(1)
+
+    assert clock.timeout() is None
+
+    clock.expect_body()
+    now.now += 10 ** 6
+    clock.received(1)
+
+    assert clock.timeout() is None
+
+
+def test_guarded_socket_refuses_to_read_past_the_deadline(clock, now):
+    served, client = socket.socketpair()
+
+    try:
+        guarded = GuardedSocket(served, clock)
+        client.sendall(b'abc')
+        buffer = bytearray(2)
+
+        assert guarded.recv_into(buffer) == 2
+        assert clock.phase == 'header'
+
+        now.now += 10
+
+        with pytest.raises(DeadlineExceeded) as missed:
+            guarded.recv_into(buffer)
+
+        assert missed.value.kind == 'header'
+    finally:
+        served.close()
+        client.close()
@@ -0,0 +1,77 @@
+"""
+Tests for decoding received frames within the image limits; see :mod:`nepyc.server.pipeline.decode`.
+"""
+import io
+import pytest
+from PIL import Image
+from nepyc.server.pipeline import DecodeStage, ImageLimits, LimitError, decode_image
+from nepyc.server.pipeline.decode import apply_pixel_limit
+
+
+def png(size=(64, 64)):
+    data = io.BytesIO()
+    Image.new('RGB', size, (10, 20, 30)).save(data, format='PNG')
+
+    return data.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def pixel_threshold(monkeypatch):
+    # Restored after each test, as apply_pixel_limit sets it for the whole process.
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', Image.MAX_IMAGE_PIXELS)
+
+
+def test_decode_keeps_format_and_hashes():
+    decoded = decode_image(png())
+
+    assert (decoded.format, decoded.mode, decoded.size) == ('PNG', 'RGB', (64, 64))
+    assert decoded.image.format == 'PNG'
+    assert len(decoded.md5) == 32
+
+
+def test_image_over_pixel_limit_is_refused():
+    with pytest.raises(LimitError):
+        decode_image(png(), ImageLimits(max_pixels=1000))
+
+
+def test_decompression_bomb_is_refused_as_over_limit():
+    Image.MAX_IMAGE_PIXELS = 1000
+
+    with pytest.raises(LimitError):
+        decode_image(png())
+
+
+@pytest.mark.parametrize('max_pixels, threshold', [(1000, 1000), (0, None)])
+def test_pixel_limit_sets_pillow_threshold(max_pixels, threshold):
+    apply_pixel_limit(ImageLimits(max_pixels=max_pixels))
+
+    assert Image.MAX_IMAGE_PIXELS == threshold
+
+
+def test_pixel_limit_without_limits_keeps_pillow_threshold():
+    default = Image.MAX_IMAGE_PIXELS
+    apply_pixel_limit()
+
+    assert Image.MAX_IMAGE_PIXELS == default
+
+
+def test_inline_stage_leaves_pillow_threshold_alone():
+    default = Image.MAX_IMAGE_PIXELS
+    stage = DecodeStage(limits=ImageLimits(max_pixels=5000))
+
+    assert Image.MAX_IMAGE_PIXELS == default
+
+    with pytest.raises(LimitError):
+        stage.decode(png((120, 120)))
+
+
+def test_worker_processes_refuse_images_over_limit():
+    stage = DecodeStage(workers=1, limits=ImageLimits(max_pixels=5000))
+
+    try:
+        assert stage.decode(png()).image.format == 'PNG'
+
+        with pytest.raises(LimitError):
+            stage.decode(png((120, 120)))
+    finally:
+        stage.shutdown()
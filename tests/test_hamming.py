@@ -0,0 +1,114 @@
+"""
+Tests for near-duplicate lookups by Hamming distance; see :mod:`nepyc.server.index.hamming`.
+"""
+import random
+import pytest
+from nepyc.server.index import HammingIndex, HashStore, hash_to_int
+from nepyc.server.index.hamming import HASH_BITS
+
+
+BASE = 0x8F0F0F0F00000000
+
+
+def flip(key, *bits):
+    for bit in bits:
+        key ^= 1 << bit
+
+    return key
+
+
+def test_exact_match_is_found_at_distance_zero():
+    index = HammingIndex()
+    index.add(BASE, 1)
+
+    assert index.nearest(BASE) == (BASE, 0)
+    assert index.nearest(flip(BASE, 0)) is None
+    assert index.get(BASE) == 1
+
+
+@pytest.mark.parametrize('distance', [1, 4, 7, 8, 12])
+def test_radius_includes_its_boundary(distance):
+    index = HammingIndex()
+    index.add(BASE)
+
+    # Spread across every chunk, so no single chunk holds the whole difference.
+    bits = [(bit * 17) % HASH_BITS for bit in range(distance + 1)]
+
+    assert index.nearest(flip(BASE, *bits[:distance]), distance) == (BASE, distance)
+    assert index.nearest(flip(BASE, *bits), distance) is None
+
+
+def test_differences_in_one_chunk_are_found():
+    index = HammingIndex()
+    index.add(BASE)
+
+    assert index.nearest(flip(BASE, 0, 1, 2, 3), distance=4) == (BASE, 4)
+
+
+def test_nearest_returns_the_closest_hash():
+    index = HammingIndex()
+    index.add(flip(BASE, 1, 20, 40), 'far')
+    index.add(flip(BASE, 60), 'near')
+
+    assert index.nearest(BASE, distance=8) == (flip(BASE, 60), 1)
+
+
+@pytest.mark.parametrize('chunks', [2, 4, 8])
+def test_radius_search_matches_brute_force(chunks):
+    rng = random.Random(chunks)
+    index = HammingIndex(chunks=chunks)
+    keys = [rng.getrandbits(HASH_BITS) for _ in range(200)]
+    index.update((key, number) for number, key in enumerate(keys))
+
+    for key in keys[:50]:
+        for _ in range(4):
+            query = flip(key, *rng.sample(range(HASH_BITS), rng.randrange(10)))
+
+            for distance in (0, 3, 6, 9):
+                expected = min((other ^ query).bit_count() for other in keys)
+                found = index.nearest(query, distance)
+
+                if expected > distance:
+                    assert found is None
+                else:
+                    assert found is not None and found[1] == expected
+
+
+def test_add_if_new_refuses_near_duplicates():
+    index = HammingIndex()
+
+    assert index.add_if_new(BASE, 1, distance=4)
+    assert not index.add_if_new(flip(BASE, 3, 33), 2, distance=4)
+    assert index.add_if_new(flip(BASE, 3, 33), 2, distance=1)
+    assert len(index) == 2
+
+
+def test_removed_hash_is_not_found():
+    index = HammingIndex()
+    index.add(BASE)
+    index.add(flip(BASE, 5))
+    index.remove(BASE)
+    index.remove(BASE)
+
+    assert BASE not in index
+    assert index.nearest(BASE, distance=2) == (flip(BASE, 5), 1)
+
+
+def test_hash_to_int_reads_hex_hashes():
+    assert hash_to_int('8f0f0f0f00000000') == BASE
+    assert hash_to_int(BASE) == BASE
+
+
+def test_store_refuses_near_duplicate_claims(tmp_path):
+    store = HashStore(tmp_path)
+
+    try:
+        assert store.claim('a' * 32, BASE, distance=4) == 1
+        assert store.claim('b' * 32, flip(BASE, 7, 40), distance=4) is None
+
+        # A released claim no longer blocks its near-duplicates.
+        store.release('a' * 32)
+
+        assert store.claim('b' * 32, flip(BASE, 7, 40), distance=4) == 1
+    finally:
+        store.index.close()
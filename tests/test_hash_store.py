@@ -0,0 +1,99 @@
+"""
+Tests for the store of saved images and the SQLite index behind it; see :mod:`nepyc.server.index`.
+"""
+import pytest
+from nepyc.server.index import HashIndex, HashStore
+
+
+MD5_A = 'a' * 32
+MD5_B = 'b' * 32
+MD5_C = 'c' * 32
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HashStore(tmp_path)
+    yield store
+    store.index.close()
+
+
+def test_claim_reserves_the_next_number(store):
+    assert store.claim(MD5_A) == 1
+    assert store.claim(MD5_B) == 2
+
+
+def test_claimed_image_counts_as_saved_until_released(store):
+    store.claim(MD5_A)
+
+    assert store.contains(MD5_A)
+    assert store.claim(MD5_A) is None
+
+    store.release(MD5_A)
+
+    assert not store.contains(MD5_A)
+    assert store.claim(MD5_A) == 1
+
+
+def test_released_number_is_handed_out_again(store):
+    store.claim(MD5_A)
+    store.claim(MD5_B)
+    store.release(MD5_A)
+
+    assert store.claim(MD5_C) == 1
+
+
+def test_release_of_unclaimed_hash_is_ignored(store):
+    store.release(MD5_A)
+
+    assert store.claim(MD5_A) == 1
+
+
+def test_commit_records_image_and_digest(store):
+    store.claim(MD5_A, raw_digest=b'upload')
+    store.commit(MD5_A)
+
+    assert store.size() == 1
+    assert store.claim(MD5_A) is None
+    assert store.contains_digest(b'upload')
+    assert store.index.entries() == {MD5_A: 1}
+
+
+def test_commit_without_claim_raises(store):
+    with pytest.raises(KeyError):
+        store.commit(MD5_A)
+
+
+def test_committed_images_survive_reopening(tmp_path):
+    store = HashStore(tmp_path)
+    store.claim(MD5_A, raw_digest=b'upload')
+    store.commit(MD5_A)
+    store.claim(MD5_B)
+    store.flush()
+    store.index.close()
+
+    reopened = HashStore(tmp_path)
+
+    try:
+        assert reopened.contains(MD5_A)
+        assert reopened.contains_digest(b'upload')
+
+        # The claim on MD5_B was never committed, so neither the image nor its number was kept.
+        assert not reopened.contains(MD5_B)
+        assert reopened.claim(MD5_C) == 2
+    finally:
+        reopened.index.close()
+
+
+def test_deleted_numbers_are_reused_after_reopening(tmp_path):
+    index = HashIndex(tmp_path)
+    index.add(MD5_A, 1)
+    index.add(MD5_B, 3)
+    index.close()
+
+    store = HashStore(tmp_path)
+
+    try:
+        assert store.claim(MD5_C) == 2
+        assert store.claim('d' * 32) == 4
+    finally:
+        store.index.close()
@@ -0,0 +1,74 @@
+"""
+Tests for the bounded ingest queue; see :mod:`nepyc.server.pipeline.queue`.
+"""
+import threading
+import pytest
+from nepyc.server.pipeline import IngestQueue
+
+
+def double(frame, key=None):
+    return frame * 2
+
+
+@pytest.fixture
+def queue():
+    queue = IngestQueue(double, maxsize=4, workers=1)
+    yield queue
+    queue.shutdown()
+
+
+@pytest.fixture
+def blocked():
+    """
+    A queue of two frames whose single worker is busy until the test ends.
+    """
+    busy = threading.Event()
+    release = threading.Event()
+
+    def block(frame, key=None):
+        busy.set()
+        release.wait()
+
+    queue = IngestQueue(block, maxsize=2, workers=1)
+    queue.offer('blocker')
+    busy.wait(timeout=5)
+    yield queue
+    release.set()
+    queue.shutdown()
+
+
+def test_first_offer_starts_the_workers(queue):
+    assert not queue.started
+    assert queue.offer(3).result(timeout=5) == 6
+    assert queue.started
+
+
+def test_full_queue_refuses_offers(blocked):
+    assert blocked.offer(1) is not None
+    assert blocked.offer(2) is not None
+    assert blocked.full
+    assert blocked.offer(3) is None
+
+
+def test_client_is_limited_to_its_share(blocked):
+    assert blocked.share == 1
+    assert blocked.offer(1, key='a') is not None
+    assert blocked.offer(2, key='a') is None
+    assert blocked.offer(1, key='b') is not None
+
+
+def test_shut_down_queue_refuses_offers(queue):
+    queue.offer(1).result(timeout=5)
+
+    assert queue.shutdown(timeout=5)
+    assert queue.closed
+    assert queue.offer(2) is None
+    assert not queue.started
+
+
+def test_start_reopens_a_shut_down_queue(queue):
+    queue.shutdown()
+    queue.start()
+
+    assert not queue.closed
+    assert queue.offer(2).result(timeout=5) == 4
@@ -0,0 +1,111 @@
+"""
+Tests for rebuilding the index of a save directory; see :mod:`nepyc.server.index.rebuild`.
+"""
+import hashlib
+import imagehash
+import numpy as np
+import pytest
+from PIL import Image
+from nepyc.server.index import HashIndex, HashStore
+from nepyc.server.index.rebuild import HASH_SIZE, average_hashes, rebuild_index
+
+
+def save(directory, number, color, size=(16, 16)):
+    image = Image.new('RGB', size, color)
+    image.putpixel((0, 0), (255 - color[0], 255 - color[1], 255 - color[2]))
+    image.save(directory / f'{number}.png')
+
+
+@pytest.fixture
+def library(tmp_path):
+    """
+    A save directory with no index: images 1, 3 and 5, a copy of 1 as 2, and an unreadable 6.
+    """
+    save(tmp_path, 1, (200, 10, 10))
+    save(tmp_path, 2, (200, 10, 10))
+    save(tmp_path, 3, (10, 200, 10))
+    save(tmp_path, 5, (10, 10, 200))
+    tmp_path.joinpath('6.png').write_bytes(b'not an image')
+    tmp_path.joinpath('notes.txt').write_text('not a saved image')
+
+    return tmp_path
+
+
+def test_rebuild_indexes_saved_images(library):
+    summary = rebuild_index(library, workers=1)
+
+    assert (summary.scanned, summary.written, summary.duplicates, summary.failed) == (5, 3, 1, 1)
+
+    index = HashIndex(library)
+
+    try:
+        assert sorted(index.entries().values()) == [1, 3, 5]
+        assert index.complete_numbers() == {1, 3, 5}
+    finally:
+        index.close()
+
+
+def test_rebuild_skips_complete_images_and_removes_deleted_ones(library):
+    rebuild_index(library, workers=1)
+    library.joinpath('3.png').unlink()
+
+    summary = rebuild_index(library, workers=1)
+
+    # Only the duplicate and the unreadable image are read again; neither is ever indexed.
+    assert (summary.skipped, summary.written, summary.removed) == (2, 0, 1)
+
+
+def test_store_does_not_reuse_numbers_of_unindexed_files(library):
+    rebuild_index(library, workers=1)
+    store = HashStore(library)
+
+    try:
+        # 2.png (a duplicate) and 6.png (unreadable) are on disk without being indexed, so only 4 and 7 on are free.
+        assert [store.claim(md5) for md5 in ('a' * 32, 'b' * 32, 'c' * 32)] == [4, 7, 8]
+    finally:
+        store.index.close()
+
+
+def test_store_reuses_numbers_of_deleted_files(library):
+    rebuild_index(library, workers=1)
+    library.joinpath('3.png').unlink()
+    rebuild_index(library, workers=1)
+    store = HashStore(library)
+
+    try:
+        assert sorted(store.claim(md5) for md5 in ('a' * 32, 'b' * 32)) == [3, 4]
+    finally:
+        store.index.close()
+
+
+def test_full_rebuild_keeps_uploaded_raw_digest(tmp_path):
+    save(tmp_path, 1, (200, 10, 10))
+
+    with Image.open(tmp_path / '1.png') as image:
+        md5 = hashlib.md5(image.tobytes()).hexdigest()
+
+    # As saved by the server, with the digest of the bytes the image was uploaded as.
+    index = HashIndex(tmp_path)
+    index.add(md5, 1, raw_digest=b'uploaded bytes')
+    index.close()
+
+    summary = rebuild_index(tmp_path, workers=1, full=True)
+    index = HashIndex(tmp_path)
+
+    try:
+        assert summary.written == 1
+        assert index.raw_digests() == {b'uploaded bytes': 1}
+        assert index.complete_numbers() == {1}
+    finally:
+        index.close()
+
+
+def test_average_hashes_match_imagehash():
+    rng = np.random.default_rng(0)
+    images = [Image.fromarray(rng.integers(0, 256, (32, 32, 3), dtype=np.uint8)) for _ in range(8)]
+    thumbnails = np.stack([
+        np.asarray(image.convert('L').resize((HASH_SIZE, HASH_SIZE), Image.Resampling.LANCZOS))
+        for image in images
+    ])
+
+    assert average_hashes(thumbnails) == [int(str(imagehash.average_hash(image)), 16) for image in images]
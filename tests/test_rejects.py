@@ -0,0 +1,60 @@
+"""
+Tests for caching refused frames by digest; see :mod:`nepyc.server.pipeline.rejects`.
+"""
+import io
+import pytest
+from PIL import Image
+from nepyc.proto.ack import LimitAck
+from nepyc.server.pipeline import raw_digest
+from nepyc.server.server import ImageServer
+
+
+def png(size=(32, 32)):
+    data = io.BytesIO()
+    Image.new('RGB', size, (10, 20, 30)).save(data, format='PNG')
+
+    return data.getvalue()
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = ImageServer(host='127.0.0.1', port=0, save_directory=tmp_path, max_pixels=2000)
+    yield server
+    server.ingest_queue.shutdown()
+    server.decode_stage.shutdown()
+
+
+def refuse(server, data):
+    digest = raw_digest(data)
+    ack, image = server.decode_and_accept(data, digest=digest)
+
+    assert image is None
+
+    return ack.status, server.rejects.get(digest)
+
+
+def test_unidentified_frame_is_cached_as_invalid(server):
+    status, cached = refuse(server, b'not an image')
+
+    assert status == 'INVALID'
+    assert cached is not None and cached().status == 'INVALID'
+
+
+def test_image_over_limit_is_cached(server):
+    assert refuse(server, png((64, 64))) == ('LIMIT', LimitAck)
+
+
+def test_frame_is_not_cached_when_its_decode_worker_dies(server, monkeypatch):
+    def die(image_data):
+        raise OSError('The decode worker died: A process in the process pool was terminated abruptly')
+
+    monkeypatch.setattr(server.decode_stage, 'decode', die)
+
+    # The image is fine, and is accepted once it is sent again.
+    assert refuse(server, png()) == ('INVALID', None)
+
+    monkeypatch.undo()
+
+    ack, image = server.decode_and_accept(png(), digest=raw_digest(png()))
+
+    assert ack.status == 'OK'
@@ -0,0 +1,164 @@
+"""
+Tests for the per-client rate limits; see :mod:`nepyc.server.pipeline.throttle`.
+"""
+import io
+import socket
+import threading
+import pytest
+from PIL import Image
+from nepyc.proto.ack import Ack
+from nepyc.proto.ack.models.base import WIRE_FORMAT
+from nepyc.server.connections import ConnectionClock, GuardedSocket
+from nepyc.server.pipeline import ClientThrottle
+from nepyc.server.pipeline.throttle import TokenBucket
+from nepyc.server.protocol import SIZE_HEADER
+from nepyc.server.server import ImageServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_burst_is_admitted_then_refused_until_refilled(clock):
+    throttle = ClientThrottle(images_per_second=2, burst=2, clock=clock)
+
+    assert [throttle.admit('a', 0) for _ in range(4)] == [0.0] * 4
+    assert throttle.admit('a', 0) == pytest.approx(0.5)
+    assert throttle.throttled == 1
+
+    clock.now += 0.5
+
+    assert throttle.admit('a', 0) == 0.0
+
+
+def test_refused_frame_is_not_charged(clock):
+    throttle = ClientThrottle(bytes_per_second=1000, clock=clock)
+
+    assert throttle.admit('a', 600) == 0.0
+    assert throttle.admit('a', 600) == pytest.approx(0.2)
+    assert throttle.admit('a', 600) == pytest.approx(0.2)
+
+    clock.now += 0.2
+
+    assert throttle.admit('a', 600) == 0.0
+
+
+def test_clients_are_limited_separately(clock):
+    throttle = ClientThrottle(images_per_second=1, clock=clock)
+
+    assert throttle.admit('a', 0) == 0.0
+    assert throttle.admit('a', 0) > 0
+    assert throttle.admit('b', 0) == 0.0
+
+
+def test_oversize_frame_is_admitted_into_debt(clock):
+    throttle = ClientThrottle(bytes_per_second=1000, clock=clock)
+
+    # More than the bucket can ever hold, so it is charged in full to a full bucket.
+    assert throttle.admit('a', 5000) == 0.0
+    assert throttle.admit('a', 100) == pytest.approx(4.1)
+
+    clock.now += 5
+
+    assert throttle.admit('a', 100) == 0.0
+
+
+def test_bucket_wait_caps_the_cost_at_its_capacity():
+    bucket = TokenBucket(rate=100, burst=2, now=0.0)
+
+    assert bucket.wait_time(10_000) == 0.0
+
+    bucket.tokens -= 10_000
+
+    assert bucket.tokens < 0
+    assert not bucket.full
+
+    # Only a full bucket's worth is waited for again, on top of the debt.
+    assert bucket.wait_time(10_000) == pytest.approx(100)
+
+
+def test_idle_clients_are_forgotten_once_refilled(clock):
+    throttle = ClientThrottle(images_per_second=1, clock=clock)
+    throttle.admit('a', 0)
+    throttle.admit('b', 0)
+
+    assert throttle.clients == 2
+
+    clock.now += 1
+    throttle.admit('c', 0)
+
+    assert throttle.clients == 1
+
+
+def test_clients_in_debt_are_kept(clock):
+    throttle = ClientThrottle(bytes_per_second=1000, clock=clock)
+    throttle.admit('a', 5000)
+    throttle.admit('b', 10)
+
+    clock.now += 1
+    throttle.admit('c', 10)
+
+    assert throttle.clients == 3
+
+
+def test_disabled_throttle_admits_everything():
+    throttle = ClientThrottle()
+
+    assert not throttle.enabled
+    assert throttle.admit('a', 10 ** 12, images=10 ** 6) == 0.0
+    assert throttle.clients == 0
+
+
+def test_serve_loop_discards_throttled_frames(tmp_path):
+    server = ImageServer(
+        host='127.0.0.1',
+        port=0,
+        save_incoming_images=True,
+        save_directory=tmp_path,
+        client_image_rate=0.01
+    )
+    served, client = socket.socketpair()
+    guarded = GuardedSocket(served, ConnectionClock(server.connection_limits))
+    thread = threading.Thread(target=server.serve_client, args=(guarded, ('192.0.2.1', 1)), daemon=True)
+    thread.start()
+
+    def send(color):
+        data = io.BytesIO()
+        Image.new('RGB', (16, 16), color).save(data, format='PNG')
+        client.sendall(SIZE_HEADER.pack(len(data.getvalue())) + data.getvalue())
+
+        header = client.recv(WIRE_FORMAT.size, socket.MSG_WAITALL)
+        payload = client.recv(Ack.payload_size(header), socket.MSG_WAITALL) if Ack.payload_size(header) else b''
+
+        return Ack.from_bytes(header + payload)
+
+    try:
+        client.settimeout(10)
+
+        assert send((200, 0, 0)).status == 'OK'
+
+        # Refused before its body is read; the body is then discarded, so the next frame is read in step.
+        for color in ((0, 200, 0), (0, 0, 200)):
+            ack = send(color)
+
+            assert ack.status == 'THROTTLED'
+            assert ack.retry_after > 0
+
+        assert server.throttle.throttled == 2
+    finally:
+        client.close()
+        thread.join(10)
+        server.ingest_queue.shutdown()
+        server.decode_stage.shutdown()
+        server.hash_store.index.close()
+
+    assert [path.name for path in tmp_path.glob('*.png')] == ['1.png']
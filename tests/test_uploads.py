@@ -0,0 +1,109 @@
+"""
+Tests for the staging area of resumable, chunked uploads; see :mod:`nepyc.server.pipeline.uploads`.
+"""
+import io
+import os
+import time
+import pytest
+from nepyc.server.pipeline import UploadError, UploadSessions
+from nepyc.server.server import ImageServer
+
+
+UPLOAD_ID = bytes(range(16))
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    return UploadSessions(tmp_path / '.uploads', timeout=3600)
+
+
+def age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_new_upload_starts_at_zero(uploads):
+    assert uploads.open(UPLOAD_ID, len(DATA)) == 0
+    assert uploads.complete(UPLOAD_ID) is None
+
+
+def test_reopened_upload_resumes_from_committed_offset(uploads):
+    uploads.open(UPLOAD_ID, len(DATA))
+    uploads.write(UPLOAD_ID, 0, DATA[:300])
+
+    # As the client would after reconnecting, on a new staging area over the same directory.
+    resumed = UploadSessions(uploads.directory, timeout=3600)
+
+    assert resumed.open(UPLOAD_ID, len(DATA)) == 300
+
+
+def test_chunk_at_wrong_offset_is_ignored(uploads):
+    uploads.open(UPLOAD_ID, len(DATA))
+    uploads.write(UPLOAD_ID, 0, DATA[:300])
+
+    assert uploads.write(UPLOAD_ID, 0, DATA[:300]) == 300
+    assert uploads.write(UPLOAD_ID, 500, DATA[500:]) == 300
+
+
+def test_chunk_past_the_end_is_refused(uploads):
+    uploads.open(UPLOAD_ID, len(DATA))
+
+    with pytest.raises(UploadError):
+        uploads.write(UPLOAD_ID, 0, DATA + b'extra')
+
+    assert uploads.write(UPLOAD_ID, 0, DATA[:10]) == 10
+
+
+def test_unknown_upload_is_refused(uploads):
+    with pytest.raises(UploadError):
+        uploads.write(UPLOAD_ID, 0, DATA)
+
+
+def test_upload_is_complete_once_every_byte_is_committed(uploads):
+    uploads.open(UPLOAD_ID, len(DATA))
+    uploads.write(UPLOAD_ID, 0, DATA[:300])
+
+    assert uploads.write(UPLOAD_ID, 300, io.BytesIO(DATA[300:])) == len(DATA)
+
+    path = uploads.complete(UPLOAD_ID)
+
+    assert path.read_bytes() == DATA
+
+    uploads.discard(UPLOAD_ID)
+
+    assert not path.exists()
+
+
+def test_reopening_with_a_different_size_starts_over(uploads):
+    uploads.open(UPLOAD_ID, len(DATA))
+    uploads.write(UPLOAD_ID, 0, DATA[:300])
+
+    assert uploads.open(UPLOAD_ID, 2 * len(DATA)) == 0
+    assert len(list(uploads.directory.iterdir())) == 1
+
+
+def test_only_stale_uploads_expire(uploads):
+    other = bytes(16)
+    uploads.open(UPLOAD_ID, len(DATA))
+    uploads.open(other, len(DATA))
+    age(uploads.path(UPLOAD_ID, len(DATA)), 3601)
+
+    assert uploads.expire() == 1
+    assert uploads.open(UPLOAD_ID, len(DATA)) == 0
+    assert uploads.path(other, len(DATA)).exists()
+
+
+def test_expire_without_a_staging_directory_does_nothing(uploads):
+    assert uploads.expire() == 0
+
+
+def test_drained_server_deletes_stale_uploads(tmp_path):
+    server = ImageServer(host='127.0.0.1', port=0, save_directory=tmp_path, upload_timeout=60)
+    server.uploads.open(UPLOAD_ID, len(DATA))
+    path = server.uploads.path(UPLOAD_ID, len(DATA))
+    age(path, 61)
+
+    server.drain(timeout=1)
+
+    assert not path.exists()